@@ -4,7 +4,6 @@ Basic Scheduler for The Houston Collective Streaming Server
 Monitors schedule table and automatically streams appropriate playlists
 """
 
-import sqlite3
 import subprocess
 import time
 import logging
@@ -15,10 +14,13 @@ import random
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from streamserver.db import get_database
+
 class BasicScheduler:
     def __init__(self):
         # Configuration
         self.db_path = '/opt/streamserver/database/streaming.db'
+        self.db = get_database(self.db_path)
         self.content_dir = '/opt/streamserver/content'
         self.log_dir = '/opt/streamserver/logs'
         self.rtmp_url = 'rtmp://127.0.0.1:1935/live/test'
@@ -60,16 +62,6 @@ class BasicScheduler:
         self.stop_current_stream()
         sys.exit(0)
     
-    def get_db_connection(self):
-        """Get database connection"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            return conn
-        except Exception as e:
-            self.logger.error(f"❌ Database connection failed: {e}")
-            return None
-    
     def get_current_schedule(self):
         """Get active schedule for current day and time"""
         now = datetime.now()
@@ -78,13 +70,8 @@ class BasicScheduler:
         current_day = 0 if current_day == 6 else current_day + 1
         current_time = now.strftime('%H:%M')
         
-        conn = self.get_db_connection()
-        if not conn:
-            return None
-        
         try:
-            cursor = conn.cursor()
-            cursor.execute("""
+            result = self.db.query_one("""
                 SELECT s.*, p.name as playlist_name, p.priority
                 FROM schedule s
                 JOIN playlists p ON s.playlist_id = p.id
@@ -96,9 +83,6 @@ class BasicScheduler:
                 LIMIT 1
             """, (current_day, current_time, current_time))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result:
                 self.logger.info(f"📅 Found active schedule: {result['playlist_name']} ({result['start_time']}-{result['end_time']})")
             
@@ -106,18 +90,12 @@ class BasicScheduler:
             
         except Exception as e:
             self.logger.error(f"❌ Error checking schedule: {e}")
-            conn.close()
             return None
     
     def get_fallback_playlist(self):
         """Get highest priority playlist as fallback"""
-        conn = self.get_db_connection()
-        if not conn:
-            return None
-        
         try:
-            cursor = conn.cursor()
-            cursor.execute("""
+            result = self.db.query_one("""
                 SELECT id, name, priority
                 FROM playlists
                 WHERE is_active = 1
@@ -132,9 +110,6 @@ class BasicScheduler:
                 LIMIT 1
             """)
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result:
                 self.logger.info(f"🔄 Using fallback playlist: {result['name']} (Priority: {result['priority']})")
             
@@ -142,18 +117,12 @@ class BasicScheduler:
             
         except Exception as e:
             self.logger.error(f"❌ Error getting fallback playlist: {e}")
-            conn.close()
             return None
     
     def get_playlist_videos(self, playlist_id):
         """Get all videos in a playlist"""
-        conn = self.get_db_connection()
-        if not conn:
-            return []
-        
         try:
-            cursor = conn.cursor()
-            cursor.execute("""
+            return self.db.query_all("""
                 SELECT v.id, v.filename, v.file_path, v.display_name, v.duration
                 FROM videos v
                 JOIN video_playlists vp ON v.id = vp.video_id
@@ -161,14 +130,8 @@ class BasicScheduler:
                 ORDER BY vp.sort_order, v.display_name
             """, (playlist_id,))
             
-            videos = cursor.fetchall()
-            conn.close()
-            
-            return [dict(video) for video in videos]
-            
         except Exception as e:
             self.logger.error(f"❌ Error getting playlist videos: {e}")
-            conn.close()
             return []
     
     def get_next_video(self, playlist_id, shuffle=False):
@@ -7,21 +7,49 @@ Handles thumbnail generation, format validation, and file organization
 
 import os
 import sys
-import sqlite3
 import subprocess
 import shutil
 import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
 import hashlib
 import json
+import time
+
+from streamserver import sprites
+from streamserver.containers import read_headers
+from streamserver.db import BatchWriter, get_database
+from streamserver.fingerprints import FingerprintStore
+from streamserver.keyframes import KEYFRAMES_SAVE, KeyframeIndex, KeyframeStore, build_index, seek_input_args
+from streamserver.keyframes import ensure_schema as ensure_keyframe_schema
+from streamserver.renditions import source_fingerprint
+from streamserver.thumbnails import ThumbnailStore
 
 # Configuration
 DATABASE_PATH = "/opt/streamserver/database/streaming.db"
 CONTENT_PATH = "/opt/streamserver/content"
 TEMP_PATH = "/opt/streamserver/temp"
-THUMBNAIL_PATH = "/opt/streamserver/web/assets/thumbnails"
+SPRITE_PATH = "/opt/streamserver/web/assets/sprites"
 SUPPORTED_FORMATS = {'.mp4', '.mkv', '.avi', '.mov', '.m4v', '.flv', '.ts', '.webm'}
+CONFIG_FILE = "/opt/streamserver/config/content_processor.json"
+
+DEFAULT_CONFIG = {
+    'workers': 0,             # FFprobe/FFmpeg processes per pipeline stage; 0 = one per CPU core
+    'streaming_safe': True,   # keep cores free for the live encoder and run at low priority
+    'reserved_cores': 2,      # cores left alone in streaming-safe mode
+    'nice': 10,
+    'batch_rows': 200,        # status writes per transaction...
+    'batch_seconds': 2.0,     # ...or fewer, if a batch has been open this long
+    'sprites': True,          # hover-scrub sprite sheet + WebVTT map per video (needs Pillow)
+    'sprite': {},             # overrides for streamserver.sprites.DEFAULT_SPRITE
+}
+
+# Batched status writes for the pipeline
+THUMBNAIL_SET = "UPDATE videos SET thumbnail_path = ? WHERE id = ?"
+SPRITE_SET = "UPDATE videos SET sprite_path = ? WHERE id = ?"
+VIDEO_DEACTIVATE = "UPDATE videos SET is_active = 0 WHERE id = ?"
+VIDEO_PROCESSED = "UPDATE videos SET date_modified = CURRENT_TIMESTAMP WHERE id = ?"
 
 # Setup logging
 logging.basicConfig(
@@ -34,31 +62,61 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def load_processor_config(path=CONFIG_FILE):
+    """Default processor settings updated with config/content_processor.json if present"""
+    config = dict(DEFAULT_CONFIG)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+def worker_count(config, jobs=None):
+    """Pool size per stage: requested or one per core, capped to leave the encoder its cores"""
+    cores = os.cpu_count() or 1
+    workers = jobs or config['workers'] or cores
+    if config['streaming_safe']:
+        workers = min(workers, cores - config['reserved_cores'])
+    return max(1, workers)
+
 class ContentProcessor:
-    def __init__(self):
+    def __init__(self, config=None, jobs=None):
+        self.config = config or load_processor_config()
+        self.workers = worker_count(self.config, jobs)
         self.db_path = DATABASE_PATH
         self.content_path = CONTENT_PATH
         self.temp_path = TEMP_PATH
-        self.thumbnail_path = THUMBNAIL_PATH
+        self.thumbnails = ThumbnailStore(logger=logger)
+        self.thumbnail_path = self.thumbnails.store_dir
+        self.sprite_path = SPRITE_PATH
+        self.sprite_settings = {**sprites.DEFAULT_SPRITE, **self.config['sprite']}
+        self.sprites_enabled = self.config['sprites'] and sprites.available()
+        if self.config['sprites'] and not self.sprites_enabled:
+            logger.warning("Pillow is not installed; preview sprites will not be generated")
         self.processed_count = 0
         self.error_count = 0
         self.thumbnail_count = 0
+        self.sprite_count = 0
+        self.keyframe_count = 0
+        self._columns_checked = False
+        self.progress = None  # optional progress(done, total, message) callback, e.g. a background job
         
         # Ensure directories exist
         self._ensure_directories()
         
     def _ensure_directories(self):
         """Create required directories if they don't exist"""
-        for path in [self.temp_path, self.thumbnail_path]:
+        for path in [self.temp_path, self.thumbnail_path, self.sprite_path]:
             Path(path).mkdir(parents=True, exist_ok=True)
             shutil.chown(path, user='streamadmin', group='streamadmin')
     
     def get_db_connection(self):
-        """Create database connection with WAL mode"""
+        """Shared persistent database connection"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.execute("PRAGMA journal_mode = WAL")
-            conn.row_factory = sqlite3.Row
+            conn = get_database(self.db_path).connection()
+            if not self._columns_checked:
+                sprites.ensure_columns(conn)
+                ensure_keyframe_schema(conn)
+                self._columns_checked = True
             return conn
         except Exception as e:
             logger.error(f"Database connection failed: {e}")
@@ -66,6 +124,9 @@ class ContentProcessor:
 
     def validate_video_format(self, file_path):
         """Validate video file format and integrity"""
+        if read_headers(file_path):
+            # MP4/MKV headers with a video track answer without starting FFprobe
+            return True, "Valid video file"
         try:
             cmd = [
                 'ffprobe', '-v', 'error', '-select_streams', 'v:0',
@@ -85,38 +146,62 @@ class ContentProcessor:
         except Exception as e:
             return False, f"Validation error: {e}"
 
+    def keyframes_for(self, video_path, video_id):
+        """Stored keyframe index for a video, building and saving it the first time; None if it can't be built"""
+        self.get_db_connection()  # creates keyframe_index on older databases
+        store = KeyframeStore(get_database(self.db_path))
+        index = store.load(video_id, video_path)
+        if index is None:
+            index = self.build_keyframes(video_path, video_id)
+            store.save(video_id, video_path, index)
+        return index
+
+    def build_keyframes(self, video_path, video_id):
+        """Keyframe index from the container tables or FFprobe; empty if neither can say"""
+        try:
+            index = build_index(video_path)
+            logger.info(f"Indexed {len(index)} keyframes for video {video_id}")
+            return index
+        except Exception as e:
+            logger.warning(f"Keyframe index failed for video {video_id}: {e}")
+            return KeyframeIndex()  # stored empty, so it isn't retried until the file changes
+
     def generate_thumbnail(self, video_path, video_id, duration=None):
-        """Generate thumbnail for video using FFmpeg"""
+        """Generate thumbnail for video using FFmpeg and record it"""
+        success, result = self.render_thumbnail(video_path, video_id, duration, self.keyframes_for(video_path, video_id))
+        if success:
+            get_database(self.db_path).execute(THUMBNAIL_SET, (result, video_id))
+        return success, result
+
+    def render_thumbnail(self, video_path, video_id, duration=None, keyframes=None):
+        """Write the thumbnail with FFmpeg into the content-addressed store; returns (success, URL or error), no DB access"""
         try:
-            thumbnail_filename = f"video_{video_id}.jpg"
-            thumbnail_full_path = Path(self.thumbnail_path) / thumbnail_filename
+            thumbnail_full_path = Path(self.thumbnails.incoming_path(f"video_{video_id}_{os.getpid()}.jpg"))
             
             # Calculate timestamp for thumbnail (10% into video or 10 seconds, whichever is smaller)
             if duration and duration > 0:
                 timestamp = min(duration * 0.1, 10)
             else:
                 timestamp = 10
-            
+            if keyframes:
+                timestamp = keyframes.nearest(timestamp)[0]
+
+            # Seek straight to a keyframe and decode only keyframes, single-threaded: one frame
+            # doesn't repay starting a frame-threaded decoder, which also holds output back by a frame per thread
             cmd = [
-                'ffmpeg', '-ss', str(timestamp), '-i', str(video_path),
-                '-vframes', '1', '-q:v', '2', '-vf', 'scale=320:240',
+                'ffmpeg', '-threads', '1', '-skip_frame', 'nokey',
+                *seek_input_args(video_path, timestamp, keyframes),
+                '-an', '-sn', '-vframes', '1', '-q:v', '2', '-vf', 'scale=320:240',
                 '-y', str(thumbnail_full_path)
             ]
             
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
             
             if result.returncode == 0 and thumbnail_full_path.exists():
-                # Update database with thumbnail path
-                conn = self.get_db_connection()
-                conn.execute(
-                    "UPDATE videos SET thumbnail_path = ? WHERE id = ?",
-                    (f"/assets/thumbnails/{thumbnail_filename}", video_id)
-                )
-                conn.commit()
-                conn.close()
-                
-                logger.info(f"Generated thumbnail for video {video_id}: {thumbnail_filename}")
-                return True, thumbnail_filename
+                # A new picture gets a new URL, so the year-long immutable cache on /assets stays correct
+                thumbnail_url = self.thumbnails.put(thumbnail_full_path)
+                logger.info(f"Generated thumbnail for video {video_id}: {thumbnail_url}")
+                return True, thumbnail_url
             else:
                 logger.warning(f"Thumbnail generation failed for video {video_id}: {result.stderr}")
                 return False, result.stderr
@@ -128,6 +213,42 @@ class ContentProcessor:
             logger.error(f"Thumbnail generation error for video {video_id}: {e}")
             return False, str(e)
 
+    def generate_sprite(self, video_path, video_id, duration):
+        """Build the hover-scrub sprite sheet and WebVTT map and record it"""
+        self.get_db_connection()  # adds sprite_path on older databases
+        success, result = self.render_sprite(video_path, video_id, duration)
+        if success:
+            get_database(self.db_path).execute(SPRITE_SET, (result, video_id))
+        return success, result
+
+    def render_sprite(self, video_path, video_id, duration):
+        """Write the sprite files; returns (success, VTT URL or error), no DB access"""
+        if not duration or duration <= 0:
+            return False, "Unknown duration"
+        # /assets is served as immutable, so every rebuild gets a new ?v= on both URLs
+        version = int(time.time())
+        name = f"video_{video_id}_sprite"
+        try:
+            tiles = sprites.build_sprite(
+                video_path, duration,
+                Path(self.sprite_path) / f"{name}.jpg", Path(self.sprite_path) / f"{name}.vtt",
+                f"/assets/sprites/{name}.jpg?v={version}", self.sprite_settings
+            )
+        except subprocess.TimeoutExpired:
+            logger.error(f"Sprite generation timeout for video {video_id}")
+            return False, "Sprite generation timeout"
+        except Exception as e:
+            logger.warning(f"Sprite generation failed for video {video_id}: {e}")
+            return False, str(e)
+        if not tiles:
+            logger.warning(f"Sprite generation produced no frames for video {video_id}")
+            return False, "No frames decoded"
+        logger.info(f"Generated {tiles}-frame sprite for video {video_id}")
+        return True, f"/assets/sprites/{name}.vtt?v={version}"
+
+    def wants_sprite(self, video, regenerate=False):
+        return bool(self.sprites_enabled and video['duration'] and (regenerate or not video['sprite_path']))
+
     def optimize_video(self, video_path, target_path=None):
         """Optimize video for streaming (optional)"""
         try:
@@ -174,6 +295,10 @@ class ContentProcessor:
             # Move file if not already in target location
             if source.resolve() != target_path.resolve():
                 shutil.move(str(source), str(target_path))
+                # Same videos row at the new path, so playlists keep it
+                conn = self.get_db_connection()
+                FingerprintStore(conn).move(source, target_path)
+                conn.commit()
                 logger.info(f"Organized content: {source} -> {target_path}")
                 return str(target_path)
             
@@ -202,7 +327,6 @@ class ContentProcessor:
                 logger.error(f"Video file not found: {video_path}")
                 conn.execute("UPDATE videos SET is_active = 0 WHERE id = ?", (video_id,))
                 conn.commit()
-                conn.close()
                 return False
             
             logger.info(f"Processing video {video_id}: {video['filename']}")
@@ -213,7 +337,6 @@ class ContentProcessor:
                 logger.error(f"Video validation failed for {video_id}: {validation_msg}")
                 conn.execute("UPDATE videos SET is_active = 0 WHERE id = ?", (video_id,))
                 conn.commit()
-                conn.close()
                 return False
             
             # Generate thumbnail if not exists
@@ -221,6 +344,11 @@ class ContentProcessor:
                 success, result = self.generate_thumbnail(video_path, video_id, video['duration'])
                 if success:
                     self.thumbnail_count += 1
+
+            if self.wants_sprite(video):
+                success, result = self.generate_sprite(video_path, video_id, video['duration'])
+                if success:
+                    self.sprite_count += 1
             
             # Update processing timestamp
             conn.execute(
@@ -228,7 +356,6 @@ class ContentProcessor:
                 (video_id,)
             )
             conn.commit()
-            conn.close()
             
             self.processed_count += 1
             logger.info(f"Successfully processed video {video_id}")
@@ -240,41 +367,63 @@ class ContentProcessor:
             return False
 
     def process_all_videos(self, regenerate_thumbnails=False):
-        """Process all videos in database"""
+        """Process all videos in database: validate, thumbnail and sprite on bounded pools, one batched writer"""
         try:
             conn = self.get_db_connection()
             
             # Get videos to process
-            if regenerate_thumbnails:
-                cursor = conn.execute("SELECT id FROM videos WHERE is_active = 1")
-            else:
-                cursor = conn.execute("SELECT id FROM videos WHERE is_active = 1 AND thumbnail_path IS NULL")
-            
-            video_ids = [row['id'] for row in cursor.fetchall()]
-            total_videos = len(video_ids)
-            
-            logger.info(f"Processing {total_videos} videos...")
-            
-            for i, video_id in enumerate(video_ids, 1):
-                try:
-                    self.process_video(video_id)
-                    
-                    # Progress reporting
-                    if i % 10 == 0 or i == total_videos:
-                        progress = (i / total_videos) * 100
-                        logger.info(f"Progress: {i}/{total_videos} ({progress:.1f}%)")
-                        
-                except Exception as e:
-                    logger.error(f"Failed to process video {video_id}: {e}")
-                    self.error_count += 1
-                    continue
-            
-            conn.close()
+            query = """
+                SELECT v.id, v.file_path, v.duration, v.thumbnail_path, v.sprite_path,
+                       k.source_fingerprint AS keyframe_fingerprint
+                FROM videos v LEFT JOIN keyframe_index k ON k.video_id = v.id
+                WHERE v.is_active = 1
+            """
+            if not regenerate_thumbnails:
+                query += " AND (v.thumbnail_path IS NULL OR k.video_id IS NULL"
+                query += " OR (v.sprite_path IS NULL AND v.duration > 0))" if self.sprites_enabled else ")"
+            videos = [dict(row) for row in conn.execute(query).fetchall()]
+            total_videos = len(videos)
+            
+            logger.info(f"Processing {total_videos} videos with {self.workers} workers per stage...")
+            
+            completed = 0
+            with ThreadPoolExecutor(self.workers, thread_name_prefix='validate') as validators, \
+                    ThreadPoolExecutor(self.workers, thread_name_prefix='thumbnail') as thumbnailers, \
+                    ThreadPoolExecutor(self.workers, thread_name_prefix='sprite') as spriters, \
+                    self.batch_writer() as writer:
+                stages = {validators.submit(self._validate_stage, video): video for video in videos}
+                while stages:
+                    done, _ = wait(stages, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        video = stages.pop(future)
+                        try:
+                            next_stage = self._record_stage(writer, video, future.result(), regenerate_thumbnails)
+                        except Exception as e:
+                            logger.error(f"Failed to process video {video['id']}: {e}")
+                            self.error_count += 1
+                            next_stage = None
+                        if next_stage == 'thumbnail':
+                            stages[thumbnailers.submit(self._thumbnail_stage, video)] = video
+                            continue
+                        if next_stage == 'sprite':
+                            stages[spriters.submit(self._sprite_stage, video)] = video
+                            continue
+
+                        # Progress reporting
+                        completed += 1
+                        if self.progress:
+                            self.progress(completed, total_videos, f"Video {video['id']}")
+                        if completed % 10 == 0 or completed == total_videos:
+                            progress = (completed / total_videos) * 100
+                            logger.info(f"Progress: {completed}/{total_videos} ({progress:.1f}%)")
             
             logger.info(f"Processing completed:")
             logger.info(f"  Processed: {self.processed_count} videos")
             logger.info(f"  Thumbnails: {self.thumbnail_count} generated")
+            logger.info(f"  Sprites: {self.sprite_count} generated")
+            logger.info(f"  Keyframe indexes: {self.keyframe_count} built")
             logger.info(f"  Errors: {self.error_count} videos")
+            logger.info(f"  Status writes: {writer.commits} transactions")
             
             return True
             
@@ -282,6 +431,65 @@ class ContentProcessor:
             logger.error(f"Batch processing failed: {e}")
             return False
 
+    def batch_writer(self):
+        """Writer for the pipeline's status updates"""
+        return BatchWriter(
+            get_database(self.db_path), (KEYFRAMES_SAVE, THUMBNAIL_SET, SPRITE_SET, VIDEO_DEACTIVATE, VIDEO_PROCESSED),
+            max_rows=self.config['batch_rows'], max_seconds=self.config['batch_seconds']
+        )
+
+    # Pipeline stages run on the pools and return results; only _record_stage writes to the DB
+
+    def _validate_stage(self, video):
+        if not Path(video['file_path']).exists():
+            return 'validate', False, "Video file not found"
+        result = self.validate_video_format(video['file_path'])
+        if result[0] and video['keyframe_fingerprint'] != source_fingerprint(video['file_path']):
+            # Indexed once here, while the headers are still in the page cache
+            video['keyframes'] = self.build_keyframes(video['file_path'], video['id'])
+            video['keyframe_row'] = KeyframeStore.save_params(video['id'], video['file_path'], video['keyframes'])
+        return ('validate',) + result
+
+    def _thumbnail_stage(self, video):
+        keyframes = video.get('keyframes')
+        if keyframes is None:
+            keyframes = KeyframeStore(get_database(self.db_path)).load(video['id'], video['file_path'])
+        return ('thumbnail',) + self.render_thumbnail(video['file_path'], video['id'], video['duration'], keyframes)
+
+    def _sprite_stage(self, video):
+        return ('sprite',) + self.render_sprite(video['file_path'], video['id'], video['duration'])
+
+    def _record_stage(self, writer, video, result, regenerate_thumbnails):
+        """Queue the DB writes for a finished stage; returns the next stage, if any"""
+        stage, ok, detail = result
+        video_id = video['id']
+        if stage == 'validate':
+            if not ok:
+                logger.error(f"Video validation failed for {video_id}: {detail}")
+                writer.add(VIDEO_DEACTIVATE, (video_id,))
+                self.error_count += 1
+                return None
+            if 'keyframe_row' in video:
+                writer.add(KEYFRAMES_SAVE, video['keyframe_row'])
+                self.keyframe_count += 1
+            if regenerate_thumbnails or not video['thumbnail_path']:
+                return 'thumbnail'
+            if self.wants_sprite(video, regenerate_thumbnails):
+                return 'sprite'
+        elif stage == 'thumbnail':
+            if ok:
+                writer.add(THUMBNAIL_SET, (detail, video_id))
+                self.thumbnail_count += 1
+            if self.wants_sprite(video, regenerate_thumbnails):
+                return 'sprite'
+        elif ok:
+            writer.add(SPRITE_SET, (detail, video_id))
+            self.sprite_count += 1
+
+        writer.add(VIDEO_PROCESSED, (video_id,))
+        self.processed_count += 1
+        return None
+
     def cleanup_temp_files(self):
         """Clean up temporary files older than 24 hours"""
         try:
@@ -333,8 +541,6 @@ class ContentProcessor:
                 'processing_date': datetime.now().isoformat()
             }
             
-            conn.close()
-            
             # Save report
             report_path = Path('/opt/streamserver/logs/processing_report.json')
             with open(report_path, 'w') as f:
@@ -354,13 +560,18 @@ def main():
     parser = argparse.ArgumentParser(description='Content Processor for SRS Streaming Server')
     parser.add_argument('--video-id', type=int, help='Process specific video by ID')
     parser.add_argument('--all', action='store_true', help='Process all videos')
-    parser.add_argument('--regenerate-thumbnails', action='store_true', help='Regenerate all thumbnails')
+    parser.add_argument('--regenerate-thumbnails', action='store_true', help='Regenerate all thumbnails and preview sprites')
     parser.add_argument('--cleanup', action='store_true', help='Clean up temporary files')
     parser.add_argument('--report', action='store_true', help='Generate processing report')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='Concurrent FFprobe/FFmpeg processes per stage (capped in streaming-safe mode)')
     
     args = parser.parse_args()
     
-    processor = ContentProcessor()
+    processor = ContentProcessor(jobs=args.jobs)
+    if processor.config['streaming_safe']:
+        # Thumbnail encodes inherit this, so the live encoder always wins the CPU
+        os.nice(processor.config['nice'])
     
     try:
         if args.video_id:
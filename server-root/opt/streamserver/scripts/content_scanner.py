@@ -8,18 +8,40 @@ Enhanced with folder structure tracking - STREAMING SAFE
 
 import os
 import sys
-import sqlite3
 import json
+import argparse
 import subprocess
-import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
+from streamserver.compat import classify, ensure_columns
+from streamserver.containers import read_headers
+from streamserver.db import BatchWriter, get_database
+from streamserver.encoding import load_profile, profile_key
+from streamserver.fingerprints import (
+    MOVE_SQL, RECORD_SQL, FingerprintStore, fingerprint, move_params, partial_hash, record_params
+)
+from streamserver.library import SUPPORTED_FORMATS, is_video_name, walk_content
+
 # Configuration
 DATABASE_PATH = "/opt/streamserver/database/streaming.db"
 CONTENT_PATH = "/opt/streamserver/content"
-SUPPORTED_FORMATS = {'.mp4', '.mkv', '.avi', '.mov', '.m4v', '.flv', '.ts', '.webm'}
+SCAN_REPORT_PATH = "/opt/streamserver/logs/scan_report.json"
+REPORT_LIST_LIMIT = 500  # paths listed per category in the scan report
+CONFIG_FILE = "/opt/streamserver/config/content_scanner.json"
+
+DEFAULT_CONFIG = {
+    'probe_workers': 0,       # concurrent FFprobe processes; 0 = one per CPU core
+    'streaming_safe': True,   # keep cores free for the live encoder and run at low priority
+    'reserved_cores': 2,      # cores left alone in streaming-safe mode
+    'nice': 10,
+    'batch_rows': 500,        # DB writes per transaction...
+    'batch_seconds': 2.0,     # ...or fewer, if a batch has been open this long
+    'hash_backfill': 1000,    # files recorded before content hashing that get hashed per scan
+    'header_probe': True,     # read MP4/MKV headers in-process; FFprobe only for what they can't answer
+}
 
 # Setup logging
 logging.basicConfig(
@@ -32,40 +54,151 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def load_scanner_config(path=CONFIG_FILE):
+    """Default scanner settings updated with config/content_scanner.json if present"""
+    config = dict(DEFAULT_CONFIG)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+def probe_worker_count(config, jobs=None):
+    """FFprobe pool size: requested or one per core, capped to leave the encoder its cores"""
+    cores = os.cpu_count() or 1
+    workers = jobs or config['probe_workers'] or cores
+    if config['streaming_safe']:
+        workers = min(workers, cores - config['reserved_cores'])
+    return max(1, workers)
+
+# Batched writes: new paths are skipped rather than failing the batch if they already exist
+VIDEO_INSERT = """
+    INSERT INTO videos (
+        filename, file_path, display_name, duration, file_size,
+        format, resolution, bitrate, codec, audio_codec,
+        audio_bitrate, audio_channels, encode_mode, encode_profile
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT DO NOTHING
+"""
+
+VIDEO_UPDATE = """
+    UPDATE videos SET
+        duration = ?, file_size = ?, format = ?, resolution = ?, bitrate = ?,
+        codec = ?, audio_codec = ?, audio_bitrate = ?, audio_channels = ?,
+        encode_mode = ?, encode_profile = ?, thumbnail_path = NULL,
+        date_modified = CURRENT_TIMESTAMP
+    WHERE id = ?
+"""
+
+FOLDER_UPSERT = """
+    INSERT INTO folders (folder_path, folder_name, parent_folder, video_count)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(folder_path) DO UPDATE SET
+        video_count = excluded.video_count,
+        date_modified = CURRENT_TIMESTAMP
+"""
+
+# The ON CONFLICT clauses above need these; databases created without them get a unique index
+UNIQUE_PATHS = (('videos', 'file_path'), ('folders', 'folder_path'))
+
+def has_unique_index(conn, table, column):
+    """Whether table has a UNIQUE constraint or index on exactly column"""
+    for index in conn.execute(f"PRAGMA index_list({table})").fetchall():
+        columns = [info[2] for info in conn.execute(f"PRAGMA index_info({index[1]})")]
+        if index[2] and columns == [column]:
+            return True
+    return False
+
+def merge_duplicate_videos(conn):
+    """Keep the oldest row per file_path, moving playlist memberships of the others onto it; returns rows removed"""
+    conn.execute("DROP TABLE IF EXISTS temp.duplicate_videos")
+    conn.execute("""
+        CREATE TEMP TABLE duplicate_videos AS
+        SELECT v.id AS duplicate_id, k.keep_id
+        FROM videos v
+        JOIN (SELECT file_path, MIN(id) AS keep_id FROM videos GROUP BY file_path HAVING COUNT(*) > 1) k
+          ON v.file_path = k.file_path
+        WHERE v.id != k.keep_id
+    """)
+    conn.execute("""
+        UPDATE video_playlists
+        SET video_id = (SELECT keep_id FROM duplicate_videos WHERE duplicate_id = video_playlists.video_id)
+        WHERE video_id IN (SELECT duplicate_id FROM duplicate_videos)
+    """)
+    conn.execute("""
+        DELETE FROM video_playlists
+        WHERE video_id IN (SELECT keep_id FROM duplicate_videos)
+          AND id NOT IN (SELECT MIN(id) FROM video_playlists GROUP BY playlist_id, video_id)
+    """)
+    removed = conn.execute("DELETE FROM videos WHERE id IN (SELECT duplicate_id FROM duplicate_videos)").rowcount
+    conn.execute("DROP TABLE temp.duplicate_videos")
+    return removed
+
+def ensure_unique_paths(conn):
+    """Deduplicate and index videos.file_path and folders.folder_path where the schema doesn't already"""
+    for table, column in UNIQUE_PATHS:
+        if has_unique_index(conn, table, column):
+            continue
+        if table == 'videos':
+            removed = merge_duplicate_videos(conn)
+        else:
+            removed = conn.execute(
+                f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MIN(rowid) FROM {table} GROUP BY {column})"
+            ).rowcount
+        if removed:
+            logger.warning(f"Removed {removed} duplicate {table} rows before indexing {column}")
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_{column}_unique ON {table}({column})")
+    conn.commit()
+
 class ContentScanner:
-    def __init__(self):
+    def __init__(self, config=None, jobs=None):
+        self.config = config or load_scanner_config()
+        self.probe_workers = probe_worker_count(self.config, jobs)
         self.db_path = DATABASE_PATH
         self.content_path = CONTENT_PATH
         self.processed_count = 0
         self.error_count = 0
+        self.profile = load_profile()
+        self.profile_key = profile_key(self.profile)
+        self.schema_checked = False
+        self.progress = None      # optional progress(done, total, message) callback, e.g. a background job
+        self.last_report = None
+
+    def batch_writer(self):
+        """Writer for this scan's inserts and updates; videos go before the fingerprints that reference them"""
+        return BatchWriter(
+            get_database(self.db_path), (VIDEO_INSERT, VIDEO_UPDATE, RECORD_SQL),
+            max_rows=self.config['batch_rows'], max_seconds=self.config['batch_seconds']
+        )
 
     def get_db_connection(self):
-        """Create database connection with WAL mode optimization"""
+        """Shared persistent database connection (verdict columns and path indexes checked once)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.execute("PRAGMA journal_mode = WAL")
-            conn.execute("PRAGMA synchronous = NORMAL")
-            conn.execute("PRAGMA cache_size = 10000")
-            conn.row_factory = sqlite3.Row
+            conn = get_database(self.db_path).connection()
+            if not self.schema_checked:
+                ensure_columns(conn)
+                ensure_unique_paths(conn)
+                self.schema_checked = True
             return conn
         except Exception as e:
             logger.error(f"Database connection failed: {e}")
             raise
 
     def extract_metadata(self, file_path):
-        """Extract video metadata using FFprobe"""
+        """Extract video metadata from the container headers, or with FFprobe when they can't tell"""
         try:
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-print_format', 'json',
-                '-show_format', '-show_streams', str(file_path)
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            data = read_headers(file_path) if self.config['header_probe'] else None
+            if data is None:
+                cmd = [
+                    'ffprobe', '-v', 'quiet', '-print_format', 'json',
+                    '-show_format', '-show_streams', str(file_path)
+                ]
+                result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
 
-            if result.returncode != 0:
-                logger.warning(f"FFprobe failed for {file_path}: {result.stderr}")
-                return None
+                if result.returncode != 0:
+                    logger.warning(f"FFprobe failed for {file_path}: {result.stderr}")
+                    return None
 
-            data = json.loads(result.stdout)
+                data = json.loads(result.stdout)
 
             # Extract video stream info
             video_stream = next((s for s in data['streams'] if s['codec_type'] == 'video'), None)
@@ -84,6 +217,7 @@ class ContentScanner:
                 metadata.update({
                     'resolution': f"{width}x{height}" if width and height else '',
                     'codec': video_stream.get('codec_name', ''),
+                    'pix_fmt': video_stream.get('pix_fmt'),
                 })
 
             if audio_stream:
@@ -91,8 +225,12 @@ class ContentScanner:
                     'audio_codec': audio_stream.get('codec_name', ''),
                     'audio_bitrate': int(audio_stream.get('bit_rate', 0)) // 1000,
                     'audio_channels': audio_stream.get('channels', 0),
+                    'audio_rate': audio_stream.get('sample_rate'),
                 })
 
+            # Whether the publishers can stream-copy this file or must transcode it
+            metadata['encode_mode'] = classify(metadata, self.profile)
+
             return metadata
 
         except subprocess.TimeoutExpired:
@@ -102,79 +240,179 @@ class ContentScanner:
             logger.error(f"Metadata extraction failed for {file_path}: {e}")
             return None
 
-    def is_duplicate(self, conn, file_path):
-        """Check if file already exists in database"""
-        cursor = conn.execute("SELECT id FROM videos WHERE file_path = ?", (str(file_path),))
-        return cursor.fetchone() is not None
-
-    def add_video_to_db(self, conn, file_path, metadata):
-        """Add video to database with metadata"""
-        try:
-            filename = file_path.name
-            display_name = filename.rsplit('.', 1)[0]
-
-            cursor = conn.execute("""
-                INSERT INTO videos (
-                    filename, file_path, display_name, duration, file_size,
-                    format, resolution, bitrate, codec, audio_codec,
-                    audio_bitrate, audio_channels
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                filename, str(file_path), display_name,
-                metadata.get('duration'), metadata.get('file_size'),
-                metadata.get('format'), metadata.get('resolution'),
-                metadata.get('bitrate'), metadata.get('codec'),
-                metadata.get('audio_codec'), metadata.get('audio_bitrate'),
-                metadata.get('audio_channels')
-            ))
-
-            conn.commit()
-            return cursor.lastrowid
-
-        except sqlite3.IntegrityError:
-            logger.warning(f"Duplicate entry for {file_path}")
-            return None
-        except Exception as e:
-            logger.error(f"Database insert failed for {file_path}: {e}")
-            return None
+    def video_params(self, metadata):
+        """Metadata columns shared by VIDEO_INSERT and VIDEO_UPDATE"""
+        return (
+            metadata.get('duration'), metadata.get('file_size'),
+            metadata.get('format'), metadata.get('resolution'),
+            metadata.get('bitrate'), metadata.get('codec'),
+            metadata.get('audio_codec'), metadata.get('audio_bitrate'),
+            metadata.get('audio_channels'), metadata.get('encode_mode'),
+            self.profile_key
+        )
+
+    def add_video_to_db(self, writer, file_path, metadata):
+        """Queue a new video for the next batch"""
+        filename = file_path.name
+        display_name = filename.rsplit('.', 1)[0]
+        writer.add(VIDEO_INSERT, (filename, str(file_path), display_name, *self.video_params(metadata)))
+
+    def update_video_in_db(self, writer, video_id, metadata):
+        """Queue a changed file's metadata refresh; its thumbnail is cleared so the processor redoes it"""
+        writer.add(VIDEO_UPDATE, (*self.video_params(metadata), video_id))
+
+    def classify_existing(self, conn):
+        """Re-probe videos with no encode verdict, or one made for a different channel profile"""
+        rows = conn.execute("""
+            SELECT id, file_path FROM videos
+            WHERE encode_mode IS NULL OR encode_profile IS NULL OR encode_profile != ?
+        """, (self.profile_key,)).fetchall()
+
+        ids = {row['file_path']: row['id'] for row in rows if Path(row['file_path']).exists()}
+        classified = 0
+        with self.batch_writer() as writer:
+            for file_path, metadata in self.probe_files(ids):
+                if not metadata:
+                    continue
+                writer.add(
+                    "UPDATE videos SET encode_mode = ?, encode_profile = ? WHERE id = ?",
+                    (metadata['encode_mode'], self.profile_key, ids[file_path])
+                )
+                classified += 1
+
+        if classified:
+            logger.info(f"Classified {classified} existing videos for the current channel profile")
+        return classified
+
+    def probe_files(self, paths):
+        """FFprobe files on the worker pool; yields (path, metadata) in completion order
+
+        Only the probes run concurrently; the caller stays the single DB writer.
+        """
+        paths = list(paths)
+        if self.probe_workers == 1 or len(paths) < 2:
+            for path in paths:
+                yield path, self.extract_metadata(path)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.probe_workers, thread_name_prefix='ffprobe') as pool:
+            futures = {pool.submit(self.extract_metadata, path): path for path in paths}
+            try:
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
 
     def scan_directory(self, directory_path):
-        """Recursively scan directory for video files"""
-        video_files = []
-
+        """Recursively scan directory for video files; returns (path, stat) pairs"""
+        tree = walk_content(directory_path, SUPPORTED_FORMATS, logger)
+        for file_path in tree.invalid:
+            logger.warning(f"Invalid file: {file_path}")
+        return tree.videos
+
+    def missing_videos(self, known, seen, tree=None):
+        """{file_path: video_id} for library files the walk didn't find
+
+        With the walk's tree, files in directories it read are judged by the
+        walk alone; rows under a directory it could not read, or whose file
+        failed its stat, are kept. Rows outside the content tree, and every
+        row when there is no tree (watcher ingests), need an exists() check.
+        """
+        content_root = os.path.join(self.content_path, '')
+        trust_walk = tree is not None
+        missing = {
+            path: video_id for path, video_id in known.items()
+            if path not in seen and ((trust_walk and path.startswith(content_root)) or not os.path.exists(path))
+        }
+        if trust_walk:
+            for path in tree.undecided(missing):
+                del missing[path]
+        return missing
+
+    def cleanup_missing_files(self, conn, known, seen, tree=None):
+        """Remove database entries for files the walk didn't find (caller commits); returns the removed paths"""
+        missing = self.missing_videos(known, seen, tree)
+
+        if missing:
+            conn.executemany("DELETE FROM videos WHERE id = ?", [(video_id,) for video_id in missing.values()])
+            for path in missing:
+                del known[path]
+            logger.info(f"Removed {len(missing)} missing files from database")
+
+        return sorted(missing)
+
+    def content_hash(self, path):
+        """Partial content hash of a file, or None if it can't be read"""
         try:
-            for root, dirs, files in os.walk(directory_path):
-                for file in files:
-                    file_path = Path(root) / file
-                    if file_path.suffix.lower() in SUPPORTED_FORMATS:
-                        if file_path.is_file() and file_path.stat().st_size > 0:
-                            video_files.append(file_path)
-                        else:
-                            logger.warning(f"Invalid file: {file_path}")
-
-        except Exception as e:
-            logger.error(f"Directory scan failed for {directory_path}: {e}")
-
-        return video_files
-
-    def cleanup_missing_files(self, conn):
-        """Remove database entries for missing files"""
-        cursor = conn.execute("SELECT id, file_path FROM videos")
-        missing_files = []
-
-        for row in cursor.fetchall():
-            if not Path(row['file_path']).exists():
-                missing_files.append(row['id'])
+            return partial_hash(path)
+        except OSError as e:
+            logger.warning(f"Cannot hash {path}: {e}")
+            return None
 
-        if missing_files:
-            placeholders = ','.join('?' * len(missing_files))
-            conn.execute(f"DELETE FROM videos WHERE id IN ({placeholders})", missing_files)
-            conn.commit()
-            logger.info(f"Removed {len(missing_files)} missing files from database")
+    def resolve_identities(self, store, diff, seen, previous, known, tree=None):
+        """Match files the library doesn't know against vanished videos and each other by content
+
+        Returns (moves {new path: old path}, duplicates {path: original path},
+        hashes {path: content hash}). A rename within the filesystem keeps
+        size, mtime and inode, so it is matched without reading the file;
+        anything else is matched by partial hash. A vanished video with a
+        recorded copy still on disk moves to the copy.
+        """
+        gone = self.missing_videos(known, seen, tree)
+        moves, duplicates, hashes = {}, {}, {}
+        originals = {}  # content hash -> path of the file that backs the video
+
+        for path in diff.new:
+            if known.get(path):
+                hashes[path] = self.content_hash(path)
+                if hashes[path]:
+                    originals.setdefault(hashes[path], path)
+        fresh = [path for path in diff.new if not known.get(path)]
+
+        by_stat = {previous[path][0]: path for path in gone if path in previous}
+        by_hash = {previous[path][2]: path for path in gone if path in previous and previous[path][2]}
+        claimed = set()
+        unmatched = []
+        for path in fresh:
+            old = by_stat.get(seen[path])
+            if old and old not in claimed:
+                hashes[path] = previous[old][2]
+            else:
+                hashes[path] = self.content_hash(path)
+                old = by_hash.get(hashes[path])
+                if not old or old in claimed:
+                    unmatched.append(path)
+                    continue
+            moves[path] = old
+            claimed.add(old)
+            if hashes[path]:
+                originals[hashes[path]] = path
+
+        live = store.find_videos({hashes[path] for path in unmatched if hashes[path]})
+        for path in unmatched:
+            content = hashes[path]
+            if not content:
+                continue
+            original = originals.get(content) or live.get(content)
+            if original and original not in gone:
+                duplicates[path] = original
+            else:
+                originals[content] = path  # first copy seen becomes the video
+
+        # A copy left behind takes over from an original that is gone for good
+        orphans = {video_id: path for path, video_id in gone.items() if path not in claimed}
+        for video_id, copies in store.find_duplicates(orphans).items():
+            for path in copies:
+                if path in moves or path in duplicates or not self._still_there(path, seen):
+                    continue
+                moves[path] = orphans[video_id]
+                hashes[path] = store.load([path]).get(path, (None, None, None))[2]
+                break
 
-        return len(missing_files)
+        return moves, duplicates, hashes
 
-    def scan_folders(self, conn):
+    def scan_folders(self, conn, tree=None):
         """STREAMING SAFE: Scan and populate folder structure without disrupting active streaming"""
         try:
             logger.info("Scanning folder structure (streaming-safe mode)...")
@@ -184,62 +422,35 @@ class ContentScanner:
             existing_folders = {row[0]: row[1] for row in cursor.fetchall()}
             
             found_folders = {}
+            upserts = []
             folders_added = 0
             folders_updated = 0
 
-            # Walk through directory structure
-            for root, dirs, files in os.walk(self.content_path):
-                # Skip the root content directory itself
-                if root == self.content_path:
-                    continue
-
-                # Get relative path from content directory
-                rel_path = os.path.relpath(root, self.content_path)
-                folder_name = os.path.basename(root)
-
-                # Determine parent folder
-                parent_path = os.path.dirname(rel_path)
-                parent_folder = parent_path if parent_path != '.' else None
-
-                # Count video files in this folder (not subdirectories)
-                video_count = 0
-                for file in files:
-                    if Path(file).suffix.lower() in SUPPORTED_FORMATS:
-                        video_count += 1
-
+            # Folders (and their video counts) come from the same walk as the file list
+            tree = tree or walk_content(self.content_path, SUPPORTED_FORMATS, logger)
+            for rel_path, (folder_name, parent_folder, video_count) in tree.folders.items():
                 found_folders[rel_path] = video_count
 
-                # Check if folder exists and needs updating
-                if rel_path in existing_folders:
-                    if existing_folders[rel_path] != video_count:
-                        # Update existing folder
-                        conn.execute("""
-                            UPDATE folders SET video_count = ?, date_modified = CURRENT_TIMESTAMP
-                            WHERE folder_path = ?
-                        """, (video_count, rel_path))
-                        folders_updated += 1
-                        logger.info(f"Updated folder: {rel_path} ({video_count} videos)")
-                else:
-                    # Insert new folder
-                    try:
-                        conn.execute("""
-                            INSERT INTO folders 
-                            (folder_path, folder_name, parent_folder, video_count)
-                            VALUES (?, ?, ?, ?)
-                        """, (rel_path, folder_name, parent_folder, video_count))
-                        folders_added += 1
-                        logger.info(f"Added folder: {rel_path} ({video_count} videos)")
-                    except Exception as e:
-                        logger.error(f"Error adding folder {rel_path}: {e}")
-
-            # Remove folders that no longer exist (surgical removal)
-            folders_removed = 0
-            for existing_path in existing_folders:
-                if existing_path not in found_folders:
-                    conn.execute("DELETE FROM folders WHERE folder_path = ?", (existing_path,))
-                    folders_removed += 1
-                    logger.info(f"Removed missing folder: {existing_path}")
-
+                # Queue new folders and changed counts; written below in one batch
+                if rel_path not in existing_folders:
+                    upserts.append((rel_path, folder_name, parent_folder, video_count))
+                    folders_added += 1
+                    logger.info(f"Added folder: {rel_path} ({video_count} videos)")
+                elif existing_folders[rel_path] != video_count:
+                    upserts.append((rel_path, folder_name, parent_folder, video_count))
+                    folders_updated += 1
+                    logger.info(f"Updated folder: {rel_path} ({video_count} videos)")
+
+            # Remove folders that no longer exist (surgical removal); unreadable ones are left alone
+            kept = tree.undecided(os.path.join(self.content_path, path) for path in existing_folders)
+            removed = [path for path in existing_folders
+                       if path not in found_folders and os.path.join(self.content_path, path) not in kept]
+            for existing_path in removed:
+                logger.info(f"Removed missing folder: {existing_path}")
+            folders_removed = len(removed)
+
+            conn.executemany(FOLDER_UPSERT, upserts)
+            conn.executemany("DELETE FROM folders WHERE folder_path = ?", [(path,) for path in removed])
             conn.commit()
             logger.info(f"Folder scan completed: {folders_added} added, {folders_updated} updated, {folders_removed} removed")
             return folders_added + folders_updated
@@ -249,9 +460,32 @@ class ContentScanner:
             conn.rollback()
             return 0
 
-    def scan_content(self):
-        """Main scanning function with streaming-safe folder tracking"""
-        logger.info("Starting enhanced content scan (streaming-safe mode)...")
+    def refresh_folders(self, conn, directories):
+        """Recount just these folders; ones that are gone are removed with their subfolders"""
+        for directory in directories:
+            rel_path = os.path.relpath(directory, self.content_path)
+            if rel_path == '.' or rel_path.startswith('..'):
+                continue
+            if os.path.isdir(directory):
+                try:
+                    with os.scandir(directory) as entries:
+                        video_count = sum(1 for entry in entries if is_video_name(entry.name) and not entry.is_dir())
+                except OSError:
+                    continue
+                parent_folder = os.path.dirname(rel_path) or None
+                conn.execute(FOLDER_UPSERT, (rel_path, os.path.basename(rel_path), parent_folder, video_count))
+            else:
+                prefix = os.path.join(rel_path, '')
+                conn.execute(
+                    "DELETE FROM folders WHERE folder_path = ? OR substr(folder_path, 1, ?) = ?",
+                    (rel_path, len(prefix), prefix)
+                )
+                logger.info(f"Removed missing folder: {rel_path}")
+        conn.commit()
+
+    def scan_content(self, full=False):
+        """Main scanning function: incremental by default, only new, changed or vanished files touch the DB"""
+        logger.info(f"Starting {'full' if full else 'incremental'} content scan (streaming-safe mode)...")
 
         if not Path(self.content_path).exists():
             logger.error(f"Content directory not found: {self.content_path}")
@@ -259,49 +493,42 @@ class ContentScanner:
 
         try:
             conn = self.get_db_connection()
+            store = FingerprintStore(conn)
+            recorded = previous = store.load()
+            if full:
+                # Files look new again, but moves are still matched against what was recorded
+                store.clear()
+                recorded = {}
 
-            # STREAMING SAFE: Scan folders first using safe operations
-            folders_count = self.scan_folders(conn)
+            if self.progress:
+                self.progress(0, 0, 'Scanning directory structure...')
 
-            # Cleanup missing files first
-            self.cleanup_missing_files(conn)
+            # One pass over the tree feeds the folder table, the file list and the fingerprints
+            tree = walk_content(self.content_path, SUPPORTED_FORMATS, logger)
+            for file_path in tree.invalid:
+                logger.warning(f"Invalid file: {file_path}")
 
-            # Scan for video files
-            video_files = self.scan_directory(self.content_path)
-            total_files = len(video_files)
+            # STREAMING SAFE: Scan folders first using safe operations
+            folders_count = self.scan_folders(conn, tree)
 
+            # Compare the walk against what the last scan recorded
+            video_files = tree.videos
+            total_files = len(video_files)
             logger.info(f"Found {total_files} video files to process")
 
-            for i, file_path in enumerate(video_files, 1):
-                try:
-                    if self.is_duplicate(conn, file_path):
-                        continue
-
-                    metadata = self.extract_metadata(file_path)
-                    if not metadata:
-                        self.error_count += 1
-                        continue
-
-                    video_id = self.add_video_to_db(conn, file_path, metadata)
-                    if video_id:
-                        self.processed_count += 1
-                        logger.info(f"Added: {file_path.name} (ID: {video_id})")
-                    else:
-                        self.error_count += 1
-
-                    if i % 10 == 0 or i == total_files:
-                        progress = (i / total_files) * 100
-                        logger.info(f"Progress: {i}/{total_files} ({progress:.1f}%)")
-
-                except Exception as e:
-                    logger.error(f"Processing failed for {file_path}: {e}")
-                    self.error_count += 1
-                    continue
+            seen = {str(file_path): fingerprint(st) for file_path, st in video_files}
+            report, diff, adopted = self.sync_files(conn, store, seen, recorded, self.known_videos(conn), previous, tree)
+
+            self.classify_existing(conn)
 
-            conn.close()
+            self.write_scan_report(report, diff, adopted, total_files, full)
 
             logger.info(f"Enhanced content scan completed (streaming-safe):")
             logger.info(f"  Folders tracked: {folders_count}")
+            logger.info(f"  Unchanged: {diff.unchanged} files (skipped)")
+            logger.info(f"  Added: {len(report['added'])}, updated: {len(report['updated'])}, "
+                        f"moved: {len(report['moved'])}, removed: {len(report['removed'])}, already known: {adopted}")
+            logger.info(f"  Duplicates skipped: {len(report['duplicates'])}")
             logger.info(f"  Processed: {self.processed_count} files")
             logger.info(f"  Errors: {self.error_count} files")
             logger.info(f"  Total files found: {total_files}")
@@ -312,16 +539,164 @@ class ContentScanner:
             logger.error(f"Content scan failed: {e}")
             return False
 
+    def known_videos(self, conn, paths=None):
+        """{file_path: id} for the whole library, or just the given paths"""
+        if paths is None:
+            return {row['file_path']: row['id'] for row in conn.execute("SELECT id, file_path FROM videos")}
+        paths = [str(path) for path in paths]
+        known = {}
+        for start in range(0, len(paths), 500):
+            chunk = paths[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id, file_path FROM videos WHERE file_path IN ({','.join('?' * len(chunk))})", chunk
+            )
+            known.update({row['file_path']: row['id'] for row in rows})
+        return known
+
+    def _still_there(self, path, seen):
+        """Whether a file outside this walk's results exists; adds its fingerprint to seen if so"""
+        if path in seen:
+            return True
+        try:
+            seen[path] = fingerprint(os.stat(path))
+        except OSError:
+            return False
+        return True
+
+    def sync_files(self, conn, store, seen, recorded, known, previous=None, tree=None):
+        """Bring the DB in line with the files in seen; returns (report, diff, adopted count)
+
+        seen holds the current fingerprints of the files looked at, recorded
+        and known the stored state for at least those paths. Anything known
+        but not seen is treated as gone, unless a new file turns out to be it
+        moved. previous is what vanished files are matched against when
+        recorded was just cleared. tree is the walk seen came from, if any:
+        files it could not look at are neither removed nor forgotten.
+        """
+        diff = store.diff(seen, recorded)
+        previous = recorded if previous is None else previous
+
+        # Unchanged files whose videos row was deleted (e.g. from the web UI) get added back
+        for path in seen:
+            if path not in known and path not in diff.changed and (recorded.get(path) or (None, None, None))[1]:
+                diff.new.append(path)
+                diff.unchanged -= 1
+
+        moves, duplicates, hashes = self.resolve_identities(store, diff, seen, previous, known, tree)
+        for new_path, old_path in moves.items():
+            known[new_path] = known.pop(old_path)
+            logger.info(f"Moved: {old_path} -> {new_path} (ID: {known[new_path]})")
+
+        # Moves and cleanup of missing files first (one transaction with their fingerprints)
+        conn.executemany(MOVE_SQL, [move_params(old_path, new_path) for new_path, old_path in moves.items()])
+        undecided = tree.undecided(diff.missing) if tree is not None else set()
+        store.forget([path for path in diff.missing if path not in undecided])
+        removed = self.cleanup_missing_files(conn, known, seen, tree)
+        conn.executemany(RECORD_SQL, [record_params(path, seen[path], hashes[path]) for path in moves])
+        conn.commit()
+
+        report = {'added': [], 'updated': [], 'moved': sorted(moves), 'duplicates': sorted(duplicates),
+                  'removed': removed, 'errors': []}
+
+        # Changed fingerprints over the same bytes (touched, or copied back in place) need no probe
+        touched = []
+        for path in diff.changed:
+            hashes[path] = self.content_hash(path)
+            if hashes[path] and hashes[path] == recorded[path][2]:
+                touched.append(path)
+
+        # Files already in the library (first incremental scan, or added by the web UI) need no probe
+        adopted = [path for path in diff.new if known.get(path) and path not in moves]
+        probe = [Path(path) for path in diff.new if not known.get(path) and path not in duplicates]
+        probe += [Path(path) for path in diff.changed if path not in touched]
+        if probe:
+            logger.info(f"Probing {len(probe)} new or changed files with {self.probe_workers} FFprobe workers")
+
+        # Fingerprints recorded before content hashing get their hash a slice at a time
+        backfill = [
+            path for path, current in seen.items()
+            if path in recorded and recorded[path][0] == current and not recorded[path][2]
+        ][:self.config['hash_backfill']]
+
+        with self.batch_writer() as writer:
+            for path in adopted + touched:
+                writer.add(RECORD_SQL, record_params(path, seen[path], hashes[path]))
+            for path in backfill:
+                writer.add(RECORD_SQL, record_params(path, seen[path], self.content_hash(path)))
+
+            for i, (file_path, metadata) in enumerate(self.probe_files(probe), 1):
+                path = str(file_path)
+                video_id = known.get(path)
+
+                if not metadata:
+                    # Remember broken files too; they are retried once they change
+                    report['errors'].append(path)
+                    self.error_count += 1
+                elif video_id:
+                    self.update_video_in_db(writer, video_id, metadata)
+                    report['updated'].append(path)
+                    self.processed_count += 1
+                    logger.info(f"Updated: {file_path.name} (ID: {video_id})")
+                else:
+                    self.add_video_to_db(writer, file_path, metadata)
+                    report['added'].append(path)
+                    self.processed_count += 1
+                    logger.info(f"Added: {file_path.name}")
+                writer.add(RECORD_SQL, record_params(path, seen[path], hashes.get(path)))
+
+                if self.progress:
+                    self.progress(i, len(probe), file_path.name)
+                if i % 10 == 0 or i == len(probe):
+                    progress = (i / len(probe)) * 100
+                    logger.info(f"Progress: {i}/{len(probe)} ({progress:.1f}%)")
+
+            # Copies are recorded after the probes so an original added in this scan already has its row
+            for path, original in duplicates.items():
+                writer.add(RECORD_SQL, record_params(path, seen[path], hashes[path], original))
+                logger.warning(f"Duplicate: {path} is a copy of {original}; not added")
+
+        if adopted or touched or probe or duplicates:
+            logger.info(f"Wrote {len(adopted) + len(touched) + len(probe) + len(duplicates)} files "
+                        f"in {writer.commits} transactions")
+        return report, diff, len(adopted)
+
+    def write_scan_report(self, report, diff, adopted, total_files, full):
+        """Save what this scan changed for the admin UI (also kept as last_report)"""
+        summary = {
+            'scan_date': datetime.now().isoformat(),
+            'mode': 'full' if full else 'incremental',
+            'total_files': total_files,
+            'unchanged': diff.unchanged,
+            'already_known': adopted,
+            'counts': {name: len(paths) for name, paths in report.items()},
+            **{name: paths[:REPORT_LIST_LIMIT] for name, paths in report.items()},
+        }
+        self.last_report = summary
+        try:
+            with open(SCAN_REPORT_PATH, 'w') as f:
+                json.dump(summary, f, indent=2)
+        except Exception as e:
+            logger.warning(f"Could not write scan report: {e}")
+
 def main():
     """Main entry point"""
-    if len(sys.argv) > 1 and sys.argv[1] == '--help':
-        print("Usage: python3 content_scanner.py")
-        print("Scans /opt/streamserver/content/ for video files and adds them to database")
-        print("Now includes streaming-safe folder structure tracking for enhanced navigation")
-        return
-
-    scanner = ContentScanner()
-    success = scanner.scan_content()
+    parser = argparse.ArgumentParser(
+        description="Scans /opt/streamserver/content/ for video files and adds them to database. "
+                    "Only new, changed or removed files are processed unless --full is given."
+    )
+    parser.add_argument('--full', action='store_true',
+                        help="forget the recorded file fingerprints and look at every file again")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="concurrent FFprobe processes (capped in streaming-safe mode)")
+    parser.add_argument('--progress', action='store_true',
+                        help="accepted for the admin UI; progress is always logged")
+    args = parser.parse_args()
+
+    scanner = ContentScanner(jobs=args.jobs)
+    if scanner.config['streaming_safe']:
+        # Probes inherit this, so the live encoder always wins the CPU
+        os.nice(scanner.config['nice'])
+    success = scanner.scan_content(full=args.full)
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Content Watcher for The Houston Collective Streaming Server
+Ingests uploads as soon as they finish copying, using inotify instead of full content scans
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+from content_processor import ContentProcessor
+from content_scanner import ContentScanner
+from streamserver.fingerprints import FingerprintStore, fingerprint
+from streamserver.inotify import (
+    Inotify, IN_CLOSE_WRITE, IN_CREATE, IN_DELETE, IN_IGNORED, IN_ISDIR, IN_MODIFY,
+    IN_MOVED_FROM, IN_MOVED_TO, IN_ONLYDIR, IN_Q_OVERFLOW
+)
+from streamserver.library import is_video_name, walk_content
+
+# Setup logging (force: importing the scanner and processor already configured their own log files)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('/opt/streamserver/logs/content_watcher.log'),
+        logging.StreamHandler(sys.stdout)
+    ],
+    force=True
+)
+logger = logging.getLogger(__name__)
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MODIFY | IN_CREATE | IN_DELETE |
+              IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR)
+
+SETTLE_SECONDS = 2.0   # quiet time before a file is looked at
+INGEST_INTERVAL = 5.0  # ingest settled files at least this often while events keep arriving
+
+
+class ContentWatcher:
+    """Turns inotify events under the content directory into small incremental scans"""
+
+    def __init__(self, scanner, processor=None, settle_seconds=SETTLE_SECONDS):
+        self.scanner = scanner
+        self.processor = processor
+        self.settle_seconds = settle_seconds
+        self.inotify = Inotify()
+        self.watches = {}       # wd -> directory
+        self.directories = {}   # directory -> wd
+        self.pending = {}       # path -> [last event, size at last check, closed by its writer]
+        self.gone = set()       # video files deleted or moved away
+        self.gone_dirs = set()  # directories deleted or moved away
+        self.touched_dirs = set()
+        self.overflowed = False
+        self.last_ingest = time.monotonic()
+        self._store = None
+
+    # Watches
+
+    def watch_tree(self, directory):
+        """Watch a directory and everything below it; returns its walk"""
+        tree = walk_content(directory, logger=logger)
+        for rel_path in [''] + list(tree.folders):
+            self._add_watch(os.path.join(directory, rel_path) if rel_path else directory)
+        return tree
+
+    def _add_watch(self, directory):
+        if directory in self.directories:
+            return
+        try:
+            wd = self.inotify.add_watch(directory, WATCH_MASK)
+        except OSError as e:
+            # ENOSPC here means fs.inotify.max_user_watches is too low for the library
+            logger.warning(f"Cannot watch {directory}: {e}")
+            return
+        self.watches[wd] = directory
+        self.directories[directory] = wd
+
+    def _drop_watches(self, directory):
+        prefix = os.path.join(directory, '')
+        for watched in [d for d in self.directories if d == directory or d.startswith(prefix)]:
+            wd = self.directories.pop(watched)
+            self.watches.pop(wd, None)
+            self.inotify.rm_watch(wd)
+
+    # Events
+
+    def handle(self, wd, mask, cookie, name):
+        if mask & IN_Q_OVERFLOW:
+            self.overflowed = True
+            return
+        if mask & IN_IGNORED:
+            directory = self.watches.pop(wd, None)
+            if directory and self.directories.get(directory) == wd:
+                del self.directories[directory]
+            return
+
+        directory = self.watches.get(wd)
+        if directory is None or not name:
+            return
+        path = os.path.join(directory, name)
+
+        if mask & IN_ISDIR:
+            self.touched_dirs.add(directory)
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                # Files copied in before the watch existed never send events of their own
+                tree = self.watch_tree(path)
+                self.gone_dirs.discard(path)
+                self.touched_dirs.update([path] + [os.path.join(path, rel) for rel in tree.folders])
+                for file_path, st in tree.videos:
+                    self._touch(str(file_path), closed=True)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._drop_watches(path)
+                self.gone_dirs.add(path)
+                self.touched_dirs.add(path)
+            return
+
+        if not is_video_name(name):
+            return
+        self.touched_dirs.add(directory)
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self.pending.pop(path, None)
+            self.gone.add(path)
+        else:
+            self.gone.discard(path)
+            self._touch(path, closed=bool(mask & (IN_CLOSE_WRITE | IN_MOVED_TO)))
+
+    def _touch(self, path, closed=False):
+        state = self.pending.setdefault(path, [0, None, False])
+        state[0] = time.monotonic()
+        state[2] = closed
+
+    def settled(self):
+        """{path: stat} for pending files that have stopped changing"""
+        now = time.monotonic()
+        ready = {}
+        for path, state in list(self.pending.items()):
+            if now - state[0] < self.settle_seconds:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                self.gone.add(path)
+                continue
+
+            if st.st_size == 0 and (state[2] or state[1] == 0):
+                del self.pending[path]
+                logger.warning(f"Invalid file: {path}")
+            elif state[2] or st.st_size == state[1]:
+                # Closed by its writer, or the same size across two quiet checks
+                del self.pending[path]
+                ready[path] = st
+            else:
+                state[0], state[1] = now, st.st_size
+        return ready
+
+    # Ingest
+
+    def ingest(self):
+        """Probe, insert and thumbnail settled files; drop vanished ones"""
+        self.last_ingest = time.monotonic()
+        ready = self.settled()
+        if not (ready or self.gone or self.gone_dirs or self.touched_dirs):
+            return
+        if self.pending and (self.gone or self.gone_dirs):
+            # A move shows up as a delete plus a new file; keep them together so the video keeps its id
+            for path, st in ready.items():
+                self.pending[path] = [0, st.st_size, True]
+            return
+
+        conn = self.scanner.get_db_connection()
+        store = self._store = self._store or FingerprintStore(conn)
+        gone = set(self.gone)
+        for directory in self.gone_dirs:
+            gone.update(self._recorded_under(conn, directory))
+        gone = {path for path in gone if path not in self.pending and path not in ready}
+
+        seen = {path: fingerprint(st) for path, st in ready.items()}
+        paths = list(seen) + list(gone)
+        report, diff, adopted = self.scanner.sync_files(
+            conn, store, seen, store.load(paths), self.scanner.known_videos(conn, paths)
+        )
+        # Folder counts go by file name, so files still being copied are already included
+        self.scanner.refresh_folders(conn, self.touched_dirs)
+        self.gone.clear()
+        self.gone_dirs.clear()
+        self.touched_dirs.clear()
+
+        if any(report[name] for name in ('added', 'updated', 'moved', 'duplicates', 'removed')):
+            logger.info(f"Ingested: {len(report['added'])} added, {len(report['updated'])} updated, "
+                        f"{len(report['moved'])} moved, {len(report['duplicates'])} duplicates, "
+                        f"{len(report['removed'])} removed, {len(report['errors'])} errors")
+        self.make_thumbnails(conn, report['added'] + report['updated'])
+
+    def _recorded_under(self, conn, directory):
+        prefix = os.path.join(directory, '')
+        rows = conn.execute("""
+            SELECT file_path FROM videos WHERE substr(file_path, 1, ?) = ?
+            UNION SELECT file_path FROM file_fingerprints WHERE substr(file_path, 1, ?) = ?
+        """, (len(prefix), prefix, len(prefix), prefix))
+        return {row[0] for row in rows}
+
+    def make_thumbnails(self, conn, paths):
+        if not self.processor or not paths:
+            return
+        for path in paths:
+            row = conn.execute("SELECT id, duration FROM videos WHERE file_path = ?", (path,)).fetchone()
+            if row:
+                self.processor.generate_thumbnail(path, row['id'], row['duration'])
+                if self.processor.sprites_enabled and row['duration']:
+                    self.processor.generate_sprite(path, row['id'], row['duration'])
+
+    # Main loop
+
+    def catch_up(self):
+        """Incremental scan for whatever changed while nobody was watching (unchanged files are skipped)"""
+        self.scanner.scan_content()
+        self.pending.clear()
+        self.gone.clear()
+        self.gone_dirs.clear()
+        self.touched_dirs.clear()
+
+    def run(self):
+        content_path = self.scanner.content_path
+        self.watch_tree(content_path)
+        logger.info(f"Watching {len(self.directories)} directories under {content_path}")
+        self.catch_up()
+
+        while True:
+            outstanding = self.pending or self.gone or self.gone_dirs or self.touched_dirs
+            events = self.inotify.read(1.0 if outstanding else None)
+            for event in events:
+                self.handle(*event)
+
+            if self.overflowed:
+                logger.warning("inotify queue overflowed; rewatching and rescanning")
+                self.overflowed = False
+                self._drop_watches(content_path)
+                self.watch_tree(content_path)
+                self.catch_up()
+                continue
+
+            if not events or time.monotonic() - self.last_ingest >= INGEST_INTERVAL:
+                try:
+                    self.ingest()
+                except Exception as e:
+                    logger.error(f"Ingest failed: {e}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Real-time content ingest for SRS Streaming Server')
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help='Seconds a file must be quiet before it is ingested')
+    parser.add_argument('--no-thumbnails', action='store_true', help='Leave thumbnails and preview sprites to content_processor.py')
+    args = parser.parse_args()
+
+    scanner = ContentScanner()
+    processor = None if args.no_thumbnails else ContentProcessor()
+    watcher = ContentWatcher(scanner, processor, settle_seconds=args.settle)
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        logger.info("Content watcher interrupted by user")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -278,5 +278,101 @@ class Database {
         $stmt->execute([$searchTerm, $searchTerm]);
         return $stmt->fetchAll(PDO::FETCH_ASSOC);
     }
+    
+    // Background jobs, worked by scripts/job_worker.py
+    // Keep the schema in step with streamserver/jobs.py
+    private function ensureJobsTable() {
+        $this->db->exec("
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_type TEXT NOT NULL,
+                params TEXT,
+                priority INTEGER DEFAULT 0,
+                status TEXT DEFAULT 'queued',
+                progress REAL DEFAULT 0,
+                message TEXT,
+                result TEXT,
+                error TEXT,
+                date_created DATETIME DEFAULT CURRENT_TIMESTAMP,
+                date_started DATETIME,
+                date_finished DATETIME
+            )
+        ");
+        $this->db->exec("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority DESC, id)");
+    }
+    
+    public function submitJob($type, $params = [], $priority = 0) {
+        $this->ensureJobsTable();
+        $paramsJson = json_encode((object) $params);
+        
+        // An identical job still waiting in the queue is reused rather than stacked
+        $stmt = $this->db->prepare("SELECT id FROM jobs WHERE job_type = ? AND params = ? AND status = 'queued'");
+        $stmt->execute([$type, $paramsJson]);
+        $existing = $stmt->fetchColumn();
+        if ($existing) {
+            return (int) $existing;
+        }
+        
+        $stmt = $this->db->prepare("INSERT INTO jobs (job_type, params, priority) VALUES (?, ?, ?)");
+        $stmt->execute([$type, $paramsJson, $priority]);
+        return (int) $this->db->lastInsertId();
+    }
+    
+    public function getJob($id) {
+        $this->ensureJobsTable();
+        $stmt = $this->db->prepare("SELECT * FROM jobs WHERE id = ?");
+        $stmt->execute([$id]);
+        $job = $stmt->fetch(PDO::FETCH_ASSOC);
+        if ($job) {
+            $job['params'] = json_decode($job['params'] ?: '{}', true);
+            $job['result'] = $job['result'] ? json_decode($job['result'], true) : null;
+        }
+        return $job;
+    }
+    
+    public function getRecentJobs($limit = 20) {
+        $this->ensureJobsTable();
+        $stmt = $this->db->prepare("SELECT id, job_type, status, progress, message, error, date_created, date_started, date_finished FROM jobs ORDER BY id DESC LIMIT ?");
+        $stmt->execute([$limit]);
+        return $stmt->fetchAll(PDO::FETCH_ASSOC);
+    }
+    
+    // Quarantined media, written by the smart scheduler (scripts/streamserver/failures.py)
+    private function hasQuarantineColumns() {
+        $columns = $this->db->query("PRAGMA table_info(videos)")->fetchAll(PDO::FETCH_COLUMN, 1);
+        return in_array('quarantined', $columns);
+    }
+    
+    public function getQuarantinedVideos() {
+        if (!$this->hasQuarantineColumns()) {
+            return [];
+        }
+        $stmt = $this->db->query("
+            SELECT id, display_name, file_path, failure_count, last_failure, last_error, date_quarantined
+            FROM videos
+            WHERE quarantined = 1
+            ORDER BY date_quarantined DESC
+        ");
+        return $stmt->fetchAll(PDO::FETCH_ASSOC);
+    }
+    
+    public function releaseVideo($id) {
+        // The scheduler reloads failure state whenever the database changes, so this takes effect at once
+        if (!$this->hasQuarantineColumns()) {
+            return false;
+        }
+        $stmt = $this->db->prepare("UPDATE videos SET quarantined = 0, failure_count = 0, date_quarantined = NULL WHERE id = ?");
+        return $stmt->execute([$id]);
+    }
+    
+    // Thumbnails
+    public static function thumbnailVariant($thumbnailPath, $width, $height, $format = 'webp') {
+        // Content-addressed thumbnails get resized variants, rendered on first request by thumbnail_cache.py;
+        // sizes must be listed in config/thumbnail_cache.json. Legacy video_<id>.jpg paths are returned as they are.
+        if (!preg_match('#^(/assets/thumbnails/[0-9a-f]{2}/[0-9a-f]{16})\.jpg$#', (string) $thumbnailPath, $m)) {
+            return $thumbnailPath;
+        }
+        return "{$m[1]}-{$width}x{$height}.{$format}";
+    }
 }
 ?>
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Job Worker for The Houston Collective Streaming Server
+Runs scans, thumbnail passes and transcodes queued by the admin UI, off the web tier
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+import threading
+
+from content_processor import ContentProcessor
+from content_scanner import ContentScanner
+from streamserver.db import get_database
+from streamserver.events import ChangeNotifier, CONTROL, DB_CHANGED
+from streamserver.jobs import JobProgress, JobQueue
+from streamserver.renditions import RenditionCache, load_cache_config
+
+DATABASE_PATH = "/opt/streamserver/database/streaming.db"
+CONFIG_FILE = "/opt/streamserver/config/job_worker.json"
+
+DEFAULT_CONFIG = {
+    'max_workers': 2,
+    # Most jobs of one type allowed to run at once
+    'type_limits': {'scan': 1, 'thumbnails': 1, 'process_video': 2, 'rendition': 1},
+    'prune_days': 14,
+}
+
+# Setup logging (force: importing the scanner and processor already configured their own log files)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('/opt/streamserver/logs/job_worker.log'),
+        logging.StreamHandler(sys.stdout)
+    ],
+    force=True
+)
+logger = logging.getLogger(__name__)
+
+
+def load_worker_config(path=CONFIG_FILE):
+    """Default worker settings updated with config/job_worker.json if present"""
+    config = dict(DEFAULT_CONFIG)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+
+# Job handlers: (params, progress) -> JSON-friendly result; raise to fail the job
+
+def run_scan(params, progress):
+    scanner = ContentScanner()
+    scanner.progress = progress
+    if not scanner.scan_content(full=bool(params.get('full'))):
+        raise RuntimeError("Content scan failed; see content_scanner.log")
+    report = scanner.last_report or {'counts': {}}
+    counts = report['counts']
+    return {
+        'new_videos': counts.get('added', 0),
+        'updated_videos': counts.get('updated', 0),
+        'removed_videos': counts.get('removed', 0),
+        'moved_videos': counts.get('moved', 0),
+        'duplicates': counts.get('duplicates', 0),
+        'errors': counts.get('errors', 0),
+        'unchanged_videos': report.get('unchanged', 0),
+        'total_processed': report.get('total_files', 0),
+        'details': [f"Added: {os.path.basename(path)}" for path in report.get('added', [])[:50]] +
+                   [f"Error: {os.path.basename(path)}" for path in report.get('errors', [])[:50]],
+    }
+
+
+def run_thumbnails(params, progress):
+    processor = ContentProcessor()
+    processor.progress = progress
+    if not processor.process_all_videos(bool(params.get('regenerate'))):
+        raise RuntimeError("Thumbnail pass failed; see content_processor.log")
+    return {
+        'processed': processor.processed_count,
+        'thumbnails': processor.thumbnail_count,
+        'sprites': processor.sprite_count,
+        'errors': processor.error_count,
+    }
+
+
+def run_process_video(params, progress):
+    processor = ContentProcessor()
+    if not processor.process_video(int(params['video_id'])):
+        raise RuntimeError(f"Processing video {params['video_id']} failed")
+    return {'thumbnails': processor.thumbnail_count, 'sprites': processor.sprite_count}
+
+
+def run_rendition(params, progress):
+    cache = RenditionCache(DATABASE_PATH, load_cache_config(), logger=logger)
+    video = get_database(DATABASE_PATH).query_one(
+        "SELECT id, file_path, display_name, audio_codec FROM videos WHERE id = ?", (int(params['video_id']),)
+    )
+    if not video:
+        raise ValueError(f"Video {params['video_id']} not found")
+    progress(0, 1, f"Encoding {video['display_name']}")
+    if not cache.build(video):
+        raise RuntimeError(f"Rendition for {video['display_name']} failed")
+    cache.evict()
+    return {'rendition': cache.rendition_path(video['id'])}
+
+
+HANDLERS = {
+    'scan': run_scan,
+    'thumbnails': run_thumbnails,
+    'process_video': run_process_video,
+    'rendition': run_rendition,
+}
+
+
+class JobWorker:
+    """Claims queued jobs in priority order and runs them on threads, within the concurrency limits"""
+
+    def __init__(self, config=None):
+        self.config = config or load_worker_config()
+        self.queue = JobQueue(get_database(DATABASE_PATH))
+        self.notifier = ChangeNotifier(logger)
+        self.running = {}  # job id -> job type
+        self._lock = threading.Lock()
+
+    def busy_types(self):
+        """Job types at their concurrency limit"""
+        with self._lock:
+            running = list(self.running.values())
+        limits = self.config['type_limits']
+        return [job_type for job_type in HANDLERS if running.count(job_type) >= limits.get(job_type, 1)]
+
+    def start_jobs(self):
+        while len(self.running) < self.config['max_workers']:
+            job = self.queue.claim(self.busy_types())
+            if not job:
+                return
+            if job['job_type'] not in HANDLERS:
+                self.queue.fail(job['id'], f"Unknown job type: {job['job_type']}")
+                continue
+            with self._lock:
+                self.running[job['id']] = job['job_type']
+            threading.Thread(target=self.run_job, args=(job,), name=f"job-{job['id']}", daemon=True).start()
+
+    def run_job(self, job):
+        logger.info(f"Job {job['id']} ({job['job_type']}) started: {job['params']}")
+        try:
+            result = HANDLERS[job['job_type']](job['params'], JobProgress(self.queue, job['id']))
+            self.queue.finish(job['id'], result, message='Completed')
+            logger.info(f"Job {job['id']} ({job['job_type']}) finished")
+        except Exception as e:
+            self.queue.fail(job['id'], e)
+            logger.error(f"Job {job['id']} ({job['job_type']}) failed: {e}")
+        finally:
+            with self._lock:
+                self.running.pop(job['id'], None)
+            self.notifier.notify(CONTROL)
+
+    def run(self, idle_seconds=60):
+        requeued = self.queue.requeue_running()
+        if requeued:
+            logger.info(f"Requeued {requeued} jobs left running by a previous worker")
+        self.queue.prune(self.config['prune_days'])
+
+        # New jobs are rows in the database, so a DB write is the wake-up call
+        self.notifier.watch_files([(DATABASE_PATH, DB_CHANGED)])
+        logger.info(f"Job worker ready ({self.config['max_workers']} slots)")
+        while True:
+            self.start_jobs()
+            self.notifier.wait(idle_seconds)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Background job worker for SRS Streaming Server')
+    parser.add_argument('--submit', choices=sorted(HANDLERS), help='Queue a job and exit')
+    parser.add_argument('--params', default='{}', help='Job parameters as JSON (with --submit)')
+    parser.add_argument('--priority', type=int, default=0, help='Higher runs first (with --submit)')
+    args = parser.parse_args()
+
+    worker = JobWorker()
+    if args.submit:
+        job_id = worker.queue.submit(args.submit, json.loads(args.params), args.priority)
+        print(job_id)
+        return
+
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        logger.info("Job worker interrupted by user")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
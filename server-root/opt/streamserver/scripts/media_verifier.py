@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Media Verifier for The Houston Collective Streaming Server
+Fully decodes each library video in the background so corrupt regions are known before they go on air
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+from streamserver.events import ChangeNotifier, DB_CHANGED
+from streamserver.integrity import MediaVerifier, load_verifier_config
+
+DATABASE_PATH = "/opt/streamserver/database/streaming.db"
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('/opt/streamserver/logs/media_verifier.log'),
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def verify_pending(verifier, limit=None):
+    """Verify videos with no verdict for their current file (scheduled content first); returns how many"""
+    verified = 0
+    for video in verifier.pending_videos():
+        if limit is not None and verified >= limit:
+            break
+        if verifier.verify(video) is not None:
+            verified += 1
+    return verified
+
+
+def run_daemon(verifier, idle_seconds=600):
+    """Work through the library one file at a time, sleeping until the videos table changes when done"""
+    notifier = ChangeNotifier(logger)
+    notifier.watch_files([(DATABASE_PATH, DB_CHANGED)])
+
+    while True:
+        if verify_pending(verifier, limit=1):
+            time.sleep(verifier.config['pause_seconds'])
+            continue
+        notifier.wait(idle_seconds)
+
+
+def print_status(verifier):
+    summary = verifier.status_summary()
+    print(f"Media integrity: {sum(summary.values())} videos verified, {len(verifier.pending_videos())} pending")
+    for status, count in sorted(summary.items()):
+        print(f"  {status:10s} {count:6d} videos")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Full-decode media verifier for SRS Streaming Server')
+    parser.add_argument('--once', action='store_true', help='Verify everything pending, then exit')
+    parser.add_argument('--status', action='store_true', help='Show verdict counts')
+
+    args = parser.parse_args()
+
+    config = load_verifier_config()
+    verifier = MediaVerifier(DATABASE_PATH, config, logger=logger)
+
+    try:
+        if args.status:
+            print_status(verifier)
+            return
+        os.nice(config['nice'])
+        if args.once:
+            verified = verify_pending(verifier)
+            logger.info(f"Verified {verified} videos")
+        else:
+            if not config['enabled']:
+                logger.info("Media verifier disabled in config; exiting")
+                return
+            run_daemon(verifier)
+    except KeyboardInterrupt:
+        logger.info("Media verifier interrupted by user")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Rendition Cache Worker for The Houston Collective Streaming Server
+Encodes the library once to the channel profile in the background so the schedulers can stream with -c copy
+"""
+
+import sys
+import logging
+import argparse
+
+from streamserver.events import ChangeNotifier, DB_CHANGED
+from streamserver.renditions import RenditionCache, load_cache_config
+
+DATABASE_PATH = "/opt/streamserver/database/streaming.db"
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('/opt/streamserver/logs/rendition_cache.log'),
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def build_pending(cache, limit=None):
+    """Encode pending renditions (scheduled content first); returns how many were built"""
+    built = 0
+    for video in cache.pending_videos():
+        if limit is not None and built >= limit:
+            break
+        if cache.build(video):
+            built += 1
+        cache.evict()
+    return built
+
+
+def run_daemon(cache, idle_seconds=600):
+    """Keep the cache filled, sleeping until the videos table changes when there is nothing to do"""
+    notifier = ChangeNotifier(logger)
+    notifier.watch_files([(DATABASE_PATH, DB_CHANGED)])
+
+    removed = cache.remove_orphans()
+    if removed:
+        logger.info(f"Removed {removed} orphaned rendition files")
+
+    while True:
+        if build_pending(cache, limit=1):
+            continue
+        notifier.wait(idle_seconds)
+
+
+def print_status(cache):
+    summary = cache.status_summary()
+    print(f"Rendition cache: {cache.cache_dir} (profile {cache.key}, cap {cache.max_bytes / 1024 ** 3:.0f} GB)")
+    for status, info in sorted(summary.items()):
+        print(f"  {status:10s} {info['count']:6d} videos  {info['bytes'] / 1024 ** 3:8.1f} GB")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Rendition cache worker for SRS Streaming Server')
+    parser.add_argument('--once', action='store_true', help='Encode everything pending, then exit')
+    parser.add_argument('--evict', action='store_true', help='Enforce the size cap and remove orphaned files')
+    parser.add_argument('--status', action='store_true', help='Show cache status per state')
+
+    args = parser.parse_args()
+
+    config = load_cache_config()
+    cache = RenditionCache(DATABASE_PATH, config, logger=logger)
+
+    try:
+        if args.status:
+            print_status(cache)
+        elif args.evict:
+            cache.evict()
+            cache.remove_orphans()
+        elif args.once:
+            built = build_pending(cache)
+            logger.info(f"Built {built} renditions")
+        else:
+            if not config['enabled']:
+                logger.info("Rendition cache disabled in config; exiting")
+                return
+            run_daemon(cache)
+    except KeyboardInterrupt:
+        logger.info("Rendition worker interrupted by user")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,39 +4,62 @@ Smart Scheduler for The Houston Collective Streaming Server
 Advanced automation with priority resolution, intelligent gap filling, and emergency controls
 """
 
-import sqlite3
 import subprocess
 import time
 import logging
 import signal
 import sys
 import os
-import random
 import json
+from array import array
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from streamserver.adaptive import EncodingLadder
+from streamserver.checkpoint import PlaybackCheckpoint
+from streamserver.compat import COPY, AUDIO, encode_mode, ensure_columns
+from streamserver.db import get_database
+from streamserver.encoding import load_profile
+from streamserver.failures import FailureTracker
+from streamserver.failures import ensure_columns as ensure_failure_columns
+from streamserver.events import ChangeNotifier, DB_CHANGED, CONFIG_CHANGED, CONTROL, ENCODER_STALLED, LADDER_CHANGED
+from streamserver.integrity import MediaVerifier
+from streamserver.keyframes import seek_input_args
+from streamserver.progress import EncoderMonitor, EncoderWatchdog, progress_args
+from streamserver.publisher import GaplessPublisher
+from streamserver.renditions import RenditionCache, load_cache_config
+from streamserver.shuffle import PlayOrderStore
+from streamserver.timeline import ScheduleTimeline
+
 class SmartScheduler:
     def __init__(self):
         # Configuration
         self.db_path = '/opt/streamserver/database/streaming.db'
+        self.db = get_database(self.db_path)
+        self.schema_checked = False
         self.content_dir = '/opt/streamserver/content'
         self.log_dir = '/opt/streamserver/logs'
         self.config_dir = '/opt/streamserver/config'
+        self.schedule_table_file = f'{self.config_dir}/schedule_table.json'
+        self.encoder_status_file = f'{self.config_dir}/encoder_status.json'
         self.rtmp_url = 'rtmp://127.0.0.1:1935/live/test'
         
         # Current streaming state
         self.current_process = None
+        self.current_video = None
+        self.stream_start_at = 0.0  # seconds into the file the per-item stream started from
         self.current_playlist_id = None
-        self.current_video_index = 0
-        self.playlist_videos = []
+        self.play_order = None  # PlayOrder of the current playlist
+        self.segment_queue = []  # rest of a video being aired in parts around damaged regions
         self.is_running = False
         self.emergency_override = False
         self.override_playlist_id = None
         
         # Smart scheduling state
-        self.last_schedule_check = None
-        self.schedule_cache = []
+        self.timeline = ScheduleTimeline()
+        self.health_check_interval = 30  # HLS staleness backstop between events
+        self.analytics_interval = 3600
+        self.next_analytics_save = datetime.now() + timedelta(seconds=self.analytics_interval)
         self.analytics = {
             'streams_started': 0,
             'schedule_switches': 0,
@@ -49,11 +72,56 @@ class SmartScheduler:
         self.setup_logging()
         self.setup_directories()
         self.load_emergency_config()
+        self.load_scheduler_config()
+        
+        # Wake-ups: DB edits, emergency.json edits, signals and FFmpeg exits
+        self.notifier = ChangeNotifier(self.logger)
+        
+        # Live FFmpeg metrics: stalls wake the loop within a second, status goes to the dashboard
+        self.watchdog = EncoderWatchdog(self.notifier, self.encoder_status_file, logger=self.logger)
+        self.stream_monitor = None
+        self.encoder_stalled = False
+        self.ladder = EncodingLadder(self.scheduler_config['adaptive_encoding'], self.notifier, self.logger)
+        self.watchdog.listeners.append(self.ladder)
+        
+        # Gapless mode keeps one RTMP publish open across videos
+        self.publisher = None
+        self.on_air_item = None
+        self.prepared_for = None  # item whose successor has already been requested
+        self.prepared_state = None  # playlist position before that request, restored if the successor is dropped
+        
+        # Pre-encoded channel-profile copies; a miss falls back to live encoding
+        self.profile = load_profile()
+        cache_config = load_cache_config()
+        self.renditions = None
+        if cache_config['enabled']:
+            self.renditions = RenditionCache(self.db_path, cache_config, self.profile, self.logger)
+        
+        if self.scheduler_config['publisher_mode'] == 'gapless':
+            self.publisher = GaplessPublisher(self.rtmp_url, self.notifier, self.logger,
+                                              self.profile, self.renditions, self.watchdog)
+        
+        # On-air position checkpoint: restarts and crashes resume mid-video instead of from 0:00
+        self.checkpoint = PlaybackCheckpoint(self.db, self.scheduler_config['checkpoint_seconds'], self.logger)
+        self.resume_state = None
+        
+        # Failing videos back off and are quarantined instead of being retried forever
+        self.failures = FailureTracker(self.db, self.scheduler_config['failure_policy'], self.logger)
+        self.last_finished_item = None
+        self.recover_position = None  # (video, seconds) to resume once a dropped session may reopen
+        
+        # Full-decode verdicts from media_verifier.py: unplayable files are skipped, damaged ones trimmed
+        self.integrity = MediaVerifier(self.db_path, logger=self.logger)
+        
+        # Seeded shuffle per playlist: its pass survives restarts and switches, recent airings are held back
+        self.play_orders = PlayOrderStore(self.db, self.scheduler_config['no_repeat_hours'], self.logger)
+        self.aired_video = None
         
         # Signal handlers
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
         signal.signal(signal.SIGUSR1, self.emergency_override_handler)
+        signal.signal(signal.SIGHUP, self.reload_handler)
         
         self.logger.info("🧠 Smart Scheduler initialized with advanced features")
     
@@ -108,10 +176,31 @@ class SmartScheduler:
         except Exception as e:
             self.logger.warning(f"⚠️ Could not load emergency config: {e}")
     
+    def load_scheduler_config(self):
+        """Load publisher configuration"""
+        config_file = f'{self.config_dir}/scheduler.json'
+        self.scheduler_config = {
+            'publisher_mode': 'gapless',  # 'gapless' or 'per_item' (one FFmpeg/RTMP session per video)
+            'preroll_seconds': 5,         # spawn the next encoder this long before the boundary
+            'checkpoint_seconds': 30,     # how often the on-air position is written to the database
+            'resume_max_age': 6 * 3600,   # after a longer outage the playlist starts over instead
+            'no_repeat_hours': 4,         # shuffled picks pass over videos aired this recently on any playlist
+            'failure_policy': {},         # FailureTracker overrides (quarantine_after, backoff_seconds, ...)
+            'adaptive_encoding': {}       # EncodingLadder settings (ladder rungs, speed thresholds)
+        }
+        
+        try:
+            if os.path.exists(config_file):
+                with open(config_file, 'r') as f:
+                    self.scheduler_config.update(json.load(f))
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not load scheduler config: {e}")
+    
     def signal_handler(self, signum, frame):
         """Handle shutdown signals gracefully"""
         self.logger.info(f"📡 Received signal {signum}, shutting down gracefully...")
         self.save_analytics()
+        self.save_checkpoint(force=True)
         self.is_running = False
         self.stop_current_stream()
         sys.exit(0)
@@ -121,6 +210,12 @@ class SmartScheduler:
         self.logger.warning("🚨 Emergency override activated via signal!")
         self.emergency_override = True
         self.analytics['emergency_overrides'] += 1
+        self.notifier.notify(CONTROL)
+    
+    def reload_handler(self, signum, frame):
+        """Handle reload signal (SIGHUP) by recompiling the schedule immediately"""
+        self.logger.info("🔁 Reload requested via signal")
+        self.notifier.notify(DB_CHANGED)
     
     def cleanup_ffmpeg_processes(self):
         """Clean up any orphaned FFmpeg processes"""
@@ -150,91 +245,44 @@ class SmartScheduler:
 
 
     def get_db_connection(self):
-        """Get database connection with error handling"""
+        """Get the shared long-lived database connection"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
+            conn = self.db.connection()
+            if not self.schema_checked:
+                ensure_columns(conn)
+                ensure_failure_columns(conn)
+                self.schema_checked = True
             return conn
         except Exception as e:
             self.logger.error(f"❌ Database connection failed: {e}")
             self.analytics['errors'] += 1
             return None
     
-    def get_active_schedules(self):
-        """Get all potentially active schedules for intelligent analysis"""
-        now = datetime.now()
-        current_day = now.weekday()
-        current_day = 0 if current_day == 6 else current_day + 1  # Convert to our format
-        current_time = now.strftime('%H:%M')
-        
+    def refresh_schedule(self, force=False):
+        """Recompile the schedule timeline when the schedule tables change"""
         conn = self.get_db_connection()
         if not conn:
-            return []
+            return False
         
         try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT s.*, p.name as playlist_name, p.priority, p.playlist_type,
-                       p.shuffle_enabled, p.loop_enabled
-                FROM schedule s
-                JOIN playlists p ON s.playlist_id = p.id
-                WHERE s.is_active = 1 
-                AND (
-                    (s.day_of_week = ? AND s.start_time <= ? AND s.end_time > ?)
-                    OR (s.repeat_type = 'daily')
-                )
-                ORDER BY 
-                    CASE p.priority 
-                        WHEN 'high' THEN 3
-                        WHEN 'medium' THEN 2
-                        WHEN 'low' THEN 1
-                        ELSE 0
-                    END DESC,
-                    s.start_time
-            """, (current_day, current_time, current_time))
-            
-            schedules = cursor.fetchall()
-            conn.close()
-            
-            return [dict(schedule) for schedule in schedules]
-            
+            changed = self.timeline.load(conn)
         except Exception as e:
-            self.logger.error(f"❌ Error getting schedules: {e}")
+            self.logger.error(f"❌ Error loading schedules: {e}")
             self.analytics['errors'] += 1
-            conn.close()
-            return []
-    
-    def resolve_schedule_conflicts(self, schedules):
-        """Intelligent conflict resolution for overlapping schedules"""
-        if len(schedules) <= 1:
-            return schedules[0] if schedules else None
+            return False
         
-        now = datetime.now()
-        current_time = now.strftime('%H:%M')
-        
-        # Priority-based resolution
-        high_priority = [s for s in schedules if s['priority'] == 'high']
-        if high_priority:
-            winner = high_priority[0]
-            self.logger.info(f"🎯 Schedule conflict resolved: HIGH priority '{winner['playlist_name']}' wins")
-            return winner
-        
-        # Time-based resolution for same priority
-        medium_priority = [s for s in schedules if s['priority'] == 'medium']
-        if medium_priority:
-            # Choose the one that started most recently
-            winner = max(medium_priority, key=lambda x: x['start_time'])
-            self.logger.info(f"🎯 Schedule conflict resolved: Most recent medium priority '{winner['playlist_name']}'")
-            return winner
-        
-        # Default to first low priority
-        low_priority = [s for s in schedules if s['priority'] == 'low']
-        if low_priority:
-            winner = low_priority[0]
-            self.logger.info(f"🎯 Schedule conflict resolved: Low priority '{winner['playlist_name']}'")
-            return winner
-        
-        return schedules[0]
+        if changed or force:
+            upcoming = self.timeline.next_transition()
+            next_info = upcoming[0].strftime('%a %H:%M') if upcoming else 'none'
+            self.logger.info(f"📅 Schedule compiled: {len(self.timeline.rows)} rules, {len(self.timeline.table.changes)} weekly transitions, next at {next_info}")
+            
+            # Share the compiled week with the dashboard's now/next view
+            try:
+                self.timeline.table.save(self.schedule_table_file)
+            except Exception as e:
+                self.logger.warning(f"⚠️ Could not export schedule table: {e}")
+        
+        return changed
     
     def get_intelligent_fallback(self):
         """Smart fallback selection based on time patterns and usage"""
@@ -278,7 +326,6 @@ class SmartScheduler:
             """)
             
             result = cursor.fetchone()
-            conn.close()
             
             if result:
                 self.logger.info(f"🧠 Smart fallback for {time_context}: '{result['name']}' (Priority: {result['priority']})")
@@ -288,75 +335,251 @@ class SmartScheduler:
         except Exception as e:
             self.logger.error(f"❌ Error getting intelligent fallback: {e}")
             self.analytics['errors'] += 1
-            conn.close()
             return None
     
-    def get_playlist_videos(self, playlist_id, shuffle=False):
-        """Get videos from playlist with smart ordering"""
+    def load_play_order(self, playlist_id, shuffle=False):
+        """The playlist's video ids in sort order, continuing the pass it was on when last left"""
         conn = self.get_db_connection()
         if not conn:
-            return []
+            return None
         
         try:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT v.id, v.filename, v.file_path, v.display_name, v.duration,
-                       v.resolution, v.file_size, vp.sort_order
+                SELECT v.id, v.duration
                 FROM videos v
                 JOIN video_playlists vp ON v.id = vp.video_id
                 WHERE vp.playlist_id = ? AND v.is_active = 1
                 ORDER BY vp.sort_order, v.display_name
             """, (playlist_id,))
             
-            videos = cursor.fetchall()
-            conn.close()
-            
-            video_list = [dict(video) for video in videos]
-            
-            if shuffle:
-                random.shuffle(video_list)
-                self.logger.info(f"🎲 Shuffled {len(video_list)} videos in playlist {playlist_id}")
-            
-            return video_list
+            # One 8-byte id per row: the shuffle itself is computed a pick at a time
+            video_ids = array('q')
+            runtime = 0
+            for row in cursor:
+                video_ids.append(row['id'])
+                runtime += row['duration'] or 0
             
         except Exception as e:
             self.logger.error(f"❌ Error getting playlist videos: {e}")
             self.analytics['errors'] += 1
-            conn.close()
-            return []
+            return None
+        
+        order = self.play_orders.load(playlist_id, video_ids, shuffle, runtime)
+        if shuffle and video_ids:
+            self.logger.info(f"🎲 Shuffle pass {order.pass_number} of playlist {playlist_id}: {order.cursor} of {len(order)} aired")
+        return order
+    
+    def get_video(self, video_id):
+        """One active video with the columns playback needs, or None"""
+        conn = self.get_db_connection()
+        if not conn:
+            return None
+        
+        try:
+            row = conn.execute("""
+                SELECT id, filename, file_path, display_name, duration,
+                       resolution, file_size, codec, audio_codec,
+                       encode_mode, encode_profile
+                FROM videos
+                WHERE id = ? AND is_active = 1
+            """, (video_id,)).fetchone()
+            return dict(row) if row else None
+        except Exception as e:
+            self.logger.error(f"❌ Error getting video {video_id}: {e}")
+            self.analytics['errors'] += 1
+            return None
     
     def get_next_video(self, playlist_id, shuffle=False, loop=True):
         """Smart video selection with advanced playlist management"""
         # Reload playlist if changed
         if playlist_id != self.current_playlist_id:
-            self.playlist_videos = self.get_playlist_videos(playlist_id, shuffle)
+            self.play_order = self.load_play_order(playlist_id, shuffle)
             self.current_playlist_id = playlist_id
-            self.current_video_index = 0
-            self.logger.info(f"📋 Loaded playlist {playlist_id} with {len(self.playlist_videos)} videos")
+            self.segment_queue = []
+            self.logger.info(f"📋 Loaded playlist {playlist_id} with {len(self.play_order or ())} videos")
+        
+        # Next clean part of a video that is being aired around damaged regions
+        if self.segment_queue:
+            return self.segment_queue.pop(0)
         
-        if not self.playlist_videos:
+        order = self.play_order
+        if not order:
             self.logger.warning(f"⚠️ No videos found in playlist {playlist_id}")
             return None
         
-        # Get current video
-        if self.current_video_index < len(self.playlist_videos):
-            video = self.playlist_videos[self.current_video_index]
-        else:
-            if loop:
-                self.current_video_index = 0
-                video = self.playlist_videos[0]
-                self.logger.info("🔄 Playlist loop: restarting from beginning")
-            else:
-                self.logger.info("⏹️ Playlist ended (no loop)")
-                return None
+        # Get current video, passing over quarantined ones, ones backing off after a failure
+        # and ones another playlist aired within the no-repeat window
+        window = self.play_orders.window_for(order)
+        fallback = None
+        held_back = 0
+        for _ in range(len(order)):
+            if order.exhausted():
+                if not loop:
+                    self.logger.info("⏹️ Playlist ended (no loop)")
+                    return None
+                order.new_pass()
+                if order.shuffle:
+                    self.logger.info(f"🔄 Playlist loop: reshuffled for pass {order.pass_number}")
+                else:
+                    self.logger.info("🔄 Playlist loop: restarting from beginning")
+            video_id = order.take()
+            video = self.get_video(video_id) if video_id is not None else None
+            if video is None:
+                continue
+            
+            if not self.failures.playable(video):
+                self.logger.info(f"⏭️ Skipping {video['display_name']} ({self.failures.describe(video)})")
+                continue
+            if self.play_orders.held_back(video['id'], window):
+                held_back += 1
+                if fallback is None or self.play_orders.last_aired(video['id']) < self.play_orders.last_aired(fallback[0]['id']):
+                    fallback = (video, order.state())
+                continue
+            video = self.take_video(order, video)
+            if video:
+                if held_back:
+                    self.logger.info(f"⏭️ Passed over {held_back} videos aired in the last {window / 3600:.1f}h")
+                return video
+        
+        if fallback:
+            # Only the picks up to the least recently aired video are used up, not the whole scan
+            video, state = fallback
+            order.restore(state)
+            self.logger.info(f"⏭️ Everything playable aired in the last {window / 3600:.1f}h - repeating {video['display_name']}")
+            video = self.take_video(order, video)
+            if video:
+                return video
+        
+        self.logger.warning(f"⚠️ Every video in playlist {playlist_id} is quarantined or backing off")
+        return None
+    
+    def take_video(self, order, video, start_at=0.0):
+        """Commit a pick: save the playlist's place in its order and queue the video's clean parts; the first part or None"""
+        video['order_state'] = order.state()
+        parts = self.clean_parts(video, start_at)
+        if not parts:
+            self.logger.info(f"⏭️ Skipping {video['display_name']} (failed full-decode verification)")
+            return None
+        self.play_orders.save(order)
+        self.segment_queue = parts[1:]
+        return parts[0]
+    
+    def resume_playlist(self, playlist_id):
+        """After a restart, put a playlist back at the checkpointed pick; (video, start_at) or None"""
+        saved, self.resume_state = self.resume_state, None
+        if not saved or saved['playlist_id'] != playlist_id:
+            return None
+        
+        self.play_order = self.load_play_order(playlist_id, shuffle=True)
+        self.current_playlist_id = playlist_id
+        self.segment_queue = []
+        if not self.play_order or saved['video_id'] not in self.play_order.video_ids:
+            self.logger.info("📋 Checkpointed video is no longer in the playlist - starting over")
+            return None
         
-        # Advance to next video
-        self.current_video_index += 1
+        # The saved order may be a pick behind the playlist's own: a pre-spawned successor never aired
+        if self.play_order.restore(saved['play_order']):
+            self.logger.info(f"📋 Restored playlist {playlist_id} order from checkpoint (pick {self.play_order.cursor} of {len(self.play_order)})")
+        
+        video = self.get_video(saved['video_id'])
+        if not video or not self.failures.playable(video):
+            return self.get_next_video(playlist_id, shuffle=True, loop=True), 0.0
+        video = self.take_video(self.play_order, video, saved['position'])
+        if not video:
+            return self.get_next_video(playlist_id, shuffle=True, loop=True), 0.0
+        start_at = self.checkpoint.resume_point(video, saved['position'])
+        if start_at is None:
+            return self.get_next_video(playlist_id, shuffle=True, loop=True), 0.0
+        self.logger.info(f"⏩ Resuming {video['display_name']} at {start_at:.1f}s")
+        return video, start_at
+    
+    def clean_parts(self, video, start_at=0.0):
+        """The video split around regions the media verifier found damaged, from start_at on; [] if none can air"""
+        segments = self.integrity.segments(video)
+        if segments == [(0.0, None)]:
+            return [video]
+        parts = [dict(video, play_from=start, play_until=end) for start, end in segments
+                 if end is None or end > start_at]
+        if parts:
+            spans = ', '.join(f"{start:.0f}-{f'{end:.0f}s' if end is not None else 'end'}" for start, end in segments)
+            self.logger.info(f"✂️ Airing {video['display_name']} around damaged regions: {spans}")
+        return parts
+    
+    def resume_video(self, playlist_id, video, position):
+        """Restart a video near where it stopped after a crash; the next one if it was nearly over"""
+        start_at = self.checkpoint.resume_point(video, position)
+        if start_at is None:
+            video, start_at = self.get_next_video(playlist_id, shuffle=True, loop=True), 0.0
+        elif start_at:
+            self.logger.info(f"⏩ Resuming {video['display_name']} at {start_at:.1f}s")
         
-        return video
+        if video:
+            return self.start_video_stream(video, start_at=start_at)
+        self.logger.error(f"❌ No videos available in playlist {playlist_id}")
+        self.analytics['errors'] += 1
+        return False
+    
+    @staticmethod
+    def start_error(video):
+        if not os.path.exists(video['file_path']):
+            return f"File not found: {video['file_path']}"
+        return "FFmpeg failed to start"
+    
+    def on_air_seconds(self):
+        """How long the on-air video has been going out since it was last (re)started"""
+        if self.publisher:
+            item = self.publisher.current
+            return time.monotonic() - item.started_at if item and item.started_at else 0.0
+        metrics = self.stream_monitor.metrics if self.stream_monitor and self.current_process else {}
+        return metrics.get('out_time') or 0.0
+    
+    def on_air_position(self):
+        """(video, seconds into its file) currently going out, or None"""
+        if self.publisher:
+            return self.publisher.position()
+        if not self.current_video:
+            return None
+        metrics = self.stream_monitor.metrics if self.stream_monitor else {}
+        return self.current_video, self.stream_start_at + (metrics.get('out_time') or 0.0)
+    
+    def note_healthy_play(self):
+        """A video that has stayed on air long enough clears its failures and the circuit breaker"""
+        position = self.on_air_position()
+        if position:
+            self.failures.healthy(position[0], self.on_air_seconds())
+    
+    def load_failures(self):
+        """Failure counts and quarantine flags, including releases made from the dashboard"""
+        conn = self.get_db_connection()
+        if not conn:
+            return
+        try:
+            self.failures.load(conn)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not load video failure state: {e}")
+    
+    def save_checkpoint(self, force=False):
+        """Checkpoint the on-air position; only writes on a new video or every checkpoint_seconds"""
+        position = self.on_air_position()
+        if position and self.current_playlist_id is not None:
+            video, seconds = position
+            self.checkpoint.save(self.current_playlist_id, video, seconds, force)
+    
+    def note_airing(self):
+        """Stamp each video as it goes on air, for the no-repeat window"""
+        position = self.on_air_position()
+        if position and position[0] is not self.aired_video:
+            self.aired_video = position[0]
+            self.play_orders.aired(self.aired_video['id'])
     
     def stop_current_stream(self):
         """Stop current stream with enhanced error handling"""
+        if self.publisher:
+            self.publisher.stop()
+            self.on_air_item = None
+            return
+        
         if self.current_process:
             try:
                 self.logger.info("⏹️ Stopping current stream...")
@@ -371,54 +594,93 @@ class SmartScheduler:
                     self.current_process.wait()
                 
                 self.current_process = None
+                self.watchdog.unwatch('sink')
                 self.logger.info("✅ Stream stopped successfully")
                 
             except Exception as e:
                 self.logger.error(f"❌ Error stopping stream: {e}")
                 self.analytics['errors'] += 1
     
-    def start_video_stream(self, video, quality_preset="fast"):
-        """Enhanced video streaming with quality options"""
+    def start_video_stream(self, video, quality_preset="fast", start_at=0.0):
+        """Enhanced video streaming with quality options, optionally starting part way in"""
+        if self.publisher:
+            if not self.publisher.play(video, start_at):
+                self.analytics['errors'] += 1
+                self.failures.record(video, self.start_error(video))
+                return False
+            self.on_air_item = self.publisher.current
+            self.analytics['streams_started'] += 1
+            return True
+        
         video_path = video['file_path']
+        start_at = max(start_at, video.get('play_from') or 0.0)
+        stop_at = video.get('play_until')
+        self.current_video = video
+        self.stream_start_at = start_at
+        self.stream_monitor = None
         
         if not os.path.exists(video_path):
             self.logger.error(f"❌ Video file not found: {video_path}")
             self.analytics['errors'] += 1
+            self.failures.record(video, self.start_error(video))
             return False
         
+        rendition = self.renditions.lookup(video) if self.renditions else None
+        live_encode = False
+        rung = self.ladder.rung()  # adaptive ladder overrides for the live encode (preset and bitrate; no scaling here)
+        
         # Enhanced FFmpeg command with better quality settings
         ffmpeg_cmd = [
             'ffmpeg',
             '-re',  # Read at native frame rate
-            '-i', video_path,
+            *seek_input_args(video_path, start_at, until=stop_at),
             '-c:v', 'libx264',
-            '-preset', quality_preset,
+            '-preset', rung.get('preset', quality_preset),
             '-tune', 'zerolatency',  # Low latency streaming
             '-crf', '28',  # Constant quality
-            '-maxrate', '1500k',  # Max bitrate
-            '-bufsize', '4000k',  # Buffer size
+            '-maxrate', rung.get('maxrate', '1500k'),  # Max bitrate
+            '-bufsize', rung.get('bufsize', '4000k'),  # Buffer size
             '-c:a', 'aac',
             '-b:a', '128k',  # Audio bitrate
             '-f', 'flv',
             '-y',
             self.rtmp_url
         ]
+        if rendition:
+            ffmpeg_cmd = ['ffmpeg', '-re', *seek_input_args(rendition, start_at, until=stop_at), '-c', 'copy', '-f', 'flv', '-y', self.rtmp_url]
+        elif encode_mode(video, self.profile) in (COPY, AUDIO):
+            # Source is already H.264 in the channel shape; only the audio may need work
+            if encode_mode(video, self.profile) == COPY:
+                audio = ['-c:a', 'copy']
+            else:
+                audio = ['-c:a', 'aac', '-b:a', '128k']
+            ffmpeg_cmd = ['ffmpeg', '-re', *seek_input_args(video_path, start_at, until=stop_at), '-c:v', 'copy', *audio, '-f', 'flv', '-y', self.rtmp_url]
+        else:
+            live_encode = True
         
         try:
             duration_str = video.get('duration', 'Unknown')
             resolution_str = video.get('resolution', 'Unknown')
             file_size = video.get('file_size', 0)
             
-            self.logger.info(f"▶️ Starting stream: {video['display_name']}")
+            self.logger.info(f"▶️ Starting stream: {video['display_name']}{' (cached rendition)' if rendition else ''}")
             self.logger.info(f"📊 Video stats: {duration_str} duration, {resolution_str}, {file_size} bytes")
             
-            # Start FFmpeg with enhanced logging
+            # Start FFmpeg; reader threads drain both pipes so it can never block on them
+            ffmpeg_cmd[1:1] = progress_args('pipe:1')
             self.current_process = subprocess.Popen(
                 ffmpeg_cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 preexec_fn=os.setsid
             )
+            self.stream_monitor = EncoderMonitor('sink').attach(
+                self.current_process, self.current_process.stdout, self.current_process.stderr)
+            self.stream_monitor.adaptive = live_encode
+            self.stream_monitor.level = self.ladder.level
+            self.watchdog.watch(self.stream_monitor)
+            self.encoder_stalled = False
+            self.notifier.watch_process(self.current_process)
             
             self.analytics['streams_started'] += 1
         
@@ -427,6 +689,7 @@ class SmartScheduler:
         except Exception as e:
             self.logger.error(f"❌ Failed to start stream: {e}")
             self.analytics['errors'] += 1
+            self.failures.record(video, f"FFmpeg failed to start: {e}")
             return False
     
     def check_stream_health(self):
@@ -436,13 +699,11 @@ class SmartScheduler:
         
         poll_result = self.current_process.poll()
         if poll_result is not None:
-            # Get FFmpeg output for debugging
-            try:
-                stdout, stderr = self.current_process.communicate(timeout=1)
-                if stderr:
-                    error_snippet = stderr.decode()[-200:]  # Last 200 chars
-                    self.logger.warning(f"📺 Stream ended with code {poll_result}: ...{error_snippet}")
-            except:
+            # Last FFmpeg log lines for debugging
+            error_snippet = ' | '.join(self.stream_monitor.tail(3)) if self.stream_monitor else ''
+            if error_snippet:
+                self.logger.warning(f"📺 Stream ended with code {poll_result}: ...{error_snippet}")
+            else:
                 self.logger.info(f"📺 Stream ended with code: {poll_result}")
             
             self.current_process = None
@@ -450,14 +711,24 @@ class SmartScheduler:
             # CRITICAL FIX: Return different values based on exit code
             if poll_result == 0:
                 self.logger.info("✅ Video ended naturally - will advance to next video")
+                if self.current_video:
+                    self.failures.succeeded(self.current_video)
                 return "ended_naturally"
             else:
-                self.logger.warning(f"❌ Stream crashed with code {poll_result} - will retry same video")
+                self.logger.warning(f"❌ Stream crashed with code {poll_result}")
+                if self.current_video:
+                    self.failures.record(self.current_video, error_snippet or f"FFmpeg exited with code {poll_result}")
                 return False
         
-        # CRITICAL: Check if HLS files are being created
-        from pathlib import Path
-        import time
+        if self.encoder_stalled:
+            self.logger.warning("⚠️ Encoder stopped reporting progress - stream appears hung")
+            self.encoder_stalled = False
+            return False
+        
+        return self.check_hls_output()
+    
+    def check_hls_output(self):
+        """CRITICAL: Check if HLS files are being created"""
         hls_path = Path("/opt/streamserver/srs/hls/live/test.m3u8")
         if not hls_path.exists():
             self.logger.warning("⚠️ HLS playlist file missing")
@@ -470,6 +741,92 @@ class SmartScheduler:
         
         return True
     
+    def manage_gapless_stream(self, target_playlist_id, schedule_source):
+        """Gapless mode: cut on playlist changes, pre-spawn the next video before each boundary"""
+        publisher = self.publisher
+        playlist_changed = target_playlist_id != self.current_playlist_id
+        
+        # Account for the item that just ended: a feeder that failed is skipped past by the handover
+        finished = publisher.last_finished
+        if finished is not self.last_finished_item:
+            self.last_finished_item = finished
+            if finished.returncode:
+                self.failures.record(finished.video, ' | '.join(finished.monitor.tail(3)))
+            else:
+                self.failures.succeeded(finished.video)
+        
+        if not playlist_changed and self.failures.channel_wait() > 0:
+            return  # circuit breaker open: the channel itself is failing, so space the restarts out
+        
+        if playlist_changed or not publisher.is_alive() or not publisher.current:
+            resumed = None
+            if playlist_changed:
+                self.logger.info(f"🔄 Switching to playlist {target_playlist_id} (Source: {schedule_source})")
+                self.forget_prepared()  # the old playlist keeps the successor it had lined up
+                resumed = self.resume_playlist(target_playlist_id)
+                self.recover_position = None
+            elif publisher.current and not publisher.is_alive():
+                # The session dropped under a playing video: charge it, then pick it up where it stopped
+                self.logger.warning("🚨 Publisher session down - reopening RTMP")
+                self.recover_position = publisher.position()
+                self.forget_prepared()
+                publisher.stop()
+                self.failures.record(self.recover_position[0], ' | '.join(publisher.relay_monitor.tail(3)))
+                if self.failures.channel_wait() > 0:
+                    return
+            elif not self.recover_position:
+                if not publisher.is_alive():
+                    self.logger.warning("🚨 Publisher session down - reopening RTMP")
+                else:
+                    self.logger.warning("⚠️ Next video was not ready at the boundary")
+            
+            position, self.recover_position = self.recover_position, None
+            if position and self.failures.playable(position[0]):
+                self.resume_video(target_playlist_id, *position)
+                return
+            
+            video, start_at = resumed or (self.get_next_video(target_playlist_id, shuffle=True, loop=True), 0.0)
+            if video:
+                self.start_video_stream(video, start_at=start_at)
+            else:
+                self.logger.error(f"❌ No videos available in playlist {target_playlist_id}")
+                self.analytics['errors'] += 1
+            return
+        
+        # Seamless handover happened inside the publisher
+        if publisher.current is not self.on_air_item:
+            self.on_air_item = publisher.current
+            self.analytics['streams_started'] += 1
+            self.logger.info(f"▶️ Now playing: {self.on_air_item.video['display_name']} (no RTMP reconnect)")
+        
+        if self.encoder_stalled or not self.check_hls_output():
+            self.logger.warning("🚨 Stream unhealthy - restarting current video where it stopped")
+            self.encoder_stalled = False
+            video, position = publisher.position()
+            self.forget_prepared()
+            self.publisher.start()
+            self.resume_video(target_playlist_id, video, position)
+            return
+        
+        # Pre-spawn the next encoder so the boundary is a pipe switch, not a restart
+        remaining = publisher.remaining()
+        if (remaining is not None and remaining <= self.scheduler_config['preroll_seconds']
+                and self.prepared_for is not publisher.current):
+            self.prepared_for = publisher.current
+            self.prepared_state = (self.play_order.state() if self.play_order else None, list(self.segment_queue))
+            video = self.get_next_video(target_playlist_id, shuffle=True, loop=True)
+            if video:
+                publisher.prepare(video)
+    
+    def forget_prepared(self):
+        """Give back the video taken for the pre-spawned successor when the on-air one is restarted"""
+        if self.prepared_for is not None and self.prepared_for is self.publisher.current and self.prepared_state:
+            state, self.segment_queue = self.prepared_state
+            if state and self.play_order and self.play_order.restore(state):
+                self.play_orders.save(self.play_order)
+        self.prepared_for = None
+        self.prepared_state = None
+    
     def save_analytics(self):
         """Save analytics and runtime statistics"""
         try:
@@ -495,12 +852,8 @@ class SmartScheduler:
         except Exception as e:
             self.logger.error(f"❌ Failed to save analytics: {e}")
     
-    def run_smart_cycle(self):
-        """Main intelligent scheduling cycle with enhanced stream management"""
-        target_playlist_id = None
-        schedule_source = "fallback"
-        
-        # CRITICAL FIX: Periodically check for override clearing
+    def check_override_config(self):
+        """Pick up override clearing written to emergency.json by the web interface"""
         try:
             config_file = f'{self.config_dir}/emergency.json'
             if os.path.exists(config_file):
@@ -512,28 +865,28 @@ class SmartScheduler:
                             self.emergency_override = False
         except Exception as e:
             self.logger.warning(f"⚠️ Error checking override config: {e}")
-
-
+    
+    def run_smart_cycle(self):
+        """Main intelligent scheduling cycle with enhanced stream management"""
+        target_playlist_id = None
+        schedule_source = "fallback"
+        
         # Check for emergency override
         if self.emergency_override and self.override_playlist_id:
             target_playlist_id = self.override_playlist_id
             schedule_source = "emergency_override"
             self.logger.warning(f"🚨 Emergency override active: playlist {target_playlist_id}")
         else:
-            # Get active schedules
-            active_schedules = self.get_active_schedules()
-            
-            if active_schedules:
-                # Resolve conflicts intelligently
-                winning_schedule = self.resolve_schedule_conflicts(active_schedules)
-                if winning_schedule:
-                    target_playlist_id = winning_schedule['playlist_id']
-                    schedule_source = f"schedule_{winning_schedule['id']}"
-                    
-                    # Log schedule switches
-                    if target_playlist_id != self.current_playlist_id:
-                        self.analytics['schedule_switches'] += 1
-                        self.logger.info(f"📅 Schedule switch: {winning_schedule['playlist_name']} ({winning_schedule['start_time']}-{winning_schedule['end_time']})")
+            # Precompiled week table already holds the conflict-resolved winner
+            winning_schedule = self.timeline.current(datetime.now())
+            if winning_schedule:
+                target_playlist_id = winning_schedule['playlist_id']
+                schedule_source = f"schedule_{winning_schedule['id']}"
+                
+                # Log schedule switches
+                if target_playlist_id != self.current_playlist_id:
+                    self.analytics['schedule_switches'] += 1
+                    self.logger.info(f"📅 Schedule switch: {winning_schedule['playlist_name']} ({winning_schedule['start_time']}-{winning_schedule['end_time']})")
             
             # Intelligent fallback if no schedule
             if not target_playlist_id:
@@ -546,6 +899,10 @@ class SmartScheduler:
             self.logger.warning("⚠️ No playlist available for streaming")
             return
         
+        if self.publisher:
+            self.manage_gapless_stream(target_playlist_id, schedule_source)
+            return
+        
         # Check stream health with enhanced detection
         stream_health = self.check_stream_health()
         playlist_changed = target_playlist_id != self.current_playlist_id
@@ -563,58 +920,121 @@ class SmartScheduler:
             # Stream unhealthy or playlist change needed
             if playlist_changed:
                 self.logger.info(f"🔄 Switching to playlist {target_playlist_id} (Source: {schedule_source})")
+                self.stop_current_stream()
+                # Get next video with smart selection, or the checkpointed one after a restart
+                resumed = self.resume_playlist(target_playlist_id)
+                video, start_at = resumed or (self.get_next_video(target_playlist_id, shuffle=True, loop=True), 0.0)
+                if video:
+                    self.start_video_stream(video, start_at=start_at)
+                else:
+                    self.logger.error(f"❌ No videos available in playlist {target_playlist_id}")
+                    self.analytics['errors'] += 1
             else:
-                self.logger.warning("🚨 Stream unhealthy - restarting current video")
-                # Don't advance index on crash - retry same video
-                if self.current_video_index > 0:
-                    self.current_video_index -= 1
-            
-            self.stop_current_stream()
-            
-            # Get next video with smart selection
-            video = self.get_next_video(target_playlist_id, shuffle=True, loop=True)
-            if video:
-                self.start_video_stream(video)
-            else:
-                self.logger.error(f"❌ No videos available in playlist {target_playlist_id}")
-                self.analytics['errors'] += 1
+                # Circuit breaker open: the channel itself is failing, so space the restarts out
+                if self.failures.channel_wait() > 0:
+                    return
+                
+                # Pick the same video up where it stopped, unless it has failed too often
+                position = self.on_air_position()
+                self.stop_current_stream()
+                if position and self.failures.playable(position[0]):
+                    self.logger.warning("🚨 Stream unhealthy - restarting current video where it stopped")
+                    self.resume_video(target_playlist_id, *position)
+                else:
+                    self.logger.warning("🚨 Stream unhealthy - skipping to the next playable video")
+                    video = self.get_next_video(target_playlist_id, shuffle=True, loop=True)
+                    if video:
+                        self.start_video_stream(video)
+                    else:
+                        self.logger.error(f"❌ No playable videos in playlist {target_playlist_id}")
+                        self.analytics['errors'] += 1
+    
+    def seconds_until_next_event(self, now=None):
+        """Sleep budget: next schedule boundary, health backstop or analytics save"""
+        now = now or datetime.now()
+        deadlines = [self.health_check_interval, (self.next_analytics_save - now).total_seconds()]
+        
+        upcoming = self.timeline.next_transition(now)
+        if upcoming:
+            deadlines.append((upcoming[0] - now).total_seconds())
+        
+        # Wake in time to prepare the next video before the current one ends
+        if self.publisher and self.publisher.current and self.prepared_for is not self.publisher.current:
+            remaining = self.publisher.remaining()
+            if remaining is not None:
+                deadlines.append(remaining - self.scheduler_config['preroll_seconds'])
+        
+        # Circuit breaker back-off, or the first failed video becoming playable again when nothing is on air
+        if self.failures.channel_wait():
+            deadlines.append(self.failures.channel_wait())
+        on_air = self.publisher.current if self.publisher else self.current_process
+        if not on_air:
+            retry = self.failures.retry_in()
+            if retry is not None:
+                deadlines.append(retry)
+        
+        return max(0, min(deadlines))
+    
+    def handle_notifications(self, reasons):
+        """Apply wake-up reasons before the next cycle"""
+        if CONFIG_CHANGED in reasons or CONTROL in reasons:
+            self.check_override_config()
+        if DB_CHANGED in reasons:
+            self.refresh_schedule()
+            self.load_failures()
+        if ENCODER_STALLED in reasons:
+            self.encoder_stalled = True
+        if LADDER_CHANGED in reasons:
+            # Per-item mode picks the new rung up with the next video
+            if self.ladder.apply(self.publisher) and self.publisher:
+                self.on_air_item = self.publisher.current
+                self.prepared_for = None
     
     def run(self):
-        """Main smart scheduler loop with enhanced monitoring"""
+        """Main smart scheduler loop: sleep until the next transition or change notification"""
         self.logger.info("🧠 Starting Smart Scheduler with advanced features...")
         self.is_running = True
         
         # Clean up any orphaned processes at startup
         self.cleanup_ffmpeg_processes()
-        cycle_count = 0
+        
+        self.notifier.watch_files([
+            (self.db_path, DB_CHANGED),
+            (f'{self.config_dir}/emergency.json', CONFIG_CHANGED),
+        ])
+        self.watchdog.start()
+        self.refresh_schedule(force=True)
+        self.check_override_config()
+        self.resume_state = self.checkpoint.load(self.scheduler_config['resume_max_age'])
+        self.play_orders.load_airings()
+        self.load_failures()
+        self.next_analytics_save = datetime.now() + timedelta(seconds=self.analytics_interval)
         
         while self.is_running:
             try:
-                cycle_count += 1
                 self.run_smart_cycle()
+                self.save_checkpoint()
+                self.note_airing()
+                self.note_healthy_play()
                 
                 # Periodic analytics save with robust error handling
-                # Periodic analytics save with robust error handling
-                if cycle_count % 360 == 0:  # Every hour (360 cycles * 10s = 1 hour)
+                if datetime.now() >= self.next_analytics_save:
+                    self.next_analytics_save = datetime.now() + timedelta(seconds=self.analytics_interval)
                     try:
                         self.save_analytics()
                         self.logger.info(f"📊 Hourly stats: {self.analytics['streams_started']} streams, {self.analytics['errors']} errors")
                     except Exception as e:
                         self.logger.warning(f"⚠️ Analytics save failed: {e}")
                 
-                # Wait 10 seconds with graceful shutdown check
-                for i in range(10):
-                    if not self.is_running:
-                        break
-                    time.sleep(1)
+                # Sleep until the next boundary unless something changes first
+                reasons = self.notifier.wait(self.seconds_until_next_event())
+                self.handle_notifications(reasons)
                     
             except Exception as e:
                 self.logger.error(f"❌ Smart scheduler cycle error: {e}")
                 self.analytics['errors'] += 1
                 time.sleep(30)  # Wait before retrying on error
         
-        self.save_analytics()
-        
         self.save_analytics()
         self.logger.info("🧠 Smart Scheduler stopped")
 
@@ -1,46 +1,65 @@
 #!/usr/bin/env python3
 """
 Smooth Smart Scheduler for The Houston Collective Streaming Server
-Enhanced with gapless video transitions using FFmpeg concat
+Enhanced with gapless video transitions: one long-lived encoder fed item by item through a pipe
 """
 
-import sqlite3
-import subprocess
 import time
 import logging
 import signal
 import sys
-import os
 import random
 import json
-import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from streamserver.adaptive import EncodingLadder
+from streamserver.db import get_database
+from streamserver.events import ChangeNotifier, DB_CHANGED, ENCODER_STALLED, LADDER_CHANGED
+from streamserver.progress import EncoderWatchdog
+from streamserver.publisher import ChannelEncoder
+from streamserver.renditions import RenditionCache, load_cache_config
+
 class SmoothSmartScheduler:
     def __init__(self):
         # Core settings
         self.base_dir = Path("/opt/streamserver")
         self.rtmp_url = 'rtmp://127.0.0.1:1935/live/test'
         self.db_path = self.base_dir / "database" / "streaming.db"
-        self.concat_file = self.base_dir / "temp" / "playlist.txt"
+        self.db = get_database(self.db_path)
         self.logs_dir = self.base_dir / "logs"
         
-        # Ensure temp directory exists
-        (self.base_dir / "temp").mkdir(exist_ok=True)
-        
         # Streaming state
-        self.current_process = None
         self.current_playlist_id = None
         self.playlist_videos = []
         self.current_video_index = 0
         self.is_running = False
-        self.concat_queue = []  # Queue of videos for concat file
+        self.video_queue = []  # Upcoming videos, re-evaluated every time an item is needed
         self.queue_size = 5  # Number of videos to queue ahead
+        self.playlist_dirty = False  # Playlist edited in the DB since it was loaded
+        self.target_playlist_id = None  # Chosen at stream start; kept until the schedule or playlists change
+        self.target_context = None
+        self.db_fingerprints = None  # (playlist memberships, playlists) as of the last DB change
+        self.preroll_seconds = 5  # Spawn the next feeder this long before the boundary
+        self.on_air_item = None
+        self.prepared_for = None
+        self.analytics_interval = 3600
         
         # Setup logging
         self.setup_logging()
         
+        # One encoder holds the RTMP publish; Python decides what feeds it next
+        self.notifier = ChangeNotifier(self.logger)
+        self.watchdog = EncoderWatchdog(self.notifier, str(self.base_dir / "config" / "encoder_status.json"),
+                                        logger=self.logger)
+        self.encoder_stalled = False
+        self.ladder = EncodingLadder(notifier=self.notifier, logger=self.logger)
+        self.watchdog.listeners.append(self.ladder)
+        cache_config = load_cache_config()
+        renditions = RenditionCache(self.db_path, cache_config, logger=self.logger) if cache_config['enabled'] else None
+        self.publisher = ChannelEncoder(self.rtmp_url, self.notifier, self.logger,
+                                        renditions=renditions, watchdog=self.watchdog)
+        
         # Analytics
         self.analytics = {
             'streams_started': 0,
@@ -77,11 +96,9 @@ class SmoothSmartScheduler:
         self.analytics_logger.setLevel(logging.INFO)
 
     def get_db_connection(self):
-        """Get database connection with error handling"""
+        """Get the shared long-lived database connection"""
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            conn.row_factory = sqlite3.Row
-            return conn
+            return self.db.connection()
         except Exception as e:
             self.logger.error(f"❌ Database connection failed: {e}")
             return None
@@ -96,7 +113,7 @@ class SmoothSmartScheduler:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT v.id, v.filename, v.file_path, v.display_name, v.duration,
-                       v.resolution, v.file_size, vp.sort_order
+                       v.resolution, v.file_size, v.codec, v.audio_codec, vp.sort_order
                 FROM videos v
                 JOIN video_playlists vp ON v.id = vp.video_id
                 WHERE vp.playlist_id = ? AND v.is_active = 1
@@ -104,7 +121,6 @@ class SmoothSmartScheduler:
             """, (playlist_id,))
 
             videos = cursor.fetchall()
-            conn.close()
 
             video_list = [dict(video) for video in videos]
 
@@ -117,146 +133,152 @@ class SmoothSmartScheduler:
         except Exception as e:
             self.logger.error(f"❌ Error getting playlist videos: {e}")
             self.analytics['errors'] += 1
-            if conn:
-                conn.close()
             return []
 
-    def create_concat_file(self):
-        """Create FFmpeg concat file with queued videos"""
-        try:
-            with open(self.concat_file, 'w') as f:
-                for video_path in self.concat_queue:
-                    # Escape single quotes and backslashes for FFmpeg
-                    safe_path = str(video_path).replace("'", "'\\''")
-                    f.write(f"file '{safe_path}'\n")
-            
-            self.logger.info(f"📝 Created concat file with {len(self.concat_queue)} videos")
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"❌ Error creating concat file: {e}")
-            return False
-
     def update_video_queue(self, playlist_id, shuffle=False, loop=True):
         """Update the video queue for smooth playback"""
-        # Reload playlist if changed
-        if playlist_id != self.current_playlist_id:
-            self.playlist_videos = self.get_playlist_videos(playlist_id, shuffle)
+        # Reload playlist if changed (or edited since it was loaded)
+        if playlist_id != self.current_playlist_id or self.playlist_dirty:
+            if playlist_id == self.current_playlist_id:
+                # Same playlist edited live: keep the order, add new videos last, carry on after the one on air
+                on_air_id = self.on_air_item.video['id'] if self.on_air_item else None
+                by_id = {video['id']: video for video in self.get_playlist_videos(playlist_id)}
+                kept = [by_id.pop(video['id']) for video in self.playlist_videos if video['id'] in by_id]
+                added = list(by_id.values())
+                if shuffle:
+                    random.shuffle(added)
+                self.playlist_videos = kept + added
+                ids = [video['id'] for video in self.playlist_videos]
+                self.current_video_index = ids.index(on_air_id) + 1 if on_air_id in ids else 0
+            else:
+                self.playlist_videos = self.get_playlist_videos(playlist_id, shuffle)
+                self.current_video_index = 0
             self.current_playlist_id = playlist_id
-            self.current_video_index = 0
+            self.playlist_dirty = False
             self.logger.info(f"📋 Loaded playlist {playlist_id} with {len(self.playlist_videos)} videos")
 
         if not self.playlist_videos:
             self.logger.warning(f"⚠️ No videos found in playlist {playlist_id}")
             return False
 
+        if self.current_video_index >= len(self.playlist_videos):
+            if not loop:
+                return False
+            self.current_video_index = 0
+
         # Clear and rebuild queue
-        self.concat_queue = []
+        self.video_queue = []
         
         # Add next videos to queue
-        for i in range(self.queue_size):
+        for i in range(min(self.queue_size, len(self.playlist_videos))):
             video_index = (self.current_video_index + i) % len(self.playlist_videos)
             video = self.playlist_videos[video_index]
-            video_path = Path(video['file_path'])
             
-            if video_path.exists():
-                self.concat_queue.append(video_path)
+            if Path(video['file_path']).exists():
+                self.video_queue.append(video)
             else:
-                self.logger.warning(f"⚠️ Video file not found: {video_path}")
+                self.logger.warning(f"⚠️ Video file not found: {video['file_path']}")
+
+        return len(self.video_queue) > 0
+
+    def next_video(self):
+        """Decide the next item at the moment it is needed, so DB changes apply live"""
+        # The playlist is only re-chosen when the time slot or the playlists change, not per item
+        context = self.time_context(datetime.now().hour)
+        if self.target_playlist_id is None or context != self.target_context:
+            self.target_playlist_id = self.get_intelligent_fallback()
+            self.target_context = context
+        playlist_id = self.target_playlist_id
+        if playlist_id != self.current_playlist_id:
+            self.analytics['schedule_switches'] += 1
 
-        # Advance index for next update
-        self.current_video_index = (self.current_video_index + 1) % len(self.playlist_videos)
-        
-        return len(self.concat_queue) > 0
+        if not self.update_video_queue(playlist_id, shuffle=True):
+            return None
 
-    def start_smooth_stream(self, playlist_id):
-        """Start smooth concatenated streaming"""
-        if not self.update_video_queue(playlist_id):
-            self.logger.error("❌ No videos available for streaming")
-            return False
+        video = self.video_queue[0]
+        ids = [v['id'] for v in self.playlist_videos]
+        self.current_video_index = (ids.index(video['id']) + 1) % len(self.playlist_videos)
+        return video
 
-        if not self.create_concat_file():
-            self.logger.error("❌ Failed to create concat file")
+    def start_smooth_stream(self):
+        """Open the channel encoder and put the first video on air"""
+        self.target_playlist_id = None  # choose the playlist afresh on every (re)start
+        video = self.next_video()
+        if not video:
+            self.logger.error("❌ No videos available for streaming")
             return False
 
-        # Enhanced FFmpeg command for smooth concat streaming
-        ffmpeg_cmd = [
-            'ffmpeg',
-            '-f', 'concat',
-            '-safe', '0',
-            '-i', str(self.concat_file),
-            '-c:v', 'libx264',
-            '-preset', 'fast',
-            '-tune', 'zerolatency',
-            '-crf', '23',
-            '-maxrate', '2000k',
-            '-bufsize', '4000k',
-            '-c:a', 'aac',
-            '-b:a', '128k',
-            '-f', 'flv',
-            '-y',
-            self.rtmp_url
-        ]
-
-        try:
-            self.logger.info("🎬 Starting smooth concatenated stream")
-            self.current_process = subprocess.Popen(
-                ffmpeg_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setsid
-            )
-
-            self.analytics['streams_started'] += 1
-            self.analytics_logger.info(f"Smooth stream started with {len(self.concat_queue)} videos")
-            return True
-
-        except Exception as e:
-            self.logger.error(f"❌ Failed to start smooth stream: {e}")
+        self.logger.info("🎬 Starting smooth pipe-fed stream")
+        if not self.publisher.play(video):
             self.analytics['errors'] += 1
             return False
 
-    def monitor_and_update_stream(self, playlist_id):
-        """Monitor FFmpeg and update concat file as needed"""
-        if not self.current_process:
+        self.on_air_item = self.publisher.current
+        self.prepared_for = None
+        self.analytics['streams_started'] += 1
+        self.analytics_logger.info(f"Smooth stream started with {video['display_name']}")
+        return True
+
+    def monitor_and_update_stream(self):
+        """Keep the encoder fed: notice handovers and prepare the next feeder ahead of time"""
+        if not self.publisher.is_alive():
+            self.logger.warning("📺 Encoder session ended, restarting...")
+            self.start_smooth_stream()
             return
 
-        # Check if process is still running
-        if self.current_process.poll() is not None:
-            self.logger.warning("📺 Stream process ended, restarting...")
-            self.start_smooth_stream(playlist_id)
+        if self.encoder_stalled:
+            self.encoder_stalled = False
+            self.logger.warning("⚠️ Encoder stopped reporting progress, restarting session...")
+            self.publisher.start()
+            if self.publisher.play(self.on_air_item.video):
+                self.on_air_item = self.publisher.current
+                self.prepared_for = None
+            else:
+                self.start_smooth_stream()
+            return
+
+        if not self.publisher.current:
+            self.logger.warning("⚠️ Next video was not ready at the boundary")
+            self.start_smooth_stream()
             return
 
-        # Periodically update the queue (every few minutes)
-        # This ensures new videos are added to the concat file
-        if random.random() < 0.1:  # 10% chance each cycle to refresh
-            self.logger.info("🔄 Refreshing video queue for variety")
-            self.update_video_queue(playlist_id, shuffle=True)
-            self.create_concat_file()
+        if self.publisher.current is not self.on_air_item:
+            self.on_air_item = self.publisher.current
+            self.analytics['streams_started'] += 1
+            self.logger.info(f"▶️ Now playing: {self.on_air_item.video['display_name']} (same encoder session)")
+
+        remaining = self.publisher.remaining()
+        if (remaining is not None and remaining <= self.preroll_seconds
+                and self.prepared_for is not self.publisher.current):
+            self.prepared_for = self.publisher.current
+            video = self.next_video()
+            if video:
+                self.publisher.prepare(video)
+                upcoming = ', '.join(v['display_name'] for v in self.video_queue[1:])
+                self.logger.info(f"🔄 Queue: {upcoming or 'end of playlist'}")
 
     def stop_current_stream(self):
         """Stop current stream gracefully"""
-        if self.current_process:
-            try:
-                self.logger.info("⏹️ Stopping smooth stream...")
-                
-                # Send SIGTERM for graceful shutdown
-                self.current_process.terminate()
-
-                # Wait for graceful termination
-                try:
-                    self.current_process.wait(timeout=10)
-                except subprocess.TimeoutExpired:
-                    self.logger.warning("🔥 Force killing stream process...")
-                    self.current_process.kill()
-                    self.current_process.wait()
+        try:
+            self.logger.info("⏹️ Stopping smooth stream...")
+            self.publisher.stop()
+            self.on_air_item = None
+            self.logger.info("✅ Smooth stream stopped")
 
-                self.current_process = None
-                self.logger.info("✅ Smooth stream stopped")
+        except Exception as e:
+            self.logger.error(f"❌ Error stopping stream: {e}")
+            self.analytics['errors'] += 1
 
-            except Exception as e:
-                self.logger.error(f"❌ Error stopping stream: {e}")
-                self.analytics['errors'] += 1
+    @staticmethod
+    def time_context(hour):
+        """(time_context, priority_preference) for an hour of the day"""
+        if 6 <= hour < 12:
+            return "morning", "medium"
+        elif 12 <= hour < 18:
+            return "afternoon", "high"
+        elif 18 <= hour < 23:
+            return "evening", "medium"
+        return "late night", "low"
 
     def get_intelligent_fallback(self):
         """Smart fallback playlist selection based on time of day"""
@@ -265,21 +287,8 @@ class SmoothSmartScheduler:
             return 1  # Default fallback
 
         try:
-            current_hour = datetime.now().hour
-            
             # Time-based intelligent selection
-            if 6 <= current_hour < 12:
-                time_context = "morning"
-                priority_preference = "medium"
-            elif 12 <= current_hour < 18:
-                time_context = "afternoon"  
-                priority_preference = "high"
-            elif 18 <= current_hour < 23:
-                time_context = "evening"
-                priority_preference = "medium"
-            else:
-                time_context = "late night"
-                priority_preference = "low"
+            time_context, priority_preference = self.time_context(datetime.now().hour)
 
             # Get best playlist for time period
             cursor = conn.cursor()
@@ -299,7 +308,6 @@ class SmoothSmartScheduler:
             """, (priority_preference, priority_preference, priority_preference))
             
             result = cursor.fetchone()
-            conn.close()
 
             if result:
                 playlist_id, name, priority = result
@@ -312,39 +320,85 @@ class SmoothSmartScheduler:
         except Exception as e:
             self.logger.error(f"❌ Error getting intelligent fallback: {e}")
             self.analytics['errors'] += 1
-            if conn:
-                conn.close()
             return 1
 
+    def playlist_fingerprints(self):
+        """Cheap (memberships, playlists) summaries; other DB writes (renditions, thumbnails) leave them alone"""
+        conn = self.get_db_connection()
+        if not conn:
+            return None
+        try:
+            memberships = tuple(conn.execute("""
+                SELECT COUNT(*), IFNULL(MAX(id), 0), IFNULL(SUM(sort_order * video_id), 0),
+                       (SELECT COUNT(*) FROM videos WHERE is_active = 1)
+                FROM video_playlists
+            """).fetchone())
+            playlists = tuple(conn.execute("""
+                SELECT COUNT(*), IFNULL(MAX(date_modified), ''), IFNULL(SUM(id * priority), 0), IFNULL(SUM(id * is_active), 0)
+                FROM playlists
+            """).fetchone())
+            return memberships, playlists
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not check playlists for changes: {e}")
+            return None
+
+    def note_db_change(self):
+        """Reload the playlist or re-choose it only when the DB change actually touched them"""
+        fingerprints = self.playlist_fingerprints()
+        previous, self.db_fingerprints = self.db_fingerprints, fingerprints
+        if fingerprints is None or previous is None:
+            self.playlist_dirty = True  # can't tell; a reload keeps the order anyway
+            return
+        if fingerprints[0] != previous[0]:
+            self.playlist_dirty = True
+        if fingerprints[1] != previous[1]:
+            self.target_playlist_id = None
+
     def run_smooth_cycle(self):
         """Main smooth streaming cycle"""
-        # Get target playlist (could add schedule logic here)
-        target_playlist_id = self.get_intelligent_fallback()
-        
         # Start stream if not running
-        if not self.current_process:
-            self.start_smooth_stream(target_playlist_id)
+        if not self.on_air_item:
+            self.start_smooth_stream()
         else:
             # Monitor and update existing stream
-            self.monitor_and_update_stream(target_playlist_id)
+            self.monitor_and_update_stream()
+
+    def seconds_until_next_event(self):
+        """Sleep until the next feeder has to be prepared (or an hourly analytics save)"""
+        deadlines = [self.analytics_interval]
+        if self.publisher.current and self.prepared_for is not self.publisher.current:
+            remaining = self.publisher.remaining()
+            if remaining is not None:
+                deadlines.append(remaining - self.preroll_seconds)
+        return max(0, min(deadlines))
 
     def run(self):
         """Main smooth scheduler loop"""
         self.logger.info("🎬 Starting Smooth Smart Scheduler...")
         self.is_running = True
-        cycle_count = 0
+        self.notifier.watch_files([(self.db_path, DB_CHANGED)])
+        self.watchdog.start()
+        self.db_fingerprints = self.playlist_fingerprints()
+        next_analytics_save = time.time() + self.analytics_interval
 
         while self.is_running:
             try:
-                cycle_count += 1
                 self.run_smooth_cycle()
 
                 # Save analytics periodically
-                if cycle_count % 60 == 0:
+                if time.time() >= next_analytics_save:
+                    next_analytics_save = time.time() + self.analytics_interval
                     self.save_analytics()
 
-                # Sleep between cycles
-                time.sleep(60)  # Check every minute
+                # Sleep until an item boundary, an encoder exit or a DB edit
+                reasons = self.notifier.wait(self.seconds_until_next_event())
+                if DB_CHANGED in reasons:
+                    self.note_db_change()
+                if ENCODER_STALLED in reasons:
+                    self.encoder_stalled = True
+                if LADDER_CHANGED in reasons and self.ladder.apply(self.publisher):
+                    self.on_air_item = self.publisher.current
+                    self.prepared_for = None
 
             except Exception as e:
                 self.logger.error(f"❌ Scheduler cycle error: {e}")
@@ -0,0 +1,4 @@
+"""
+Shared library for The Houston Collective Streaming Server scripts
+Imported by the schedulers, scanner and processor in /opt/streamserver/scripts
+"""
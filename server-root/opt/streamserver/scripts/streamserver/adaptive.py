@@ -0,0 +1,118 @@
+"""
+Adaptive Encoding for The Houston Collective Streaming Server
+Steps the live encoder down a quality ladder when it falls below realtime, and back up when it has headroom
+"""
+
+import logging
+import os
+import time
+
+from .events import LADDER_CHANGED
+
+# Rung 0 is the channel profile as configured; each rung lists the settings it replaces.
+# Frame size only applies where a new rung reopens the RTMP session (the smooth scheduler's
+# ChannelEncoder): the gapless copy relay keeps the channel size so every item splices with the
+# same sequence header, and per-item mode does not scale at all; there the lower rungs only
+# trade preset and bitrate.
+DEFAULT_LADDER = [
+    {},
+    {'preset': 'veryfast'},
+    {'preset': 'superfast'},
+    {'preset': 'ultrafast'},
+    {'preset': 'ultrafast', 'width': 960, 'height': 540, 'maxrate': '1000k', 'bufsize': '2500k'},
+    {'preset': 'ultrafast', 'width': 854, 'height': 480, 'maxrate': '800k', 'bufsize': '2000k'},
+]
+
+DEFAULT_SETTINGS = {
+    'enabled': True,
+    'ladder': DEFAULT_LADDER,
+    'low_speed': 0.97,        # below this the encoder is losing ground
+    'high_speed': 0.995,      # at or above this it is keeping up
+    'step_down_after': 10,    # seconds below low_speed before stepping down
+    'step_up_after': 600,     # seconds of keeping up before trying one rung better
+}
+
+FRAME_SIZE_KEYS = ('width', 'height')  # rung settings that change the output frame size
+
+
+class EncodingLadder:
+    """Watches live encoder speed and decides which ladder rung the publisher should run at
+
+    Runs as an EncoderWatchdog listener; it only records the wanted rung and
+    wakes the scheduler, which applies it on its own thread.
+    """
+
+    def __init__(self, settings=None, notifier=None, logger=None):
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.ladder = self.settings['ladder'] or [{}]
+        self.notifier = notifier
+        self.logger = logger or logging.getLogger(__name__)
+        self.level = 0
+        self.pending = None
+        self.speed = None
+        self.below_since = None
+        self.keeping_up_since = None
+        self.adjustments = 0
+
+    def rung(self, level=None):
+        """Settings overridden at a rung"""
+        return dict(self.ladder[self.level if level is None else level])
+
+    def describe(self, level=None):
+        rung = self.rung(level)
+        return ', '.join(f'{key}={value}' for key, value in rung.items()) or 'channel profile'
+
+    def __call__(self, watchdog):
+        """Watchdog listener: sample the speed of live encodes running at the current rung"""
+        if not self.settings['enabled'] or self.pending is not None:
+            return
+
+        now = time.monotonic()
+        rates = [
+            monitor.metrics.get('rate') for monitor in watchdog.watched()
+            if monitor.adaptive and monitor.level == self.level and not monitor.exited()
+        ]
+        rates = [rate for rate in rates if rate is not None]
+        watchdog.extras['ladder'] = {'level': self.level, 'settings': self.rung(), 'speed': min(rates) if rates else None}
+        if not rates:
+            self.below_since = self.keeping_up_since = None
+            return
+
+        self.speed = min(rates)
+        if self.speed < self.settings['low_speed']:
+            self.keeping_up_since = None
+            self.below_since = self.below_since or now
+            if now - self.below_since >= self.settings['step_down_after'] and self.level < len(self.ladder) - 1:
+                self._request(self.level + 1, f"below realtime ({self.speed:.2f}x for {now - self.below_since:.0f}s)")
+        elif self.speed >= self.settings['high_speed']:
+            self.below_since = None
+            self.keeping_up_since = self.keeping_up_since or now
+            if now - self.keeping_up_since >= self.settings['step_up_after'] and self.level > 0:
+                self._request(self.level - 1, f"keeping up ({self.speed:.2f}x for {now - self.keeping_up_since:.0f}s)")
+        else:
+            self.below_since = self.keeping_up_since = None
+
+    def _request(self, level, why):
+        self.pending = (level, why)
+        if self.notifier:
+            self.notifier.notify(LADDER_CHANGED)
+
+    def apply(self, publisher=None):
+        """Move to the requested rung (scheduler thread); returns True if it changed"""
+        if self.pending is None:
+            return False
+        level, why = self.pending
+        direction = 'down' if level > self.level else 'up'
+        load = ', '.join(f'{value:.2f}' for value in os.getloadavg())
+
+        self.logger.warning(
+            f"🎚️ Encoder {why}: stepping {direction} to ladder rung {level} ({self.describe(level)}) "
+            f"[was rung {self.level}, load {load}, {os.cpu_count()} CPUs]"
+        )
+        self.level = level
+        self.pending = None
+        self.below_since = self.keeping_up_since = None
+        self.adjustments += 1
+        if publisher:
+            publisher.set_encoding(level, self.rung(level))
+        return True
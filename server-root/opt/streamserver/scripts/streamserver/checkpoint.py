@@ -0,0 +1,112 @@
+"""
+Playback Checkpoint for The Houston Collective Streaming Server
+Where the channel was on air (playlist, play order position, video, offset), so a restarted scheduler resumes mid-video
+"""
+
+import json
+import logging
+import time
+
+from .keyframes import KeyframeStore
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS playback_checkpoint (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        playlist_id INTEGER NOT NULL,
+        video_id INTEGER NOT NULL,
+        video_index INTEGER NOT NULL,
+        position REAL NOT NULL,
+        play_order TEXT NOT NULL,
+        saved_at REAL NOT NULL
+    );
+"""
+
+CHECKPOINT_SAVE = """
+    INSERT OR REPLACE INTO playback_checkpoint (id, playlist_id, video_id, video_index, position, play_order, saved_at)
+    VALUES (1, ?, ?, ?, ?, ?, ?)
+"""
+
+INTERVAL = 30      # seconds between position writes while the same video stays on air
+MAX_AGE = 6 * 3600  # older checkpoints are ignored and the playlist starts over
+END_MARGIN = 10    # a video this close to its end is not worth resuming; the next one starts instead
+
+
+def ensure_schema(conn):
+    conn.executescript(SCHEMA)
+
+
+class PlaybackCheckpoint:
+    """One-row record of the on-air position, written when the video changes or every INTERVAL seconds
+
+    save() is cheap to call on every scheduler cycle: unless the video changed
+    or the interval has passed it only compares a few values.
+    """
+
+    def __init__(self, db, interval=INTERVAL, logger=None):
+        self.db = db
+        self.interval = interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.keyframes = KeyframeStore(db)
+        self._last_key = None
+        self._last_write = 0.0
+        self._schema_checked = False
+
+    def _conn(self):
+        conn = self.db.connection()
+        if not self._schema_checked:
+            ensure_schema(conn)
+            self._schema_checked = True
+        return conn
+
+    def save(self, playlist_id, video, position, force=False):
+        """Record the on-air video of a playlist and the play order state it was picked at; True if a row was written"""
+        key = (playlist_id, video['id'])
+        now = time.monotonic()
+        if not force and key == self._last_key and now - self._last_write < self.interval:
+            return False
+
+        state = video.get('order_state') or {}
+        try:
+            self._conn()
+            self.db.execute(CHECKPOINT_SAVE, (playlist_id, video['id'], state.get('cursor', 0) - 1, round(position, 3),
+                                              json.dumps(state, separators=(',', ':')), time.time()))
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not save playback checkpoint: {e}")
+            return False
+        self._last_key = key
+        self._last_write = now
+        return True
+
+    def load(self, max_age=MAX_AGE):
+        """The saved checkpoint as a dict with play_order as a PlayOrder state dict, or None"""
+        try:
+            row = self._conn().execute("SELECT * FROM playback_checkpoint WHERE id = 1").fetchone()
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not read playback checkpoint: {e}")
+            return None
+        if row is None:
+            return None
+        age = time.time() - row['saved_at']
+        if max_age is not None and age > max_age:
+            self.logger.info(f"⏱️ Playback checkpoint is {age / 3600:.1f}h old - not resuming")
+            return None
+        checkpoint = dict(row)
+        order = json.loads(checkpoint['play_order'])
+        checkpoint['play_order'] = order if isinstance(order, dict) else {}  # id lists from older versions
+        return checkpoint
+
+    def resume_point(self, video, position):
+        """Where to restart a video saved at position: the keyframe before it when indexed, None if nearly over
+
+        Seeking to a keyframe lets stream-copied sources start cleanly and keeps
+        the reported position exact; nothing already aired is skipped.
+        """
+        end = video.get('play_until') or video.get('duration') or 0
+        if end and position >= end - END_MARGIN:
+            return None
+        try:
+            index = self.keyframes.load(video['id'], video['file_path']) if position > 0 else None
+        except Exception:
+            index = None  # no keyframe_index table until the processor has run
+        keyframe = index.before(position) if index else None
+        return keyframe[0] if keyframe else max(position, 0.0)
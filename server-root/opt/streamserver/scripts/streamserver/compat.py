@@ -0,0 +1,91 @@
+"""
+Source Compatibility for The Houston Collective Streaming Server
+Decides per video how much work the publisher has to do to put it on air
+"""
+
+from .encoding import profile_key
+
+# Encode modes, cheapest first
+COPY = 'copy'      # H.264/AAC already in the channel shape: stream copy
+AUDIO = 'audio'    # video copies, audio needs transcoding (or a silent track)
+FULL = 'full'      # re-encode everything
+
+ENCODE_MODES = (COPY, AUDIO, FULL)
+
+COPY_VIDEO_CODECS = {'h264'}
+COPY_PIX_FMTS = {'yuv420p', 'yuvj420p'}
+COPY_AUDIO_CODECS = {'aac'}
+
+# Sources may run this far over the channel's bitrate budget and still be copied
+BITRATE_SLACK = 1.25
+
+COLUMNS = (('encode_mode', 'TEXT'), ('encode_profile', 'TEXT'))
+
+
+def ensure_columns(conn):
+    """Add the encode verdict columns to videos on databases created before they existed"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(videos)")}
+    for name, kind in COLUMNS:
+        if existing and name not in existing:
+            conn.execute(f"ALTER TABLE videos ADD COLUMN {name} {kind}")
+    conn.commit()
+
+
+def parse_kbps(value):
+    """FFmpeg-style rate ('1500k', '2M', '128000') -> kbit/s"""
+    text = str(value).strip().lower()
+    if text.endswith('m'):
+        return float(text[:-1]) * 1000
+    if text.endswith('k'):
+        return float(text[:-1])
+    return float(text) / 1000
+
+
+def parse_resolution(value):
+    """'1280x720' -> (1280, 720), or None"""
+    try:
+        width, height = str(value).lower().split('x')
+        return int(width), int(height)
+    except (ValueError, AttributeError):
+        return None
+
+
+def video_copyable(metadata, profile):
+    if (metadata.get('codec') or '').lower() not in COPY_VIDEO_CODECS:
+        return False
+    pix_fmt = metadata.get('pix_fmt')
+    if pix_fmt is not None and pix_fmt not in COPY_PIX_FMTS:
+        return False
+    if parse_resolution(metadata.get('resolution')) != (profile['width'], profile['height']):
+        return False
+
+    budget = (parse_kbps(profile['maxrate']) + parse_kbps(profile['audio_bitrate'])) * BITRATE_SLACK
+    bitrate = metadata.get('bitrate') or 0
+    return 0 < bitrate <= budget
+
+
+def audio_copyable(metadata, profile):
+    if (metadata.get('audio_codec') or '').lower() not in COPY_AUDIO_CODECS:
+        return False
+    channels = metadata.get('audio_channels')
+    if channels and channels != profile['audio_channels']:
+        return False
+    sample_rate = metadata.get('audio_rate')
+    return not sample_rate or int(sample_rate) == int(profile['audio_rate'])
+
+
+def classify(metadata, profile):
+    """Encode mode for a video given its probed metadata"""
+    if not video_copyable(metadata, profile):
+        return FULL
+    if not audio_copyable(metadata, profile):
+        return AUDIO
+    return COPY
+
+
+def encode_mode(video, profile):
+    """Stored verdict for a video row, or FULL when it is missing or was made for another profile"""
+    mode = video.get('encode_mode')
+    if mode in ENCODE_MODES and video.get('encode_profile') == profile_key(profile):
+        return mode
+    return FULL
@@ -0,0 +1,720 @@
+"""
+Container Headers for The Houston Collective Streaming Server
+Duration, dimensions, codecs and keyframe positions read straight from MP4/MOV and Matroska/WebM headers, without FFprobe
+"""
+
+import os
+import struct
+import sys
+from array import array
+
+# FFprobe's format_name for each family, so callers can't tell which probe answered
+MP4_FORMAT = 'mov,mp4,m4a,3gp,3g2,mj2'
+MATROSKA_FORMAT = 'matroska,webm'
+
+MAX_HEADER_BYTES = 32 * 1024 * 1024  # header boxes/elements bigger than this are left to FFprobe
+
+MP4_TOP_LEVEL = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot'}
+MP4_VIDEO_CODECS = {
+    b'avc1': 'h264', b'avc3': 'h264', b'hvc1': 'hevc', b'hev1': 'hevc',
+    b'mp4v': 'mpeg4', b'av01': 'av1', b'vp09': 'vp9',
+}
+MP4_AUDIO_CODECS = {b'mp4a': None, b'ac-3': 'ac3', b'ec-3': 'eac3', b'Opus': 'opus', b'fLaC': 'flac', b'.mp3': 'mp3'}
+MP4_OBJECT_TYPES = {0x40: 'aac', 0x66: 'aac', 0x67: 'aac', 0x68: 'aac', 0x69: 'mp3', 0x6B: 'mp3'}  # esds objectTypeIndication
+
+EBML_HEADER = 0x1A45DFA3
+EBML_DOCTYPE = 0x4282
+MKV_SEGMENT = 0x18538067
+MKV_SEEKHEAD = 0x114D9B74
+MKV_SEEK = 0x4DBB
+MKV_SEEK_ID = 0x53AB
+MKV_SEEK_POSITION = 0x53AC
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_TRACK_TYPE = 0x83
+MKV_CODEC_ID = 0x86
+MKV_CODEC_PRIVATE = 0x63A2
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_AUDIO = 0xE1
+MKV_SAMPLING_FREQUENCY = 0xB5
+MKV_OUTPUT_SAMPLING_FREQUENCY = 0x78B5
+MKV_CHANNELS = 0x9F
+MKV_CLUSTER = 0x1F43B675
+MKV_TRACK_NUMBER = 0xD7
+MKV_CUES = 0x1C53BB6B
+MKV_CUE_POINT = 0xBB
+MKV_CUE_TIME = 0xB3
+MKV_CUE_TRACK_POSITIONS = 0xB7
+MKV_CUE_TRACK = 0xF7
+MKV_CUE_CLUSTER_POSITION = 0xF1
+
+MATROSKA_CODECS = {
+    'V_MPEG4/ISO/AVC': 'h264', 'V_MPEGH/ISO/HEVC': 'hevc', 'V_VP8': 'vp8', 'V_VP9': 'vp9', 'V_AV1': 'av1',
+    'V_MPEG2': 'mpeg2video', 'V_MPEG4/ISO/ASP': 'mpeg4',
+    'A_AAC': 'aac', 'A_AAC/MPEG2/LC': 'aac', 'A_AAC/MPEG4/LC': 'aac', 'A_AC3': 'ac3', 'A_EAC3': 'eac3',
+    'A_OPUS': 'opus', 'A_VORBIS': 'vorbis', 'A_FLAC': 'flac', 'A_MPEG/L3': 'mp3',
+}
+
+AAC_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+
+
+class HeaderError(Exception):
+    """The headers can't answer for this file; ask FFprobe"""
+
+
+def read_headers(file_path):
+    """FFprobe-shaped {'format': ..., 'streams': [...]} from the container headers, or None
+
+    None means unsupported or ambiguous (fragmented MP4, HE-AAC, no
+    duration, unknown codec...), and the caller should run FFprobe.
+    Only the first video and first audio stream are reported.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            magic = f.read(8)
+            f.seek(0)
+            if int.from_bytes(magic[:4], 'big') == EBML_HEADER:
+                format_name, duration, streams = _read_matroska(f)
+            elif magic[4:8] in MP4_TOP_LEVEL:
+                format_name, duration, streams = _read_mp4(f, size)
+            else:
+                return None
+    except (HeaderError, OSError, struct.error, IndexError, ValueError, KeyError):
+        return None
+
+    if duration <= 0 or not any(stream['codec_type'] == 'video' for stream in streams):
+        return None
+    return {
+        'format': {
+            'duration': f"{duration:.6f}",
+            'size': str(size),
+            'format_name': format_name,
+            'bit_rate': str(int(size * 8 / duration)),
+        },
+        'streams': streams,
+    }
+
+
+def read_keyframes(file_path):
+    """[(seconds, byte offset)] for the first video track's keyframes, in presentation order, or None
+
+    MP4/MOV come from the sample tables (stss, stts, ctts, stsc, stco),
+    Matroska/WebM from the Cues; None means the caller should ask FFprobe.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            magic = f.read(8)
+            f.seek(0)
+            if int.from_bytes(magic[:4], 'big') == EBML_HEADER:
+                keyframes = _matroska_keyframes(f)
+            elif magic[4:8] in MP4_TOP_LEVEL:
+                keyframes = _mp4_keyframes(f, size)
+            else:
+                return None
+    except (HeaderError, OSError, struct.error, IndexError, ValueError, KeyError):
+        return None
+    return sorted(keyframes) or None
+
+
+# MP4 / MOV
+
+def _boxes(data, start, end):
+    """(type, payload start, payload end) for each box in data[start:end]"""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise HeaderError(f"Truncated {kind!r} box")
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _child(data, bounds, *path):
+    """Payload bounds of the first box along path, or None"""
+    start, end = bounds
+    for kind in path:
+        for box, child_start, child_end in _boxes(data, start, end):
+            if box == kind:
+                start, end = child_start, child_end
+                break
+        else:
+            return None
+    return start, end
+
+
+def _require(data, bounds, *path):
+    found = _child(data, bounds, *path)
+    if found is None:
+        raise HeaderError(f"No {b'/'.join(path)!r} box")
+    return found
+
+
+def _time_header(data, start):
+    """(timescale, duration) from an mvhd or mdhd payload"""
+    if data[start] == 1:
+        return struct.unpack_from('>IQ', data, start + 20)
+    return struct.unpack_from('>II', data, start + 12)
+
+
+def _read_moov(f, size):
+    """The moov payload; top-level boxes are stepped over with seeks, so mdat is never read"""
+    pos = 0
+    moov = None
+    while pos + 8 <= size:
+        f.seek(pos)
+        header = f.read(16)
+        box_size, kind = struct.unpack_from('>I4s', header)
+        header_size = 8
+        if box_size == 1:
+            box_size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif box_size == 0:
+            box_size = size - pos
+        if box_size < header_size:
+            raise HeaderError("Bad top-level box")
+        if kind == b'moov':
+            if box_size > MAX_HEADER_BYTES:
+                raise HeaderError("moov too large")
+            moov = f.read(box_size - header_size) if header_size == 16 else header[8:] + f.read(box_size - 16)
+            if len(moov) != box_size - header_size:
+                raise HeaderError("Truncated moov")
+            break
+        pos += box_size
+    if moov is None:
+        raise HeaderError("No moov box")
+    return moov
+
+
+def _read_mp4(f, size):
+    moov = _read_moov(f, size)
+    bounds = (0, len(moov))
+    if _child(moov, bounds, b'mvex'):
+        raise HeaderError("Fragmented MP4")
+    timescale, duration = _time_header(moov, _require(moov, bounds, b'mvhd')[0])
+    if not timescale:
+        raise HeaderError("No movie timescale")
+
+    streams = []
+    kinds = set()
+    for kind, start, end in _boxes(moov, *bounds):
+        if kind != b'trak':
+            continue
+        stream = _mp4_track(moov, (start, end), kinds)
+        if stream:
+            kinds.add(stream['codec_type'])
+            streams.append(stream)
+    return MP4_FORMAT, duration / timescale, streams
+
+
+def _mp4_track(data, trak, skip_kinds=()):
+    """FFprobe-style stream for a video or sound track, or None for other tracks and kinds in skip_kinds"""
+    mdia = _require(data, trak, b'mdia')
+    hdlr = _require(data, mdia, b'hdlr')[0]
+    handler = {b'vide': 'video', b'soun': 'audio'}.get(data[hdlr + 8:hdlr + 12])
+    if handler is None or handler in skip_kinds:
+        return None
+    timescale, duration = _time_header(data, _require(data, mdia, b'mdhd')[0])
+    stbl = _require(data, mdia, b'minf', b'stbl')
+    stsd = _require(data, stbl, b'stsd')
+    fourcc, entry, entry_end = next(_boxes(data, stsd[0] + 8, stsd[1]), (None, 0, 0))
+
+    seconds = duration / timescale if timescale else 0
+    stsz = _child(data, stbl, b'stsz')
+    bit_rate = int(_sample_bytes(data, stsz) * 8 / seconds) if stsz and seconds else 0
+
+    if handler == 'video':
+        if fourcc not in MP4_VIDEO_CODECS:
+            raise HeaderError(f"Unknown video sample entry {fourcc!r}")
+        width, height = struct.unpack_from('>HH', data, entry + 24)
+        stream = {
+            'codec_type': 'video',
+            'codec_name': MP4_VIDEO_CODECS[fourcc],
+            'width': width,
+            'height': height,
+            'bit_rate': str(bit_rate),
+        }
+        if stream['codec_name'] == 'h264':
+            avcc = _require(data, (entry + 78, entry_end), b'avcC')
+            stream['pix_fmt'] = avc_pix_fmt(data[avcc[0]:avcc[1]])
+        return stream
+
+    if fourcc not in MP4_AUDIO_CODECS:
+        raise HeaderError(f"Unknown audio sample entry {fourcc!r}")
+    version = struct.unpack_from('>H', data, entry + 8)[0]
+    if version > 1:
+        raise HeaderError("QuickTime sound description v2")
+    channels = struct.unpack_from('>H', data, entry + 16)[0]
+    sample_rate = struct.unpack_from('>I', data, entry + 24)[0] >> 16
+    codec = MP4_AUDIO_CODECS[fourcc]
+    if fourcc == b'mp4a':
+        children = (entry + (44 if version == 1 else 28), entry_end)
+        esds = _child(data, children, b'esds') or _child(data, children, b'wave', b'esds')
+        if esds is None:
+            raise HeaderError("mp4a without esds")
+        codec, avg_bitrate, config = _esds(data, esds)
+        if codec == 'aac':
+            sample_rate, channels = aac_config(config, sample_rate, channels)
+        bit_rate = bit_rate or avg_bitrate
+    return {
+        'codec_type': 'audio',
+        'codec_name': codec,
+        'bit_rate': str(bit_rate),
+        'channels': channels,
+        'sample_rate': str(sample_rate),
+    }
+
+
+def _sample_bytes(data, stsz):
+    """Total size of a track's samples from its stsz box"""
+    sample_size, count = struct.unpack_from('>II', data, stsz[0] + 4)
+    if sample_size:
+        return sample_size * count
+    sizes = array('I')
+    if sizes.itemsize != 4:
+        raise HeaderError("No 32-bit array type")
+    sizes.frombytes(data[stsz[0] + 12:stsz[0] + 12 + 4 * count])
+    if sys.byteorder == 'little':
+        sizes.byteswap()
+    return sum(sizes)
+
+
+def _table(data, box, fmt):
+    """Entries of a sample table box (version/flags, entry count, entries) as tuples of fmt"""
+    count = struct.unpack_from('>I', data, box[0] + 4)[0]
+    entry = struct.Struct('>' + fmt)
+    end = box[0] + 8 + count * entry.size
+    if end > box[1]:
+        raise HeaderError("Truncated sample table")
+    return list(entry.iter_unpack(data[box[0] + 8:end]))
+
+
+def _values(data, box, code, at=4):
+    """Single-field table (stss, stco, co64, stsz) as a flat tuple; the entry count is at box start + at"""
+    count = struct.unpack_from('>I', data, box[0] + at)[0]
+    if box[0] + at + 4 + count * struct.calcsize(code) > box[1]:
+        raise HeaderError("Truncated sample table")
+    return struct.unpack_from(f'>{count}{code}', data, box[0] + at + 4)
+
+
+def _mp4_keyframes(f, size):
+    moov = _read_moov(f, size)
+    bounds = (0, len(moov))
+    if _child(moov, bounds, b'mvex'):
+        raise HeaderError("Fragmented MP4")
+    movie_timescale = _time_header(moov, _require(moov, bounds, b'mvhd')[0])[0]
+    for kind, start, end in _boxes(moov, *bounds):
+        if kind != b'trak':
+            continue
+        mdia = _require(moov, (start, end), b'mdia')
+        hdlr = _require(moov, mdia, b'hdlr')[0]
+        if moov[hdlr + 8:hdlr + 12] == b'vide':
+            return _track_keyframes(moov, (start, end), mdia, movie_timescale)
+    raise HeaderError("No video track")
+
+
+def _track_keyframes(data, trak, mdia, movie_timescale):
+    """(seconds, byte offset) of each sync sample of one video trak"""
+    timescale = _time_header(data, _require(data, mdia, b'mdhd')[0])[0]
+    if not timescale or not movie_timescale:
+        raise HeaderError("No timescale")
+    stbl = _require(data, mdia, b'minf', b'stbl')
+
+    stsz = _require(data, stbl, b'stsz')
+    sample_size, sample_count = struct.unpack_from('>II', data, stsz[0] + 4)
+    sizes = [sample_size] * sample_count if sample_size else _values(data, stsz, 'I', at=8)
+    stss = _child(data, stbl, b'stss')
+    sync = _values(data, stss, 'I') if stss else range(1, sample_count + 1)  # no stss: every sample is one
+    ctts = _child(data, stbl, b'ctts')
+    co64 = _child(data, stbl, b'co64')
+    chunks = _values(data, co64, 'Q') if co64 else _values(data, _require(data, stbl, b'stco'), 'I')
+
+    # The edit list says where media time 0 lands on the presentation timeline
+    shift = 0.0
+    elst = _child(data, trak, b'edts', b'elst')
+    if elst:
+        for segment_duration, media_time, _ in _table(data, elst, 'Qqi' if data[elst[0]] == 1 else 'Iii'):
+            if media_time == -1:
+                shift += segment_duration / movie_timescale
+                continue
+            shift -= media_time / timescale
+            break
+
+    decode_times = _run_totals(sync, _table(data, _require(data, stbl, b'stts'), 'II'))
+    composition = _run_values(sync, _table(data, ctts, 'Ii')) if ctts else [0] * len(sync)
+    offsets = _sample_offsets(sync, _table(data, _require(data, stbl, b'stsc'), 'III'), chunks, sizes)
+    return [((dts + cts) / timescale + shift, offset)
+            for dts, cts, offset in zip(decode_times, composition, offsets)]
+
+
+def _run_totals(samples, runs):
+    """Sum of (count, delta) runs before each 1-based sample number; samples ascending"""
+    totals = []
+    run, first, base = 0, 1, 0
+    for sample in samples:
+        while run < len(runs) and sample >= first + runs[run][0]:
+            base += runs[run][0] * runs[run][1]
+            first += runs[run][0]
+            run += 1
+        if run >= len(runs):
+            raise HeaderError("Sample beyond the time table")
+        totals.append(base + (sample - first) * runs[run][1])
+    return totals
+
+
+def _run_values(samples, runs):
+    """Value of the (count, value) run each 1-based sample number falls in; samples ascending"""
+    values = []
+    run, first = 0, 1
+    for sample in samples:
+        while run < len(runs) and sample >= first + runs[run][0]:
+            first += runs[run][0]
+            run += 1
+        values.append(runs[run][1] if run < len(runs) else 0)
+    return values
+
+
+def _sample_offsets(samples, stsc, chunks, sizes):
+    """File offset of each 1-based sample number from the chunk map; samples ascending"""
+    offsets = []
+    entry, entry_first_sample = 0, 1
+    for sample in samples:
+        while True:
+            first_chunk, per_chunk, _ = stsc[entry]
+            last_chunk = stsc[entry + 1][0] - 1 if entry + 1 < len(stsc) else len(chunks)
+            entry_samples = (last_chunk - first_chunk + 1) * per_chunk
+            if sample < entry_first_sample + entry_samples or entry + 1 >= len(stsc):
+                break
+            entry_first_sample += entry_samples
+            entry += 1
+        if not per_chunk:
+            raise HeaderError("Empty chunk run")
+        chunk, position = divmod(sample - entry_first_sample, per_chunk)
+        if first_chunk + chunk > len(chunks):
+            raise HeaderError("Sample beyond the chunk table")
+        offsets.append(chunks[first_chunk + chunk - 1] + sum(sizes[sample - position - 1:sample - 1]))
+    return offsets
+
+
+def _descriptor(data, pos):
+    """(tag, payload start, payload length) of an MPEG-4 descriptor"""
+    tag = data[pos]
+    pos += 1
+    length = 0
+    for _ in range(4):
+        byte = data[pos]
+        pos += 1
+        length = (length << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            break
+    return tag, pos, length
+
+
+def _esds(data, esds):
+    """(codec, average bitrate, decoder specific config) from an esds payload"""
+    tag, pos, length = _descriptor(data, esds[0] + 4)
+    if tag != 0x03:
+        raise HeaderError("No ES descriptor")
+    flags = data[pos + 2]
+    pos += 3
+    if flags & 0x80:
+        pos += 2
+    if flags & 0x40:
+        pos += 1 + data[pos]
+    if flags & 0x20:
+        pos += 2
+    tag, pos, length = _descriptor(data, pos)
+    if tag != 0x04:
+        raise HeaderError("No decoder config descriptor")
+    codec = MP4_OBJECT_TYPES.get(data[pos])
+    if codec is None:
+        raise HeaderError(f"Unknown audio object type {data[pos]:#x}")
+    avg_bitrate = struct.unpack_from('>I', data, pos + 9)[0]
+    config = b''
+    if length > 13:
+        tag, config_pos, config_length = _descriptor(data, pos + 13)
+        if tag == 0x05:
+            config = data[config_pos:config_pos + config_length]
+    return codec, avg_bitrate, config
+
+
+# Codec configuration records
+
+def avc_pix_fmt(avcc):
+    """FFprobe pix_fmt for an H.264 stream from its avcC record"""
+    profile = avcc[1]
+    pos = 6
+    for _ in range(avcc[5] & 0x1F):
+        pos += 2 + struct.unpack_from('>H', avcc, pos)[0]
+    count = avcc[pos]
+    pos += 1
+    for _ in range(count):
+        pos += 2 + struct.unpack_from('>H', avcc, pos)[0]
+
+    if pos + 2 <= len(avcc) and profile not in (66, 77, 88):
+        # High profiles carry chroma format and bit depth after the parameter sets
+        chroma = avcc[pos] & 0x03
+        depth = (avcc[pos + 1] & 0x07) + 8
+        name = ('gray', 'yuv420p', 'yuv422p', 'yuv444p')[chroma]
+        return name if depth == 8 else f"{name}{depth}le"
+    if profile in (66, 77, 88):
+        return 'yuv420p'  # Baseline, Main and Extended are 8-bit 4:2:0 only
+    raise HeaderError(f"H.264 profile {profile} without chroma format")
+
+
+def aac_config(config, sample_rate, channels):
+    """(sample_rate, channels) from an AudioSpecificConfig, refusing the cases FFprobe reports differently
+
+    HE-AAC (SBR/PS) decodes to twice the signalled rate, and low core rates
+    may be implicit SBR, so those are left to FFprobe.
+    """
+    if len(config) >= 2:
+        object_type = config[0] >> 3
+        if object_type in (5, 29, 31):
+            raise HeaderError("HE-AAC")
+        index = ((config[0] & 0x07) << 1) | (config[1] >> 7)
+        if index == 15:
+            raise HeaderError("Explicit AAC sample rate")
+        sample_rate = AAC_SAMPLE_RATES[index]
+        channels = ((config[1] >> 3) & 0x0F) or channels
+    if sample_rate <= 24000:
+        raise HeaderError("Possible implicit SBR")
+    return sample_rate, channels
+
+
+# Matroska / WebM
+
+def _vint(data, pos, marker=False):
+    """(value, next position) for an EBML variable-length integer; IDs keep their marker bit"""
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while not first & mask:
+        mask >>= 1
+        length += 1
+        if length > 8:
+            raise HeaderError("Bad EBML integer")
+    if len(data) < pos + length:
+        raise HeaderError("Truncated EBML integer")
+    value = first if marker else first & (mask - 1)
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    unknown = not marker and value == (1 << (7 * length)) - 1
+    return (None if unknown else value), pos + length
+
+
+def _elements(data, start=0, end=None):
+    """(id, payload start, payload end) for each element in data[start:end]"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos < end:
+        element_id, pos = _vint(data, pos, marker=True)
+        size, pos = _vint(data, pos)
+        if size is None or pos + size > end:
+            raise HeaderError(f"Truncated element {element_id:#x}")
+        yield element_id, pos, pos + size
+        pos += size
+
+
+def _uint(data, start, end):
+    return int.from_bytes(data[start:end], 'big')
+
+
+def _float(data, start, end):
+    return struct.unpack('>f' if end - start == 4 else '>d', data[start:end])[0]
+
+
+def _read_element(f, pos):
+    """(id, size, payload position) of the element header at pos"""
+    f.seek(pos)
+    header = f.read(12)
+    element_id, offset = _vint(header, 0, marker=True)
+    size, offset = _vint(header, offset)
+    return element_id, size, pos + offset
+
+
+def _matroska_segment(f, wanted_ids):
+    """(segment payload position, {id: payload bytes or None}) for top-level elements of the first Segment"""
+    element_id, size, pos = _read_element(f, 0)
+    f.seek(pos)
+    header = f.read(size)
+    doc_type = next((header[start:end] for eid, start, end in _elements(header) if eid == EBML_DOCTYPE), b'')
+    if doc_type.rstrip(b'\0') not in (b'matroska', b'webm'):
+        raise HeaderError(f"Unsupported DocType {doc_type!r}")
+
+    element_id, segment_size, segment = _read_element(f, pos + size)
+    if element_id != MKV_SEGMENT:
+        raise HeaderError("No Segment")
+
+    # Info and Tracks normally come before the first Cluster; otherwise (and for Cues) the SeekHead says where
+    wanted = dict.fromkeys(wanted_ids)
+    seeks = {}
+    pos = segment
+    while None in wanted.values():
+        element_id, size, payload = _read_element(f, pos)
+        if element_id == MKV_CLUSTER or size is None:
+            break
+        if element_id in wanted or element_id == MKV_SEEKHEAD:
+            if size > MAX_HEADER_BYTES:
+                raise HeaderError("Header element too large")
+            f.seek(payload)
+            data = f.read(size)
+            if element_id == MKV_SEEKHEAD:
+                seeks.update(_seek_positions(data))
+            else:
+                wanted[element_id] = data
+        pos = payload + size
+        if segment_size is not None and pos >= segment + segment_size:
+            break
+
+    for element_id in wanted:
+        if wanted[element_id] is None and element_id in seeks:
+            found_id, size, payload = _read_element(f, segment + seeks[element_id])
+            if found_id != element_id or size is None or size > MAX_HEADER_BYTES:
+                raise HeaderError("Bad SeekHead entry")
+            f.seek(payload)
+            wanted[element_id] = f.read(size)
+    return segment, wanted
+
+
+def _read_matroska(f):
+    segment, wanted = _matroska_segment(f, (MKV_INFO, MKV_TRACKS))
+    if None in wanted.values():
+        raise HeaderError("No Info or Tracks")
+
+    info = wanted[MKV_INFO]
+    scale = 1000000
+    duration = None
+    for element_id, start, end in _elements(info):
+        if element_id == MKV_TIMECODE_SCALE:
+            scale = _uint(info, start, end)
+        elif element_id == MKV_DURATION:
+            duration = _float(info, start, end)
+    if not duration:
+        raise HeaderError("No segment duration")
+
+    tracks = wanted[MKV_TRACKS]
+    streams = []
+    kinds = set()
+    for element_id, start, end in _elements(tracks):
+        if element_id == MKV_TRACK_ENTRY:
+            stream = _matroska_track(tracks, start, end, kinds)
+            if stream:
+                kinds.add(stream['codec_type'])
+                streams.append(stream)
+    return MATROSKA_FORMAT, duration * scale / 1e9, streams
+
+
+def _matroska_keyframes(f):
+    """(seconds, byte offset) of each cue point on the first video track"""
+    segment, wanted = _matroska_segment(f, (MKV_INFO, MKV_TRACKS, MKV_CUES))
+    if None in wanted.values():
+        raise HeaderError("No Cues")
+
+    info = wanted[MKV_INFO]
+    scale = next((_uint(info, start, end) for element_id, start, end in _elements(info)
+                  if element_id == MKV_TIMECODE_SCALE), 1000000)
+    tracks = wanted[MKV_TRACKS]
+    video_track = None
+    for element_id, start, end in _elements(tracks):
+        if element_id != MKV_TRACK_ENTRY:
+            continue
+        fields = {child_id: _uint(tracks, s, e) for child_id, s, e in _elements(tracks, start, end)
+                  if child_id in (MKV_TRACK_TYPE, MKV_TRACK_NUMBER)}
+        if fields.get(MKV_TRACK_TYPE) == 1:
+            video_track = fields.get(MKV_TRACK_NUMBER)
+            break
+    if video_track is None:
+        raise HeaderError("No video track")
+
+    cues = wanted[MKV_CUES]
+    keyframes = []
+    for element_id, start, end in _elements(cues):
+        if element_id != MKV_CUE_POINT:
+            continue
+        cue_time = None
+        for child_id, child_start, child_end in _elements(cues, start, end):
+            if child_id == MKV_CUE_TIME:
+                cue_time = _uint(cues, child_start, child_end)
+            elif child_id == MKV_CUE_TRACK_POSITIONS and cue_time is not None:
+                position = {pid: _uint(cues, s, e) for pid, s, e in _elements(cues, child_start, child_end)}
+                if position.get(MKV_CUE_TRACK) == video_track and MKV_CUE_CLUSTER_POSITION in position:
+                    keyframes.append((cue_time * scale / 1e9, segment + position[MKV_CUE_CLUSTER_POSITION]))
+    return keyframes
+
+
+def _seek_positions(data):
+    """{element id: position in the segment} from a SeekHead payload"""
+    positions = {}
+    for element_id, start, end in _elements(data):
+        if element_id != MKV_SEEK:
+            continue
+        seek_id = position = None
+        for child_id, child_start, child_end in _elements(data, start, end):
+            if child_id == MKV_SEEK_ID:
+                seek_id = _uint(data, child_start, child_end)
+            elif child_id == MKV_SEEK_POSITION:
+                position = _uint(data, child_start, child_end)
+        if seek_id is not None and position is not None:
+            positions.setdefault(seek_id, position)
+    return positions
+
+
+def _matroska_track(data, start, end, skip_kinds=()):
+    """FFprobe-style stream for a video or audio TrackEntry, or None for other tracks and kinds in skip_kinds"""
+    fields = {element_id: (child_start, child_end) for element_id, child_start, child_end in _elements(data, start, end)}
+    track_type = _uint(data, *fields[MKV_TRACK_TYPE]) if MKV_TRACK_TYPE in fields else 0
+    if track_type not in (1, 2) or ('video', 'audio')[track_type - 1] in skip_kinds:
+        return None
+    codec_id = data[slice(*fields[MKV_CODEC_ID])].rstrip(b'\0').decode('ascii', 'replace')
+    codec = MATROSKA_CODECS.get(codec_id)
+    if codec is None:
+        raise HeaderError(f"Unknown codec {codec_id}")
+    private = data[slice(*fields[MKV_CODEC_PRIVATE])] if MKV_CODEC_PRIVATE in fields else b''
+
+    if track_type == 1:
+        if MKV_VIDEO not in fields:
+            raise HeaderError("Video track without dimensions")
+        video = {element_id: _uint(data, s, e) for element_id, s, e in _elements(data, *fields[MKV_VIDEO])
+                 if element_id in (MKV_PIXEL_WIDTH, MKV_PIXEL_HEIGHT)}
+        stream = {
+            'codec_type': 'video',
+            'codec_name': codec,
+            'width': video.get(MKV_PIXEL_WIDTH, 0),
+            'height': video.get(MKV_PIXEL_HEIGHT, 0),
+        }
+        if codec == 'h264':
+            if not private:
+                raise HeaderError("AVC track without avcC")
+            stream['pix_fmt'] = avc_pix_fmt(private)
+        return stream
+
+    sample_rate, channels = 8000, 1  # Matroska defaults
+    audio = _elements(data, *fields[MKV_AUDIO]) if MKV_AUDIO in fields else ()
+    for element_id, s, e in audio:
+        if element_id == MKV_SAMPLING_FREQUENCY:
+            sample_rate = int(_float(data, s, e))
+        elif element_id == MKV_CHANNELS:
+            channels = _uint(data, s, e)
+        elif element_id == MKV_OUTPUT_SAMPLING_FREQUENCY:
+            raise HeaderError("SBR output rate")
+    if codec == 'aac':
+        sample_rate, channels = aac_config(private, sample_rate, channels)
+    return {
+        'codec_type': 'audio',
+        'codec_name': codec,
+        'channels': channels,
+        'sample_rate': str(sample_rate),
+    }
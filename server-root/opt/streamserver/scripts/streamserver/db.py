@@ -0,0 +1,184 @@
+"""
+Database Access for The Houston Collective Streaming Server
+One long-lived, consistently tuned SQLite connection per thread, shared by every script
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DATABASE_PATH = '/opt/streamserver/database/streaming.db'
+
+BUSY_TIMEOUT_MS = 10000      # wait out the scanner / web UI instead of failing with "database is locked"
+CACHED_STATEMENTS = 256      # compiled statements kept per connection (sqlite3 default is 128)
+
+# Applied to every connection so lock and durability behaviour is the same in all scripts
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', BUSY_TIMEOUT_MS),
+    ('cache_size', -16000),   # 16 MB page cache
+    ('temp_store', 'MEMORY'),
+)
+
+
+def connect(path=DATABASE_PATH):
+    """New connection with the standard pragmas and sqlite3.Row rows"""
+    conn = sqlite3.connect(
+        str(path),
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=CACHED_STATEMENTS,
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class Database:
+    """Per-thread persistent connections to one database file, plus small typed query helpers
+
+    Connections stay open for the life of the process so setup cost and the
+    statement cache are paid once; threaded workers each get their own.
+    """
+
+    def __init__(self, path=DATABASE_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def connection(self):
+        """This thread's connection, opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = connect(self.path)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Close every connection (process shutdown)"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    # Reads
+
+    def query_all(self, sql, params=()):
+        """All rows as a list of dicts"""
+        return [dict(row) for row in self.connection().execute(sql, params).fetchall()]
+
+    def query_one(self, sql, params=()):
+        """First row as a dict, or None"""
+        row = self.connection().execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    def query_value(self, sql, params=(), default=None):
+        """First column of the first row, or default"""
+        row = self.connection().execute(sql, params).fetchone()
+        return row[0] if row and row[0] is not None else default
+
+    # Writes
+
+    def execute(self, sql, params=()):
+        """Run one statement and commit; returns the cursor (lastrowid / rowcount)"""
+        conn = self.connection()
+        try:
+            cursor = conn.execute(sql, params)
+            conn.commit()
+            return cursor
+        except Exception:
+            conn.rollback()
+            raise
+
+    def executemany(self, sql, rows):
+        """Run one statement per row in a single transaction; returns the row count"""
+        conn = self.connection()
+        try:
+            cursor = conn.executemany(sql, rows)
+            conn.commit()
+            return cursor.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+
+    @contextmanager
+    def transaction(self):
+        """Group statements into one commit: with db.transaction() as conn: ..."""
+        conn = self.connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+class BatchWriter:
+    """Buffers writes and flushes them with executemany, one transaction per batch
+
+    Statements run in the order given to the constructor (then first use),
+    so rows that reference each other can share a batch.
+    """
+
+    def __init__(self, db, statements=(), max_rows=500, max_seconds=2.0):
+        self.db = db
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.pending = {sql: [] for sql in statements}
+        self.rows = 0
+        self.commits = 0
+        self._started = None
+
+    def add(self, sql, params=()):
+        """Queue one statement; flushes when the batch is full or old enough"""
+        self.pending.setdefault(sql, []).append(params)
+        self.rows += 1
+        if self._started is None:
+            self._started = time.monotonic()
+        if self.rows >= self.max_rows or time.monotonic() - self._started >= self.max_seconds:
+            self.flush()
+
+    def flush(self):
+        """Write everything queued in one transaction; returns the row count"""
+        if not self.rows:
+            return 0
+        with self.db.transaction() as conn:
+            for sql, rows in self.pending.items():
+                if rows:
+                    conn.executemany(sql, rows)
+        flushed = self.rows
+        self.pending = {sql: [] for sql in self.pending}
+        self.rows = 0
+        self.commits += 1
+        self._started = None
+        return flushed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(path=DATABASE_PATH):
+    """Process-wide Database for a path"""
+    path = str(path)
+    with _databases_lock:
+        if path not in _databases:
+            _databases[path] = Database(path)
+        return _databases[path]
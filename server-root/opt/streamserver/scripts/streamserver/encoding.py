@@ -0,0 +1,87 @@
+"""
+Channel Encoding Profile for The Houston Collective Streaming Server
+One place for the FFmpeg output settings every publisher uses
+"""
+
+import hashlib
+import json
+import os
+
+PROFILE_FILE = '/opt/streamserver/config/channel_profile.json'
+
+# Matches the settings SmartScheduler has always streamed with, plus a fixed
+# keyframe cadence and audio format so items can be spliced into one session
+DEFAULT_PROFILE = {
+    'video_codec': 'libx264',
+    'preset': 'fast',
+    'tune': 'zerolatency',
+    'crf': 28,
+    'maxrate': '1500k',
+    'bufsize': '4000k',
+    'pix_fmt': 'yuv420p',
+    'width': 1280,
+    'height': 720,
+    'fps': 30,
+    'keyframe_seconds': 2,
+    'audio_codec': 'aac',
+    'audio_bitrate': '128k',
+    'audio_rate': 44100,
+    'audio_channels': 2,
+    'rendition_preset': 'medium',  # offline encodes for the rendition cache can afford more effort
+}
+
+# Settings that decide whether two encodes can be spliced with stream copy
+COMPAT_FIELDS = ('video_codec', 'crf', 'maxrate', 'bufsize', 'pix_fmt', 'width', 'height', 'fps',
+                 'keyframe_seconds', 'audio_codec', 'audio_bitrate', 'audio_rate', 'audio_channels')
+
+
+def load_profile(path=PROFILE_FILE):
+    """Default channel profile updated with config/channel_profile.json if present"""
+    profile = dict(DEFAULT_PROFILE)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            profile.update(json.load(f))
+    return profile
+
+
+def profile_key(profile):
+    """Short hash of the stream-shaping settings; changes whenever cached renditions go stale"""
+    settings = repr([(field, profile.get(field)) for field in COMPAT_FIELDS])
+    return hashlib.sha1(settings.encode()).hexdigest()[:12]
+
+
+def video_args(profile, preset=None, tune=True):
+    """FFmpeg video encoder arguments for a profile"""
+    args = [
+        '-c:v', profile['video_codec'],
+        '-preset', preset or profile['preset'],
+    ]
+    if tune and profile.get('tune'):
+        args += ['-tune', profile['tune']]
+    args += [
+        '-crf', str(profile['crf']),
+        '-maxrate', profile['maxrate'],
+        '-bufsize', profile['bufsize'],
+        '-pix_fmt', profile['pix_fmt'],
+        '-force_key_frames', f"expr:gte(t,n_forced*{profile['keyframe_seconds']})",
+    ]
+    return args
+
+
+def video_filter(profile):
+    """Scale/pad to the channel frame size and rate so every source looks the same to the encoder"""
+    width, height = profile['width'], profile['height']
+    return (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={profile['fps']}"
+    )
+
+
+def audio_args(profile):
+    """FFmpeg audio encoder arguments for a profile"""
+    return [
+        '-c:a', profile['audio_codec'],
+        '-b:a', profile['audio_bitrate'],
+        '-ar', str(profile['audio_rate']),
+        '-ac', str(profile['audio_channels']),
+    ]
@@ -0,0 +1,129 @@
+"""
+Change notifications for The Houston Collective Streaming Server
+Lets the schedulers sleep until something actually happens instead of polling
+"""
+
+import logging
+import os
+import threading
+import time
+
+from .inotify import Inotify, IN_CLOSE_WRITE, IN_MODIFY, IN_MOVED_TO, IN_CREATE
+
+# Reasons a sleeping scheduler can be woken with
+DB_CHANGED = 'db_changed'
+CONFIG_CHANGED = 'config_changed'
+CONTROL = 'control'
+PROCESS_EXIT = 'process_exit'
+ITEM_ENDED = 'item_ended'
+ENCODER_STALLED = 'encoder_stalled'
+LADDER_CHANGED = 'ladder_changed'
+
+
+class ChangeNotifier:
+    """Collects wake-up reasons from signal handlers, watcher threads and child processes"""
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self._event = threading.Event()
+        # Re-entrant because notify() is also called from signal handlers on the main thread
+        self._lock = threading.RLock()
+        self._reasons = set()
+        self._inotify = None
+
+    def notify(self, reason):
+        """Record a reason and wake the waiter (safe from signal handlers and threads)"""
+        with self._lock:
+            self._reasons.add(reason)
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """Sleep until notified or timeout, then return the set of pending reasons"""
+        if timeout is not None and timeout < 0:
+            timeout = 0
+        self._event.wait(timeout)
+
+        with self._lock:
+            self._event.clear()
+            reasons = self._reasons
+            self._reasons = set()
+        return reasons
+
+    def watch_process(self, process, reason=PROCESS_EXIT):
+        """Notify as soon as a child process exits"""
+        def waiter():
+            try:
+                process.wait()
+            except Exception:
+                pass
+            self.notify(reason)
+
+        thread = threading.Thread(target=waiter, name=f'wait-{process.pid}', daemon=True)
+        thread.start()
+        return thread
+
+    def watch_files(self, watches, fallback_interval=5):
+        """Watch files for writes; watches is a list of (path, reason) tuples
+
+        Directories are watched rather than the files themselves so atomic
+        replaces and SQLite's -wal/-shm companions are picked up too.
+        """
+        by_dir = {}
+        for path, reason in watches:
+            directory, name = os.path.split(str(path))
+            by_dir.setdefault(directory, []).append((name, reason))
+
+        try:
+            self._inotify = Inotify()
+            wd_map = {}
+            for directory, names in by_dir.items():
+                os.makedirs(directory, exist_ok=True)
+                wd = self._inotify.add_watch(directory, IN_CLOSE_WRITE | IN_MODIFY | IN_MOVED_TO | IN_CREATE)
+                wd_map[wd] = names
+        except OSError as e:
+            self.logger.warning(f"⚠️ inotify unavailable ({e}), falling back to {fallback_interval}s polling")
+            self._inotify = None
+            thread = threading.Thread(target=self._poll_files, args=(watches, fallback_interval),
+                                      name='file-poller', daemon=True)
+            thread.start()
+            return thread
+
+        thread = threading.Thread(target=self._read_inotify, args=(wd_map,),
+                                  name='file-watcher', daemon=True)
+        thread.start()
+        return thread
+
+    def _read_inotify(self, wd_map):
+        while self._inotify:
+            try:
+                events = self._inotify.read()
+            except Exception as e:
+                self.logger.error(f"❌ inotify read failed: {e}")
+                return
+
+            for wd, mask, cookie, name in events:
+                for watched_name, reason in wd_map.get(wd, []):
+                    # streaming.db also matches streaming.db-wal and streaming.db-journal
+                    if name == watched_name or name.startswith(f'{watched_name}-'):
+                        self.notify(reason)
+
+    def _poll_files(self, watches, interval):
+        def snapshot():
+            state = {}
+            for path, reason in watches:
+                for candidate in (str(path), f'{path}-wal'):
+                    try:
+                        st = os.stat(candidate)
+                        state[candidate] = (st.st_mtime_ns, st.st_size, reason)
+                    except OSError:
+                        state[candidate] = (None, None, reason)
+            return state
+
+        last = snapshot()
+        while True:
+            time.sleep(interval)
+            current = snapshot()
+            for candidate, value in current.items():
+                if last.get(candidate) != value:
+                    self.notify(value[2])
+            last = current
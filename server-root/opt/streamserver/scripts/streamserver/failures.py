@@ -0,0 +1,177 @@
+"""
+Playback Failures for The Houston Collective Streaming Server
+Per-video failure accounting with exponential backoff, quarantine of files that keep failing, and a channel-wide circuit breaker
+"""
+
+import logging
+import time
+
+COLUMNS = (
+    ('failure_count', 'INTEGER DEFAULT 0'),   # consecutive failed plays
+    ('last_failure', 'DATETIME'),
+    ('last_error', 'TEXT'),                   # FFmpeg's last log lines from the failed play
+    ('quarantined', 'INTEGER DEFAULT 0'),     # 1 = kept off air until released from the dashboard
+    ('date_quarantined', 'DATETIME'),
+)
+
+DEFAULT_POLICY = {
+    'quarantine_after': 3,     # consecutive failures before a video is taken off air
+    'backoff_seconds': 60,     # wait after the second failure; doubles with each one after that
+    'backoff_max': 3600,
+    'healthy_seconds': 60,     # on air this long counts as a good play and clears the count
+    'breaker_videos': 5,       # this many different videos failing in a row means the channel is the problem
+}
+
+FAILURE_SAVE = """
+    UPDATE videos SET failure_count = ?, last_failure = datetime('now'), last_error = ?
+    WHERE id = ?
+"""
+
+QUARANTINE_SAVE = """
+    UPDATE videos SET failure_count = ?, last_failure = datetime('now'), last_error = ?,
+                      quarantined = 1, date_quarantined = datetime('now')
+    WHERE id = ?
+"""
+
+
+def ensure_columns(conn):
+    """Add the failure and quarantine columns to videos on databases created before they existed"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(videos)")}
+    for name, kind in COLUMNS:
+        if existing and name not in existing:
+            conn.execute(f"ALTER TABLE videos ADD COLUMN {name} {kind}")
+    conn.commit()
+
+
+class FailureTracker:
+    """Decides whether a video may go on air again after it failed
+
+    The first failure is retried straight away (a mid-video crash resumes
+    where it stopped); later ones wait backoff_seconds, doubling, and the
+    quarantine_after-th takes the video off air. When breaker_videos
+    different videos fail back to back with no good play in between, the
+    fault is the channel's (SRS down, disk gone), not the media's: the
+    breaker opens, those failures are forgiven, and restarts are spaced out
+    with the same backoff until something plays for healthy_seconds.
+    """
+
+    def __init__(self, db, policy=None, logger=None):
+        self.db = db
+        self.policy = dict(DEFAULT_POLICY, **(policy or {}))
+        self.logger = logger or logging.getLogger(__name__)
+        self.failures = {}        # video id -> (consecutive failures, monotonic time it may retry)
+        self.quarantined = set()
+        self.streak = []          # ids of the videos that failed since the last good play
+        self.breaker_trips = 0
+        self.channel_retry_at = 0.0
+
+    def load(self, conn):
+        """Pick up counts and quarantine flags from the database (start-up, dashboard releases)"""
+        rows = conn.execute(
+            "SELECT id, failure_count, quarantined FROM videos WHERE failure_count > 0 OR quarantined = 1"
+        ).fetchall()
+        self.quarantined = {row['id'] for row in rows if row['quarantined']}
+        counts = {row['id']: row['failure_count'] for row in rows if not row['quarantined']}
+        self.failures = {
+            video_id: (count, self.failures.get(video_id, (0, 0.0))[1])
+            for video_id, count in counts.items()
+        }
+
+    def backoff(self, attempt):
+        """Seconds to wait before attempt n (1-based) of a backed-off retry"""
+        return min(self.policy['backoff_seconds'] * 2 ** (attempt - 1), self.policy['backoff_max'])
+
+    def breaker_open(self):
+        return self.breaker_trips > 0
+
+    def channel_wait(self, now=None):
+        """Seconds before the channel may be restarted while the breaker is open"""
+        return max(self.channel_retry_at - (now or time.monotonic()), 0.0)
+
+    def playable(self, video, now=None):
+        if video['id'] in self.quarantined:
+            return False
+        return self.failures.get(video['id'], (0, 0.0))[1] <= (now or time.monotonic())
+
+    def retry_in(self, now=None):
+        """Seconds until the first video that is backing off may play again, or None"""
+        now = now or time.monotonic()
+        waits = [retry_at - now for video_id, (_, retry_at) in self.failures.items()
+                 if video_id not in self.quarantined and retry_at > now]
+        return min(waits) if waits else None
+
+    def describe(self, video):
+        if video['id'] in self.quarantined:
+            return 'quarantined'
+        count, retry_at = self.failures.get(video['id'], (0, 0.0))
+        return f"{count} failures, retry in {max(retry_at - time.monotonic(), 0):.0f}s"
+
+    def record(self, video, error):
+        """Charge a failed play to a video; True if it may be retried straight away"""
+        video_id = video['id']
+        now = time.monotonic()
+        error = (error or 'FFmpeg exited with an error')[-2000:]
+
+        if video_id not in self.streak:
+            self.streak.append(video_id)
+        if self.breaker_open() or len(self.streak) >= self.policy['breaker_videos']:
+            return self._trip(now)
+
+        count = self.failures.get(video_id, (0, 0.0))[0] + 1
+        try:
+            if count >= self.policy['quarantine_after']:
+                self.db.execute(QUARANTINE_SAVE, (count, error, video_id))
+            else:
+                self.db.execute(FAILURE_SAVE, (count, error, video_id))
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not record failure of video {video_id}: {e}")
+
+        if count >= self.policy['quarantine_after']:
+            self.failures.pop(video_id, None)
+            self.quarantined.add(video_id)
+            self.logger.error(f"☣️ Quarantined {video['display_name']} after {count} consecutive failures: {error[-200:]}")
+            return False
+
+        wait = self.backoff(count - 1) if count > 1 else 0.0
+        self.failures[video_id] = (count, now + wait)
+        if wait:
+            self.logger.warning(f"⏳ {video['display_name']} failed {count} times - skipping it for {wait:.0f}s")
+        return wait == 0
+
+    def _trip(self, now):
+        """Channel-level failure: forgive the videos in the streak and space out restarts"""
+        self.breaker_trips += 1
+        wait = self.backoff(self.breaker_trips)
+        self.channel_retry_at = now + wait
+        if self.breaker_trips == 1:
+            forgiven = [video_id for video_id in self.streak if video_id in self.failures]
+            for video_id in forgiven:
+                del self.failures[video_id]
+            try:
+                with self.db.transaction() as conn:
+                    conn.executemany("UPDATE videos SET failure_count = 0 WHERE id = ? AND quarantined = 0",
+                                     [(video_id,) for video_id in forgiven])
+            except Exception as e:
+                self.logger.warning(f"⚠️ Could not clear failure counts: {e}")
+            self.logger.error(f"🔌 {len(self.streak)} different videos failed in a row - circuit breaker open, "
+                              f"not charging further failures to the media")
+        self.logger.warning(f"⏳ Channel restart backing off {wait:.0f}s (breaker trip {self.breaker_trips})")
+        return False
+
+    def healthy(self, video, seconds_on_air):
+        """Called each cycle with the on-air video; a long enough play clears its failures and the breaker"""
+        if seconds_on_air >= self.policy['healthy_seconds']:
+            self.succeeded(video)
+
+    def succeeded(self, video):
+        """A good play (or a clean end): clear the video's failures and close the breaker"""
+        if self.breaker_open():
+            self.logger.info(f"🔌 Circuit breaker closed: {video['display_name']} is playing normally")
+        self.streak = []
+        self.breaker_trips = 0
+        self.channel_retry_at = 0.0
+        if self.failures.pop(video['id'], None) is not None:
+            try:
+                self.db.execute("UPDATE videos SET failure_count = 0 WHERE id = ?", (video['id'],))
+            except Exception as e:
+                self.logger.warning(f"⚠️ Could not clear failure count of video {video['id']}: {e}")
@@ -0,0 +1,187 @@
+"""
+File Fingerprints for The Houston Collective Streaming Server
+Remembers what every content file looked like at the last scan so rescans only touch what changed
+"""
+
+import hashlib
+import os
+from collections import namedtuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_fingerprints (
+    file_path TEXT PRIMARY KEY,
+    file_size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    video_id INTEGER,
+    date_recorded DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_file_fingerprints_video ON file_fingerprints(video_id);
+"""
+
+# Content identity columns, added to tables created before they existed
+COLUMNS = (('content_hash', 'TEXT'), ('duplicate_of', 'INTEGER'))
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_file_fingerprints_hash ON file_fingerprints(content_hash);
+CREATE INDEX IF NOT EXISTS idx_file_fingerprints_duplicate ON file_fingerprints(duplicate_of);
+"""
+
+# Videos rows are looked up by path, so a new video and its fingerprint can share a batch.
+# duplicate_of names the file whose video this one is a byte-for-byte copy of.
+RECORD_SQL = """
+    INSERT INTO file_fingerprints (file_path, file_size, mtime_ns, inode, content_hash, video_id, duplicate_of,
+                                   date_recorded)
+    VALUES (?, ?, ?, ?, ?, (SELECT id FROM videos WHERE file_path = ?), (SELECT id FROM videos WHERE file_path = ?),
+            CURRENT_TIMESTAMP)
+    ON CONFLICT(file_path) DO UPDATE SET
+        file_size = excluded.file_size,
+        mtime_ns = excluded.mtime_ns,
+        inode = excluded.inode,
+        content_hash = excluded.content_hash,
+        video_id = excluded.video_id,
+        duplicate_of = excluded.duplicate_of,
+        date_recorded = excluded.date_recorded
+"""
+
+# A moved file keeps its videos row (and so its playlist entries); only the path changes
+MOVE_SQL = "UPDATE videos SET file_path = ?, filename = ? WHERE file_path = ?"
+
+# Partial hash: the size plus this many bytes from the start, middle and end of the file
+SAMPLE_SIZE = 64 * 1024
+
+Fingerprint = namedtuple('Fingerprint', 'size mtime_ns inode')
+
+
+def fingerprint(st):
+    """Fingerprint of an os.stat_result (or DirEntry.stat())"""
+    return Fingerprint(st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def partial_hash(path, size=None):
+    """Content identity of a file from its size and three sampled blocks; reads at most 192 KiB
+
+    Good enough to tell a renamed or moved file from a different one
+    without reading whole videos; not a cryptographic guarantee.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size if size is None else size
+        digest.update(str(size).encode())
+        if size <= 3 * SAMPLE_SIZE:
+            digest.update(f.read())
+        else:
+            for offset in (0, (size - SAMPLE_SIZE) // 2, size - SAMPLE_SIZE):
+                f.seek(offset)
+                digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def record_params(path, current, content_hash=None, duplicate_of=None):
+    """Parameters for RECORD_SQL"""
+    return (str(path), current.size, current.mtime_ns, current.inode, content_hash, str(path),
+            str(duplicate_of) if duplicate_of else None)
+
+
+def move_params(old_path, new_path):
+    """Parameters for MOVE_SQL"""
+    return (str(new_path), os.path.basename(str(new_path)), str(old_path))
+
+
+class ScanDiff:
+    """What changed on disk since the last scan, by file path"""
+
+    def __init__(self):
+        self.new = []        # never seen before
+        self.changed = []    # size, mtime or inode differs
+        self.missing = []    # recorded last time, gone now
+        self.unchanged = 0
+
+    def __bool__(self):
+        return bool(self.new or self.changed or self.missing)
+
+    def summary(self):
+        return {
+            'new': len(self.new),
+            'changed': len(self.changed),
+            'missing': len(self.missing),
+            'unchanged': self.unchanged,
+        }
+
+
+class FingerprintStore:
+    """file_fingerprints table: one row per content file, linked to its videos row when it has one"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.executescript(SCHEMA)
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(file_fingerprints)")}
+        for name, kind in COLUMNS:
+            if name not in existing:
+                self.conn.execute(f"ALTER TABLE file_fingerprints ADD COLUMN {name} {kind}")
+        self.conn.executescript(INDEXES)
+
+    def _select(self, query, column, values):
+        """Rows of query (ending in WHERE or AND) with column IN values, 500 values per statement"""
+        values = list(values)
+        rows = []
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+            rows += self.conn.execute(f"{query} {column} IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+        return rows
+
+    def load(self, paths=None):
+        """{file_path: (Fingerprint, video_id, content_hash)} for every recorded file (one query), or just the given paths"""
+        query = "SELECT file_path, file_size, mtime_ns, inode, video_id, content_hash FROM file_fingerprints"
+        if paths is None:
+            rows = self.conn.execute(query).fetchall()
+        else:
+            rows = self._select(f"{query} WHERE", 'file_path', [str(path) for path in paths])
+        return {row[0]: (Fingerprint(row[1], row[2], row[3]), row[4], row[5]) for row in rows}
+
+    def find_videos(self, hashes):
+        """{content_hash: file_path} for recorded files with these hashes that back a video"""
+        rows = self._select(
+            "SELECT content_hash, file_path FROM file_fingerprints WHERE video_id IS NOT NULL AND content_hash IS NOT NULL AND",
+            'content_hash', hashes
+        )
+        return {row[0]: row[1] for row in rows}
+
+    def find_duplicates(self, video_ids):
+        """{video_id: [file_path, ...]} for files recorded as copies of these videos"""
+        duplicates = {}
+        rows = self._select("SELECT duplicate_of, file_path FROM file_fingerprints WHERE", 'duplicate_of', video_ids)
+        for video_id, path in rows:
+            duplicates.setdefault(video_id, []).append(path)
+        return duplicates
+
+    def move(self, old_path, new_path):
+        """Follow a file the server moved itself: same video, same fingerprint, new path (no commit)"""
+        self.conn.execute(MOVE_SQL, move_params(old_path, new_path))
+        self.conn.execute("UPDATE file_fingerprints SET file_path = ? WHERE file_path = ?", (str(new_path), str(old_path)))
+
+    def diff(self, seen, recorded=None):
+        """Compare {file_path: Fingerprint} from a walk against the recorded fingerprints"""
+        recorded = self.load() if recorded is None else recorded
+        result = ScanDiff()
+        for path, current in seen.items():
+            previous = recorded.get(path)
+            if previous is None:
+                result.new.append(path)
+            elif previous[0] != current:
+                result.changed.append(path)
+            else:
+                result.unchanged += 1
+        result.missing = [path for path in recorded if path not in seen]
+        return result
+
+    def record(self, path, current, content_hash=None):
+        """Remember a file as scanned (no commit; the caller batches)"""
+        self.conn.execute(RECORD_SQL, record_params(path, current, content_hash))
+
+    def forget(self, paths):
+        self.conn.executemany("DELETE FROM file_fingerprints WHERE file_path = ?", [(str(path),) for path in paths])
+
+    def clear(self):
+        """Forget everything so the next scan looks at every file again"""
+        self.conn.execute("DELETE FROM file_fingerprints")
+        self.conn.commit()
@@ -0,0 +1,258 @@
+"""
+Media Integrity for The Houston Collective Streaming Server
+Full decodes of each video to find corrupt or truncated regions before they reach the live encoder
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import threading
+
+from .db import get_database
+from .progress import is_progress_key
+from .renditions import source_fingerprint
+
+CONFIG_FILE = '/opt/streamserver/config/media_verifier.json'
+
+DEFAULT_CONFIG = {
+    'enabled': True,
+    'nice': 19,
+    'threads': 1,             # decoder threads; verification is never urgent
+    'read_rate': 8,           # decode at most this many times real time (FFmpeg -readrate), 0 = unlimited
+    'pause_seconds': 5,       # rest between files
+    'region_padding': 5,      # seconds trimmed either side of a decode error
+    'min_segment': 30,        # clean stretches shorter than this are not worth airing
+    'decode_timeout': 6 * 3600,
+}
+
+# Verdicts
+OK = 'ok'                  # decoded start to end without errors
+DAMAGED = 'damaged'        # errors in some regions; the rest airs, trimmed around them
+UNPLAYABLE = 'unplayable'  # nothing worth airing decodes cleanly
+
+MAX_LOGGED_ERRORS = 50
+TRUNCATION_SLACK = 2.0     # decoded this much short of the container duration counts as truncated
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS media_integrity (
+        video_id INTEGER PRIMARY KEY,
+        source_fingerprint TEXT NOT NULL,
+        status TEXT NOT NULL,
+        error_count INTEGER DEFAULT 0,
+        decoded_duration REAL,
+        bad_regions TEXT,
+        errors TEXT,
+        date_verified DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE
+    );
+"""
+
+VERDICT_SAVE = """
+    INSERT OR REPLACE INTO media_integrity (video_id, source_fingerprint, status, error_count, decoded_duration,
+                                           bad_regions, errors, date_verified)
+    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+"""
+
+
+def load_verifier_config(path=CONFIG_FILE):
+    """Default verifier settings updated with config/media_verifier.json if present"""
+    config = dict(DEFAULT_CONFIG)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+
+def ensure_schema(conn):
+    conn.executescript(SCHEMA)
+
+
+def decode_command(file_path, config=DEFAULT_CONFIG):
+    """Decode every video and audio frame to a null sink, with errors and progress interleaved on stderr"""
+    rate = ['-readrate', str(config['read_rate'])] if config['read_rate'] else []
+    return [
+        'ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'error',
+        '-nostats', '-stats_period', '0.25', '-progress', 'pipe:2',
+        '-threads', str(config['threads']), *rate,
+        '-i', str(file_path),
+        '-map', '0:v:0?', '-map', '0:a:0?',
+        '-f', 'null', '-'
+    ]
+
+
+def parse_decode_log(lines):
+    """(decoded seconds, [(seconds, message)]) from decode_command's stderr
+
+    Progress blocks and error lines arrive in order on one stream, so each
+    error is stamped with the media time of the last progress report.
+    """
+    decoded = 0.0
+    errors = []
+    for line in lines:
+        line = line.strip()
+        key, sep, value = line.partition('=')
+        if sep and is_progress_key(key):
+            if key == 'out_time_us':
+                try:
+                    decoded = max(decoded, int(value) / 1e6)
+                except ValueError:
+                    pass  # 'N/A' before the first frame
+        elif line:
+            errors.append((decoded, line))
+    return decoded, errors
+
+
+def merge_regions(spans):
+    """[start, end] ranges with overlapping ones merged, in order"""
+    regions = []
+    for start, end in sorted(spans):
+        if regions and start <= regions[-1][1]:
+            regions[-1][1] = max(regions[-1][1], end)
+        else:
+            regions.append([start, end])
+    return regions
+
+
+def clean_segments(regions, duration=None, min_length=DEFAULT_CONFIG['min_segment']):
+    """[(start, end)] stretches of the file outside bad regions; end None = to the end of the file"""
+    segments = []
+    position = 0.0
+    for start, end in regions:
+        if start - position >= min_length:
+            segments.append((position, start))
+        position = max(position, end)
+    if duration is None or duration - position >= min_length:
+        segments.append((position, None))
+    return segments
+
+
+def verdict(decoded, errors, exit_code, duration, config=DEFAULT_CONFIG):
+    """(status, bad regions) for one decode"""
+    if exit_code != 0 and decoded == 0:
+        return UNPLAYABLE, [[0.0, duration or 0.0]]
+
+    padding = config['region_padding']
+    end_of_file = duration or decoded
+    spans = [(max(t - padding, 0.0), min(t + padding, end_of_file)) for t, _ in errors]
+    if duration and decoded < duration - TRUNCATION_SLACK:
+        # Truncated, or the decoder gave up: nothing after the last decoded frame can be trusted
+        spans.append((max(decoded - padding, 0.0), duration))
+    regions = merge_regions(spans)
+
+    if not regions:
+        return OK, []
+    if not clean_segments(regions, duration, config['min_segment']):
+        return UNPLAYABLE, regions
+    return DAMAGED, regions
+
+
+class MediaVerifier:
+    """Full-decode verification of the library, one verdict per video per source fingerprint"""
+
+    def __init__(self, db_path, config=None, logger=None):
+        self.config = config or load_verifier_config()
+        self.logger = logger or logging.getLogger(__name__)
+        self.db = get_database(db_path)
+        self._schema_ready = False
+
+    def get_db_connection(self):
+        """This thread's shared connection, with the media_integrity table created on first use"""
+        conn = self.db.connection()
+        if not self._schema_ready:
+            ensure_schema(conn)
+            self._schema_ready = True
+        return conn
+
+    # Scheduler side
+
+    def lookup(self, video):
+        """The current verdict for a video as a dict (bad_regions decoded), or None if unverified or changed"""
+        try:
+            fingerprint = source_fingerprint(video['file_path'])
+            row = self.get_db_connection().execute(
+                "SELECT status, source_fingerprint, decoded_duration, bad_regions FROM media_integrity WHERE video_id = ?",
+                (video['id'],)
+            ).fetchone()
+        except (OSError, sqlite3.Error):
+            return None
+        if row is None or row['source_fingerprint'] != fingerprint:
+            return None
+        return dict(row, bad_regions=json.loads(row['bad_regions'] or '[]'))
+
+    def segments(self, video):
+        """Clean (start, end) stretches to air: [(0, None)] when fine or unverified, [] when unplayable"""
+        result = self.lookup(video)
+        if result is None or result['status'] == OK:
+            return [(0.0, None)]
+        if result['status'] == UNPLAYABLE:
+            return []
+        return clean_segments(result['bad_regions'], video.get('duration') or None, self.config['min_segment'])
+
+    # Worker side
+
+    def pending_videos(self):
+        """Active videos with no verdict for their current file: scheduled content first"""
+        rows = self.get_db_connection().execute("""
+            SELECT v.id, v.file_path, v.display_name, v.duration, i.source_fingerprint,
+                   EXISTS(SELECT 1 FROM video_playlists vp WHERE vp.video_id = v.id) as in_playlist
+            FROM videos v
+            LEFT JOIN media_integrity i ON i.video_id = v.id
+            WHERE v.is_active = 1
+            ORDER BY in_playlist DESC, v.id
+        """).fetchall()
+
+        pending = []
+        for row in rows:
+            try:
+                fingerprint = source_fingerprint(row['file_path'])
+            except OSError:
+                continue
+            if row['source_fingerprint'] != fingerprint:
+                pending.append(dict(row, fingerprint=fingerprint))
+        return pending
+
+    def verify(self, video):
+        """Decode one video end to end and record the verdict; returns the status"""
+        fingerprint = video.get('fingerprint') or source_fingerprint(video['file_path'])
+        duration = float(video['duration']) if video.get('duration') else None
+        self.logger.info(f"Verifying {video['display_name']}")
+
+        try:
+            process = subprocess.Popen(
+                decode_command(video['file_path'], self.config),
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors='replace'
+            )
+            timer = threading.Timer(self.config['decode_timeout'], process.kill)
+            timer.start()
+            try:
+                decoded, errors = parse_decode_log(process.stderr)
+                exit_code = process.wait()
+            finally:
+                timer.cancel()
+        except OSError as e:
+            self.logger.error(f"Verification of {video['display_name']} could not run: {e}")
+            return None
+
+        status, regions = verdict(decoded, errors, exit_code, duration, self.config)
+        logged = [[round(t, 2), message] for t, message in errors[:MAX_LOGGED_ERRORS]]
+        self.get_db_connection()  # creates the table on first use
+        self.db.execute(VERDICT_SAVE, (
+            video['id'], fingerprint, status, len(errors), round(decoded, 3),
+            json.dumps([[round(a, 2), round(b, 2)] for a, b in regions]), json.dumps(logged)
+        ))
+
+        if status == OK:
+            self.logger.info(f"Verified {video['display_name']}: clean ({decoded:.0f}s decoded)")
+        else:
+            spans = ', '.join(f'{a:.0f}-{b:.0f}s' for a, b in regions)
+            self.logger.warning(f"Verified {video['display_name']}: {status}, {len(errors)} decode errors in {spans}")
+        return status
+
+    def status_summary(self):
+        """Verdict counts"""
+        rows = self.get_db_connection().execute(
+            "SELECT status, COUNT(*) as count FROM media_integrity GROUP BY status"
+        ).fetchall()
+        return {row['status']: row['count'] for row in rows}
@@ -0,0 +1,140 @@
+"""
+Background Jobs for The Houston Collective Streaming Server
+A jobs table the admin UI submits to and polls, worked by job_worker.py
+"""
+
+import json
+import time
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Keep in step with Database::ensureJobsTable() in scripts/database.php
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_type TEXT NOT NULL,
+    params TEXT,
+    priority INTEGER DEFAULT 0,
+    status TEXT DEFAULT 'queued',
+    progress REAL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    date_created DATETIME DEFAULT CURRENT_TIMESTAMP,
+    date_started DATETIME,
+    date_finished DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, priority DESC, id);
+"""
+
+
+def _decode(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job['params'] = json.loads(job['params']) if job['params'] else {}
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+class JobQueue:
+    """Submit, claim and report on jobs; every state change is one short transaction"""
+
+    def __init__(self, db):
+        self.db = db
+        self.db.connection().executescript(SCHEMA)
+
+    def submit(self, job_type, params=None, priority=0):
+        """Queue a job, or return the id of an identical one still waiting"""
+        params_json = json.dumps(params or {}, sort_keys=True, separators=(',', ':'))  # matches PHP json_encode
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE job_type = ? AND params = ? AND status = ?",
+                (job_type, params_json, QUEUED)
+            ).fetchone()
+            if row:
+                return row[0]
+            return conn.execute(
+                "INSERT INTO jobs (job_type, params, priority) VALUES (?, ?, ?)",
+                (job_type, params_json, priority)
+            ).lastrowid
+
+    def claim(self, exclude_types=()):
+        """Mark the most urgent queued job running and return it, or None"""
+        conn = self.db.connection()
+        if conn.in_transaction:
+            conn.commit()
+        exclude_types = list(exclude_types)
+        placeholders = ','.join('?' * len(exclude_types))
+        with self.db.transaction():
+            conn.execute("BEGIN IMMEDIATE")  # no second worker can claim the same row
+            row = conn.execute(f"""
+                SELECT * FROM jobs WHERE status = ?
+                {f'AND job_type NOT IN ({placeholders})' if exclude_types else ''}
+                ORDER BY priority DESC, id LIMIT 1
+            """, [QUEUED] + exclude_types).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = 0, date_started = CURRENT_TIMESTAMP WHERE id = ?",
+                (RUNNING, row['id'])
+            )
+        job = _decode(row)
+        job['status'] = RUNNING
+        return job
+
+    def update_progress(self, job_id, progress, message=None):
+        self.db.execute(
+            "UPDATE jobs SET progress = ?, message = COALESCE(?, message) WHERE id = ?",
+            (round(progress, 4), message, job_id)
+        )
+
+    def finish(self, job_id, result=None, message=None):
+        self.db.execute("""
+            UPDATE jobs SET status = ?, progress = 1, result = ?, message = COALESCE(?, message),
+                            date_finished = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (DONE, json.dumps(result) if result is not None else None, message, job_id))
+
+    def fail(self, job_id, error):
+        self.db.execute(
+            "UPDATE jobs SET status = ?, error = ?, date_finished = CURRENT_TIMESTAMP WHERE id = ?",
+            (FAILED, str(error)[-2000:], job_id)
+        )
+
+    def requeue_running(self):
+        """Put jobs a dead worker left running back in the queue; returns how many"""
+        return self.db.execute(
+            "UPDATE jobs SET status = ?, progress = 0, date_started = NULL WHERE status = ?", (QUEUED, RUNNING)
+        ).rowcount
+
+    def get(self, job_id):
+        return _decode(self.db.connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def prune(self, days=14):
+        """Forget finished jobs older than days"""
+        return self.db.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND date_finished < datetime('now', ?)",
+            (DONE, FAILED, f'-{int(days)} days')
+        ).rowcount
+
+
+class JobProgress:
+    """Progress callback for one job: progress(done, total, message), written at most once a second"""
+
+    def __init__(self, queue, job_id, interval=1.0):
+        self.queue = queue
+        self.job_id = job_id
+        self.interval = interval
+        self._last_write = 0
+
+    def __call__(self, done, total, message=None):
+        now = time.monotonic()
+        if now - self._last_write < self.interval and done < total:
+            return
+        self._last_write = now
+        self.queue.update_progress(self.job_id, done / total if total else 0, message)
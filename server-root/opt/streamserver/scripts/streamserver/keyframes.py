@@ -0,0 +1,169 @@
+"""
+Keyframe Index for The Houston Collective Streaming Server
+One-time per-video list of keyframe times and byte offsets, so thumbnails and seeks land on a keyframe without rescanning
+"""
+
+import struct
+import subprocess
+import sys
+from array import array
+from bisect import bisect_right
+
+from .containers import read_keyframes
+from .renditions import source_fingerprint
+
+MAGIC = b'KFX1'
+MIN_SPACING = 0.2  # seconds; all-intra sources would otherwise index every frame
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS keyframe_index (
+        video_id INTEGER PRIMARY KEY,
+        source_fingerprint TEXT NOT NULL,
+        keyframe_count INTEGER NOT NULL,
+        index_blob BLOB,
+        date_created DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE
+    );
+"""
+
+# Written through the processor's BatchWriter
+KEYFRAMES_SAVE = """
+    INSERT OR REPLACE INTO keyframe_index (video_id, source_fingerprint, keyframe_count, index_blob)
+    VALUES (?, ?, ?, ?)
+"""
+
+
+def ensure_schema(conn):
+    conn.executescript(SCHEMA)
+
+
+class KeyframeIndex:
+    """Keyframe presentation times (ms) and byte offsets as two packed arrays
+
+    Packed form is MAGIC, a little-endian uint32 count, count uint32
+    milliseconds, then count int64 offsets: 12 bytes per keyframe.
+    """
+
+    def __init__(self, times_ms=None, offsets=None):
+        self.times_ms = times_ms if times_ms is not None else array('I')
+        self.offsets = offsets if offsets is not None else array('q')
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """Index from (seconds, byte offset) pairs in any order, thinned to MIN_SPACING"""
+        index = cls()
+        last = None
+        for seconds, offset in sorted(pairs):
+            ms = max(int(round(seconds * 1000)), 0)
+            if last is not None and ms - last < MIN_SPACING * 1000:
+                continue
+            index.times_ms.append(ms)
+            index.offsets.append(offset if offset is not None else -1)
+            last = ms
+        return index
+
+    def __len__(self):
+        return len(self.times_ms)
+
+    def pack(self):
+        times, offsets = array('I', self.times_ms), array('q', self.offsets)
+        if sys.byteorder != 'little':
+            times.byteswap()
+            offsets.byteswap()
+        return MAGIC + struct.pack('<I', len(times)) + times.tobytes() + offsets.tobytes()
+
+    @classmethod
+    def unpack(cls, blob):
+        if not blob or blob[:4] != MAGIC:
+            return cls()
+        count = struct.unpack_from('<I', blob, 4)[0]
+        times, offsets = array('I'), array('q')
+        times.frombytes(blob[8:8 + 4 * count])
+        offsets.frombytes(blob[8 + 4 * count:8 + 12 * count])
+        if sys.byteorder != 'little':
+            times.byteswap()
+            offsets.byteswap()
+        return cls(times, offsets)
+
+    def before(self, seconds):
+        """(seconds, byte offset) of the last keyframe at or before seconds (the first one if none), or None"""
+        if not self.times_ms:
+            return None
+        i = max(bisect_right(self.times_ms, int(seconds * 1000)) - 1, 0)
+        return self.times_ms[i] / 1000, self.offsets[i]
+
+    def nearest(self, seconds):
+        """(seconds, byte offset) of the keyframe closest to seconds, or None"""
+        if not self.times_ms:
+            return None
+        i = bisect_right(self.times_ms, int(seconds * 1000))
+        candidates = [j for j in (i - 1, i) if 0 <= j < len(self.times_ms)]
+        j = min(candidates, key=lambda j: abs(self.times_ms[j] - seconds * 1000))
+        return self.times_ms[j] / 1000, self.offsets[j]
+
+
+def probe_keyframes(file_path, timeout=600):
+    """(seconds, byte offset) pairs from FFprobe's packet list: one demux pass, nothing decoded"""
+    cmd = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,pos,flags', '-of', 'compact=p=0', str(file_path)
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-500:])
+    pairs = []
+    for line in result.stdout.splitlines():
+        fields = dict(field.partition('=')[::2] for field in line.split('|'))
+        if 'K' not in fields.get('flags', '') or fields.get('pts_time') in (None, '', 'N/A'):
+            continue
+        pos = fields.get('pos')
+        pairs.append((float(fields['pts_time']), int(pos) if pos and pos != 'N/A' else None))
+    return pairs
+
+
+def build_index(file_path):
+    """KeyframeIndex from the container tables when they have it, else from FFprobe"""
+    pairs = read_keyframes(file_path)
+    if pairs is None:
+        pairs = probe_keyframes(file_path)
+    return KeyframeIndex.from_pairs(pairs)
+
+
+def seek_input_args(file_path, seconds, index=None, until=None):
+    """-ss/-i that land on a keyframe: the one before seconds when indexed, else FFmpeg's own seek
+
+    until stops reading at that position in the file (-t), e.g. before a damaged region.
+    """
+    keyframe = index.before(seconds) if index else None
+    if keyframe:
+        seconds = keyframe[0]
+    args = ['-ss', f'{seconds:.3f}'] if seconds > 0 else []
+    if until is not None:
+        args += ['-t', f'{max(until - seconds, 0.0):.3f}']
+    return args + ['-i', str(file_path)]
+
+
+class KeyframeStore:
+    """keyframe_index rows, valid only while the file's size and mtime are unchanged"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def load(self, video_id, file_path):
+        """The stored KeyframeIndex, or None if missing or the file has changed since"""
+        row = self.db.connection().execute(
+            "SELECT source_fingerprint, index_blob FROM keyframe_index WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        try:
+            if row is None or row['source_fingerprint'] != source_fingerprint(file_path):
+                return None
+        except OSError:
+            return None
+        return KeyframeIndex.unpack(row['index_blob'])
+
+    @staticmethod
+    def save_params(video_id, file_path, index):
+        return (video_id, source_fingerprint(file_path), len(index), index.pack())
+
+    def save(self, video_id, file_path, index):
+        self.db.execute(KEYFRAMES_SAVE, self.save_params(video_id, file_path, index))
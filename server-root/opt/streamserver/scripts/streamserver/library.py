@@ -0,0 +1,84 @@
+"""
+Content Library for The Houston Collective Streaming Server
+Single-pass walk of the content tree: folders, video files and their stat results together
+"""
+
+import logging
+import os
+import stat
+from pathlib import Path
+
+SUPPORTED_FORMATS = {'.mp4', '.mkv', '.avi', '.mov', '.m4v', '.flv', '.ts', '.webm'}
+
+
+class ContentTree:
+    """Everything one walk found"""
+
+    def __init__(self, root):
+        self.root = str(root)
+        self.folders = {}   # rel_path -> (folder_name, parent_folder, video_count), root excluded
+        self.videos = []    # (Path, os.stat_result) for non-empty regular video files
+        self.invalid = []   # video-named entries that are empty or not regular files
+        self.unreadable = set()  # directories (and entries) that could not be read; their contents are unknown
+        self.directories_read = 0
+
+    def undecided(self, paths):
+        """The paths among these the walk cannot vouch for either way: under an unreadable directory, or not stat-able"""
+        invalid = {str(path) for path in self.invalid}
+        prefixes = tuple(os.path.join(directory, '') for directory in self.unreadable)
+        return {path for path in paths
+                if path in invalid or path in self.unreadable or (prefixes and path.startswith(prefixes))}
+
+
+def is_video_name(name, extensions=SUPPORTED_FORMATS):
+    return os.path.splitext(name)[1].lower() in extensions
+
+
+def walk_content(root, extensions=SUPPORTED_FORMATS, logger=None):
+    """Read every directory under root once with os.scandir
+
+    Directory type comes from the entry itself; only video files are
+    stat()ed, once each. Symlinked directories are not descended, as with os.walk.
+    """
+    logger = logger or logging.getLogger(__name__)
+    tree = ContentTree(root)
+    stack = [(tree.root, '')]
+
+    while stack:
+        directory, rel_dir = stack.pop()
+        video_count = 0
+        try:
+            with os.scandir(directory) as entries:
+                tree.directories_read += 1
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink():
+                                rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                                stack.append((entry.path, rel_path))
+                            continue
+                    except OSError:
+                        tree.unreadable.add(entry.path)
+                        continue
+
+                    if not is_video_name(entry.name, extensions):
+                        continue
+                    video_count += 1
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        st = None
+                    if st and stat.S_ISREG(st.st_mode) and st.st_size > 0:
+                        tree.videos.append((Path(entry.path), st))
+                    else:
+                        tree.invalid.append(Path(entry.path))
+        except OSError as e:
+            logger.warning(f"Cannot read directory {directory}: {e}")
+            tree.unreadable.add(directory)
+            continue
+
+        if rel_dir:
+            parent = os.path.dirname(rel_dir)
+            tree.folders[rel_dir] = (os.path.basename(rel_dir), parent or None, video_count)
+
+    return tree
@@ -0,0 +1,29 @@
+"""
+Media Probing for The Houston Collective Streaming Server
+Small helpers around FFprobe shared by the publishers and content tools
+"""
+
+import subprocess
+
+from .containers import read_headers
+
+
+def probe_duration(file_path, fallback=None):
+    """Exact container duration in seconds (float), or fallback if FFprobe can't tell
+
+    MP4 and Matroska files usually answer from their headers without starting FFprobe.
+    """
+    headers = read_headers(file_path)
+    if headers:
+        return float(headers['format']['duration'])
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', str(file_path)],
+            capture_output=True, text=True, timeout=15
+        )
+        if result.returncode == 0:
+            return float(result.stdout.strip())
+    except (subprocess.TimeoutExpired, ValueError, OSError):
+        pass
+    return fallback
@@ -0,0 +1,265 @@
+"""
+Encoder Monitoring for The Houston Collective Streaming Server
+Drains FFmpeg output continuously and turns -progress reports into live health metrics
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from .events import ENCODER_STALLED, PROCESS_EXIT
+
+# Keys FFmpeg writes in each -progress block; everything else is a log line
+PROGRESS_KEYS = {
+    'frame', 'fps', 'bitrate', 'total_size', 'out_time_us', 'out_time_ms', 'out_time',
+    'dup_frames', 'drop_frames', 'speed', 'progress',
+}
+
+
+def is_progress_key(key):
+    """Whether a key=value line belongs to a -progress block (per-stream stream_N_M_q= lines included)"""
+    return key in PROGRESS_KEYS or key.startswith('stream_')
+
+
+def progress_args(target):
+    """Global FFmpeg options that write a key=value progress block to target twice a second"""
+    return ['-nostats', '-stats_period', '0.5', '-progress', target]
+
+
+def _number(value, suffix=''):
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None  # 'N/A' while the encoder is still starting
+
+
+def parse_progress(block):
+    """Raw -progress key/values -> metrics with numbers and units normalised"""
+    out_time_us = _number(block.get('out_time_us', ''))
+    return {
+        'frame': _number(block.get('frame', '')),
+        'fps': _number(block.get('fps', '')),
+        'speed': _number(block.get('speed', ''), 'x'),
+        'bitrate_kbps': _number(block.get('bitrate', ''), 'kbits/s'),
+        'total_size': _number(block.get('total_size', '')),
+        'out_time': out_time_us / 1e6 if out_time_us is not None else None,
+        'dup_frames': _number(block.get('dup_frames', '')),
+        'drop_frames': _number(block.get('drop_frames', '')),
+        'state': block.get('progress'),
+    }
+
+
+class EncoderMonitor:
+    """Reader threads for one FFmpeg process: progress metrics plus a ring buffer of log lines"""
+
+    def __init__(self, name, history=200, stall_seconds=3.0, startup_grace=15.0):
+        self.name = name
+        self.lines = deque(maxlen=history)
+        self.stall_seconds = stall_seconds  # None = never report this encoder as stalled
+        self.startup_grace = startup_grace
+        self.metrics = {}
+        self.process = None
+        self.started_at = None
+        self.last_progress = None
+        self.reports = 0
+        self.adaptive = False  # a live encode the encoding ladder should follow
+        self.level = 0         # ladder rung the process was started at
+        self._samples = deque(maxlen=20)  # (monotonic, out_time) for the instantaneous rate
+        self._block = {}
+        self._lock = threading.Lock()
+
+    def attach(self, process, progress_stream=None, log_stream=None):
+        """Start draining a process's pipes (both may be the same stream)"""
+        self.process = process
+        self.started_at = time.monotonic()
+        streams = [progress_stream]
+        if log_stream is not progress_stream:
+            streams.append(log_stream)
+        for stream in streams:
+            if stream:
+                threading.Thread(target=self._drain, args=(stream,),
+                                 name=f'{self.name}-drain', daemon=True).start()
+        return self
+
+    def _drain(self, stream):
+        try:
+            for raw in iter(stream.readline, b''):
+                line = raw.decode(errors='replace').rstrip()
+                if not line:
+                    continue
+                key, sep, value = line.partition('=')
+                if sep and is_progress_key(key):
+                    self._block[key] = value
+                    if key == 'progress':
+                        self._commit()
+                else:
+                    self.lines.append(line)
+        except (OSError, ValueError):
+            pass  # pipe closed under us during shutdown
+        finally:
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def _commit(self):
+        metrics = parse_progress(self._block)
+        self._block = {}
+        now = time.monotonic()
+
+        # FFmpeg's speed= averages over the whole run; the ladder needs the last few seconds
+        metrics['rate'] = None
+        if metrics['out_time'] is not None:
+            self._samples.append((now, metrics['out_time']))
+            while now - self._samples[0][0] > 5.0:
+                self._samples.popleft()
+            first_time, first_out = self._samples[0]
+            if now - first_time >= 2.0:
+                metrics['rate'] = round((metrics['out_time'] - first_out) / (now - first_time), 3)
+
+        with self._lock:
+            self.metrics = metrics
+            self.last_progress = now
+            self.reports += 1
+
+    def exited(self):
+        return self.process is not None and self.process.poll() is not None
+
+    def stalled(self, now=None):
+        """True when a running encoder has stopped reporting progress"""
+        if self.stall_seconds is None or not self.process or self.exited():
+            return False
+        now = now or time.monotonic()
+        with self._lock:
+            last_progress = self.last_progress
+        if last_progress is None:
+            return now - self.started_at > self.startup_grace
+        return now - last_progress > self.stall_seconds
+
+    def tail(self, count=10):
+        return list(self.lines)[-count:]
+
+    def snapshot(self):
+        """JSON-friendly state for the dashboard"""
+        now = time.monotonic()
+        with self._lock:
+            metrics = dict(self.metrics)
+            last_progress = self.last_progress
+        return {
+            'pid': self.process.pid if self.process else None,
+            'running': bool(self.process) and not self.exited(),
+            'returncode': self.process.poll() if self.process else None,
+            'uptime': round(now - self.started_at, 1) if self.started_at else None,
+            'progress_age': round(now - last_progress, 1) if last_progress else None,
+            'stalled': self.stalled(now),
+            'metrics': metrics,
+            'log_tail': self.tail(),
+        }
+
+
+class EncoderWatchdog:
+    """Checks the watched encoders twice a second; wakes the scheduler and publishes status"""
+
+    def __init__(self, notifier=None, status_path=None, interval=0.5, logger=None):
+        self.notifier = notifier
+        self.status_path = status_path
+        self.interval = interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.monitors = {}
+        self._flagged = {}  # name -> last reason reported, so each condition is reported once
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_write = 0
+        self.listeners = []  # callables run with the watchdog on every check
+        self.extras = {}     # extra top-level fields for the status file
+
+    def watch(self, monitor):
+        """Watch a monitor under its name, replacing whatever had that name before"""
+        with self._lock:
+            self.monitors[monitor.name] = monitor
+            self._flagged.pop(monitor.name, None)
+
+    def unwatch(self, name):
+        with self._lock:
+            self.monitors.pop(name, None)
+            self._flagged.pop(name, None)
+
+    def get(self, name):
+        with self._lock:
+            return self.monitors.get(name)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='encoder-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def watched(self):
+        with self._lock:
+            return list(self.monitors.values())
+
+    def snapshot(self):
+        monitors = self.watched()
+        return {
+            'updated_at': datetime.now().isoformat(),
+            'encoders': {monitor.name: monitor.snapshot() for monitor in monitors},
+            **self.extras,
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+            for listener in self.listeners:
+                try:
+                    listener(self)
+                except Exception as e:
+                    self.logger.error(f"❌ Encoder watchdog listener failed: {e}")
+            if self.status_path and time.monotonic() - self._last_write >= 1.0:
+                self._last_write = time.monotonic()
+                self._write_status()
+
+    def check(self):
+        """Notify once per stall or exit of each supervised encoder (metrics-only ones are skipped)"""
+        with self._lock:
+            monitors = [monitor for monitor in self.monitors.values() if monitor.stall_seconds is not None]
+
+        for monitor in monitors:
+            if monitor.exited():
+                reason = PROCESS_EXIT
+            elif monitor.stalled():
+                reason = ENCODER_STALLED
+            else:
+                with self._lock:
+                    self._flagged.pop(monitor.name, None)
+                continue
+
+            with self._lock:
+                if self._flagged.get(monitor.name) == reason or self.monitors.get(monitor.name) is not monitor:
+                    continue
+                self._flagged[monitor.name] = reason
+
+            if reason == ENCODER_STALLED:
+                self.logger.warning(f"⚠️ Encoder '{monitor.name}' stopped reporting progress: {' | '.join(monitor.tail(3))}")
+            if self.notifier:
+                self.notifier.notify(reason)
+
+    def _write_status(self):
+        try:
+            tmp_path = f'{self.status_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f, separators=(',', ':'))
+            os.replace(tmp_path, self.status_path)
+        except (OSError, TypeError, ValueError) as e:
+            self.logger.debug(f"Encoder status write failed: {e}")
@@ -0,0 +1,522 @@
+"""
+Pipe Publishers for The Houston Collective Streaming Server
+Keep one RTMP session open and splice per-video MPEG-TS feeds into it back to back
+"""
+
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+
+from .adaptive import FRAME_SIZE_KEYS
+from .compat import COPY, AUDIO, FULL, encode_mode
+from .encoding import load_profile, video_args, video_filter, audio_args
+from .events import ITEM_ENDED
+from .keyframes import seek_input_args
+from .probe import probe_duration
+from .progress import EncoderMonitor, progress_args
+
+
+class PublishItem:
+    """One video on the publisher timeline"""
+
+    def __init__(self, video, offset, duration, start_at=0.0):
+        self.video = video
+        self.offset = offset          # media time of the first frame, seconds
+        self.duration = duration      # seconds still to play, None if unknown
+        self.start_at = start_at      # position in the file the item starts from, seconds
+        self.stop_at = None           # position in the file the item stops at (trimmed), None = its end
+        self.rendition = None         # cached channel-profile copy, streamed without re-encoding
+        self.mode = None              # how the source is fed: 'cached', an encode mode, or a feed mode
+        self.monitor = None
+        self.process = None
+        self.started_at = None        # monotonic time the item went on air
+        self.returncode = None
+
+    @property
+    def end(self):
+        if self.duration is None:
+            return None
+        return self.offset + self.duration
+
+
+class GaplessPublisher:
+    """Double-buffered publisher: a copy relay holds the RTMP publish, item encoders feed it
+
+    Each video is encoded to MPEG-TS on stdout with its timestamps shifted to
+    continue where the previous item ended. The next item's encoder is spawned
+    ahead of time and left blocked on its pipe, so at the boundary the pump
+    thread just switches which stdout it copies into the relay.
+    """
+
+    CUT_MARGIN = 1.0  # seconds of headroom when cutting mid-item
+
+    def __init__(self, rtmp_url, notifier=None, logger=None, profile=None, renditions=None, watchdog=None):
+        self.rtmp_url = rtmp_url
+        self.notifier = notifier
+        self.logger = logger or logging.getLogger(__name__)
+        self.profile = profile or load_profile()
+        self.renditions = renditions  # RenditionCache, or None to always encode live
+        self.watchdog = watchdog      # EncoderWatchdog that reports stalls and publishes metrics
+        self.level = 0                # encoding ladder rung the live encodes run at
+        self.overrides = {}           # profile settings replaced by that rung
+
+        self.relay = None
+        self.relay_monitor = None
+        self.current = None
+        self.prepared = None
+        self.last_finished = None
+        self.clock_base = None
+        self.running = False
+
+        self._cond = threading.Condition()
+        self._pump_thread = None
+
+    # Commands
+
+    def sink_command(self):
+        """Long-lived process that owns the RTMP session"""
+        return [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+            '-re',
+            '-f', 'mpegts', '-i', 'pipe:0',
+            '-c', 'copy',
+            '-f', 'flv', '-flvflags', 'no_duration_filesize',
+            self.rtmp_url
+        ]
+
+    @staticmethod
+    def pipe_output_args(item):
+        """MPEG-TS on stdout with timestamps continuing the channel timeline"""
+        return [
+            '-output_ts_offset', f'{item.offset:.3f}',
+            '-muxdelay', '0', '-muxpreload', '0',
+            '-f', 'mpegts', 'pipe:1'
+        ]
+
+    @staticmethod
+    def input_args(item, path):
+        """-i for an item's source, seeking first when it resumes part way through and stopping early if trimmed"""
+        return seek_input_args(path, item.start_at, until=item.stop_at)
+
+    def live_profile(self):
+        """Channel profile with the current encoding ladder rung applied, except its frame size
+
+        The copy relay sent one AVC sequence header for the channel size, and
+        COPY items and renditions keep that size, so live encodes must too.
+        """
+        overrides = {key: value for key, value in self.overrides.items() if key not in FRAME_SIZE_KEYS}
+        return dict(self.profile, **overrides)
+
+    def rendition_command(self, item):
+        """Per-item process for a cached rendition: already in the channel profile, so just copy"""
+        return [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+            *self.input_args(item, item.rendition),
+            '-map', '0:v:0', '-map', '0:a:0?',
+            '-c', 'copy',
+            *self.pipe_output_args(item)
+        ]
+
+    def source_command(self, item):
+        """Per-item process writing MPEG-TS to stdout"""
+        if item.rendition:
+            return self.rendition_command(item)
+
+        video = item.video
+        command = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+            *self.input_args(item, video['file_path']),
+        ]
+        tail = self.pipe_output_args(item)
+
+        if item.mode == COPY:
+            return command + ['-map', '0:v:0', '-map', '0:a:0', '-c', 'copy'] + tail
+
+        if item.mode == AUDIO:
+            if video.get('audio_codec'):
+                command += ['-map', '0:v:0', '-map', '0:a:0']
+            else:
+                command += [
+                    '-f', 'lavfi', '-i', f"anullsrc=r={self.profile['audio_rate']}:cl=stereo",
+                    '-map', '0:v:0', '-map', '1:a:0', '-shortest'
+                ]
+            return command + ['-c:v', 'copy', *audio_args(self.profile)] + tail
+
+        # Full encode, scaled like the renditions so everything splices into the copy relay
+        profile = self.live_profile()
+        return command + [
+            '-map', '0:v:0', '-map', '0:a:0?',
+            '-vf', video_filter(profile),
+            *video_args(profile),
+            *audio_args(profile),
+        ] + tail
+
+    def item_mode(self, item):
+        """How an item's source will be fed, from the scanner's stored verdict"""
+        return 'cached' if item.rendition else encode_mode(item.video, self.profile)
+
+    def adaptive_feed(self, item):
+        """Whether this feeder is a live x264 encode whose speed the ladder should follow"""
+        return item.mode == FULL
+
+    def adaptive_sink(self):
+        return False  # the copy relay's speed says nothing about encoder load
+
+    # Lifecycle
+
+    def start(self):
+        """Start the RTMP sink and the pump thread"""
+        self.stop()
+        self.logger.info("📡 Opening publisher RTMP session")
+        command = self.sink_command()
+        command[1:1] = progress_args('pipe:1')
+        self.relay = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+            preexec_fn=os.setsid
+        )
+        # The sink paces the channel, so it is the one whose progress means "on air"
+        self.relay_monitor = EncoderMonitor('sink').attach(self.relay, self.relay.stdout, self.relay.stderr)
+        self.relay_monitor.adaptive = self.adaptive_sink()
+        self.relay_monitor.level = self.level
+        if self.watchdog:
+            self.watchdog.watch(self.relay_monitor)
+        self.clock_base = None
+        self.running = True
+        self._pump_thread = threading.Thread(target=self._pump, args=(self.relay,),
+                                             name='publisher-pump', daemon=True)
+        self._pump_thread.start()
+        return True
+
+    def is_alive(self):
+        return self.running and self.relay is not None and self.relay.poll() is None
+
+    def stop(self):
+        """Tear down all encoders and close the RTMP session"""
+        if self.watchdog:
+            self.watchdog.unwatch('sink')
+            self.watchdog.unwatch('feed')
+        with self._cond:
+            self.running = False
+            items = [self.current, self.prepared]
+            self.current = None
+            self.prepared = None
+            self._cond.notify_all()
+
+        for item in items:
+            if item:
+                self._kill(item.process)
+
+        if self.relay:
+            try:
+                self.relay.stdin.close()
+            except OSError:
+                pass
+            self._kill(self.relay, timeout=10)
+            self.relay = None
+
+    # Timeline
+
+    def media_clock(self):
+        """Media time currently going out, as paced by the sink's -re"""
+        if self.clock_base is None:
+            return 0.0
+        base_time, base_offset = self.clock_base
+        return base_offset + (time.monotonic() - base_time)
+
+    def remaining(self):
+        """Seconds left in the current item, or None if unknown"""
+        with self._cond:
+            item = self.current
+        if not item or item.end is None:
+            return None
+        return item.end - self.media_clock()
+
+    def play(self, video, start_at=0.0):
+        """Cut to a video now (schedule switch, first item or recovery), optionally part way in"""
+        if not self.is_alive():
+            self.start()
+
+        if self.clock_base is None:
+            self.clock_base = (time.monotonic(), 0.0)
+            offset = 0.0
+        else:
+            offset = self.media_clock() + self.CUT_MARGIN
+
+        item = self._spawn(video, offset, start_at)
+        if not item:
+            return False
+
+        with self._cond:
+            old = [self.current, self.prepared]
+            self.current = item
+            self.prepared = None
+            self._on_air(item)
+            self._cond.notify_all()
+
+        for previous in old:
+            if previous:
+                self._kill(previous.process)
+
+        self.logger.info(f"▶️ On air: {video['display_name']} (t={offset:.1f}s, {item.mode})")
+        return True
+
+    def prepare(self, video):
+        """Pre-spawn the encoder for the item that follows the current one"""
+        with self._cond:
+            current = self.current
+            if self.prepared or not current or current.end is None:
+                return False
+
+        item = self._spawn(video, current.end)
+        if not item:
+            return False
+
+        with self._cond:
+            if self.current is not current or self.prepared:
+                self._kill(item.process)
+                return False
+            self.prepared = item
+
+        self.logger.info(f"⏭️ Prepared next: {video['display_name']} (t={item.offset:.1f}s, {item.mode})")
+        return True
+
+    def _spawn(self, video, offset, start_at=0.0):
+        path = video['file_path']
+        if not os.path.exists(path):
+            self.logger.error(f"❌ Video file not found: {path}")
+            return None
+
+        # Videos split around damaged regions carry the stretch of the file to play
+        start_at = max(start_at, video.get('play_from') or 0.0)
+        stop_at = video.get('play_until')
+
+        rendition = self.renditions.lookup(video) if self.renditions else None
+        duration = probe_duration(rendition or path, video.get('duration') or None)
+        if stop_at is not None:
+            duration = stop_at if duration is None else min(duration, stop_at)
+        if duration is not None:
+            duration = max(duration - start_at, 0.0)
+        item = PublishItem(video, offset, duration, start_at)
+        item.stop_at = stop_at
+        item.rendition = rendition
+        item.mode = self.item_mode(item)
+        command = self.source_command(item)
+        command[1:1] = progress_args('pipe:2')  # stdout carries the MPEG-TS
+        try:
+            item.process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                preexec_fn=os.setsid
+            )
+        except Exception as e:
+            self.logger.error(f"❌ Failed to start encoder for {path}: {e}")
+            return None
+        # Feeders legitimately block on the pipe, so they report metrics but never "stall"
+        item.monitor = EncoderMonitor('feed', stall_seconds=None).attach(item.process, item.process.stderr)
+        item.monitor.adaptive = self.adaptive_feed(item)
+        item.monitor.level = self.level
+        return item
+
+    # Encoding ladder
+
+    def position(self):
+        """(video, seconds into its file) currently going out, or None"""
+        with self._cond:
+            item = self.current
+        if not item:
+            return None
+        return item.video, item.start_at + max(self.media_clock() - item.offset, 0.0)
+
+    def set_encoding(self, level, overrides):
+        """Switch live encodes to a ladder rung, re-cutting the on-air item if it is encoded live"""
+        self.level = level
+        self.overrides = dict(overrides)
+        with self._cond:
+            item = self.current
+        if item and self.adaptive_feed(item):
+            self.resume_current()
+
+    def resume_current(self):
+        """Restart the on-air video from where it is now with the current settings"""
+        position = self.position()
+        if position:
+            video, start_at = position
+            self.play(video, start_at + self.CUT_MARGIN)
+
+    def _on_air(self, item):
+        item.started_at = time.monotonic()
+        if self.watchdog:
+            self.watchdog.watch(item.monitor)
+
+    def metrics(self):
+        """Latest progress metrics of the sink and the on-air feeder"""
+        with self._cond:
+            item = self.current
+        return {
+            'sink': self.relay_monitor.snapshot() if self.relay_monitor else None,
+            'feed': item.monitor.snapshot() if item and item.monitor else None,
+        }
+
+    # Pump
+
+    def _pump(self, relay):
+        while True:
+            with self._cond:
+                while self.running and self.relay is relay and not self.current:
+                    self._cond.wait()
+                if not self.running or self.relay is not relay:
+                    return
+                item = self.current
+
+            if not self._copy(item, relay):
+                return
+
+            item.returncode = item.process.wait()
+            with self._cond:
+                if item is not self.current:
+                    continue  # cut away by play(), nothing to hand over
+
+                # Natural end: hand over to the pre-spawned encoder with no gap
+                self.last_finished = item
+                self.current = self.prepared
+                self.prepared = None
+                if self.current:
+                    self._on_air(self.current)
+
+            if item.returncode != 0:
+                self.logger.warning(f"⚠️ Encoder for {item.video['display_name']} exited with code {item.returncode}: "
+                                    f"{' | '.join(item.monitor.tail(3))}")
+            if self.notifier:
+                self.notifier.notify(ITEM_ENDED)
+
+    def _copy(self, item, relay):
+        """Copy one item's MPEG-TS into the relay; False if the relay went away"""
+        stream = item.process.stdout
+        while True:
+            chunk = stream.read1(64 * 1024)
+            if not chunk or item is not self.current:
+                return True
+            try:
+                view = memoryview(chunk)
+                while view:
+                    written = relay.stdin.write(view)
+                    view = view[written:]
+            except (BrokenPipeError, OSError, ValueError):
+                if relay is self.relay and self.running:
+                    self.logger.error(f"❌ Publisher RTMP session lost: {' | '.join(self.relay_monitor.tail(3))}")
+                    self.running = False
+                    if self.notifier:
+                        self.notifier.notify(ITEM_ENDED)
+                return False
+
+    @staticmethod
+    def _kill(process, timeout=5):
+        if not process or process.poll() is not None:
+            return
+        try:
+            os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        except (ProcessLookupError, OSError):
+            pass
+
+
+class ChannelEncoder(GaplessPublisher):
+    """Single long-lived encoder that holds the RTMP publish for the whole day
+
+    Feeders only remux each video into the pipe (or make a quick H.264/AAC
+    mezzanine when the source can't be carried as-is), so the expensive
+    encode, the scaling and the RTMP handshake all happen exactly once.
+    """
+
+    # What the pipe carries; the sink decodes it and normalises size and rate
+    PIPE_VIDEO_CODECS = {'h264'}
+    PIPE_AUDIO_CODECS = {'aac'}
+
+    def sink_command(self):
+        """Encoder that owns the RTMP session and normalises every feed to the channel profile"""
+        return [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+            '-re',
+            '-f', 'mpegts', '-i', 'pipe:0',
+            '-map', '0:v:0', '-map', '0:a:0',
+            '-vf', video_filter(self.live_profile()),
+            *video_args(self.live_profile()),
+            '-af', 'aresample=async=1',
+            *audio_args(self.profile),
+            '-f', 'flv', '-flvflags', 'no_duration_filesize',
+            self.rtmp_url
+        ]
+
+    def feed_mode(self, video):
+        """'remux' when the source codecs can go through the pipe untouched, else 'mezzanine'"""
+        video_ok = (video.get('codec') or '').lower() in self.PIPE_VIDEO_CODECS
+        audio_codec = (video.get('audio_codec') or '').lower()
+        audio_ok = not audio_codec or audio_codec in self.PIPE_AUDIO_CODECS
+        return 'remux' if video_ok and audio_ok else 'mezzanine'
+
+    def item_mode(self, item):
+        return 'cached' if item.rendition else self.feed_mode(item.video)
+
+    def adaptive_feed(self, item):
+        return False  # feeders only remux; the load is in the sink
+
+    def adaptive_sink(self):
+        return True
+
+    def live_profile(self):
+        """Channel profile with the whole ladder rung applied: a new rung reopens the session, frame size included"""
+        return dict(self.profile, **self.overrides)
+
+    def set_encoding(self, level, overrides):
+        """The encoder is the sink here, so a new rung means reopening the session where it left off"""
+        self.level = level
+        self.overrides = dict(overrides)
+        position = self.position()
+        if position:
+            video, start_at = position
+            self.start()
+            self.play(video, start_at)
+
+    def source_command(self, item):
+        """Feeder: remux (or quick mezzanine) one video into MPEG-TS with a continuous timeline"""
+        video = item.video
+        if item.rendition:
+            return self.rendition_command(item)
+
+        command = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+            *self.input_args(item, video['file_path']),
+        ]
+
+        # Keep an audio track on every item so the encoder's audio never stalls
+        has_audio = 'audio_codec' not in video or bool(video.get('audio_codec'))
+        if has_audio:
+            command += ['-map', '0:v:0', '-map', '0:a:0']
+        else:
+            command += [
+                '-f', 'lavfi', '-i', f"anullsrc=r={self.profile['audio_rate']}:cl=stereo",
+                '-map', '0:v:0', '-map', '1:a:0', '-shortest'
+            ]
+
+        if item.mode == 'remux':
+            command += ['-c:v', 'copy']
+        else:
+            command += ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '18', '-pix_fmt', 'yuv420p']
+
+        if has_audio and (video.get('audio_codec') or '').lower() in self.PIPE_AUDIO_CODECS:
+            command += ['-c:a', 'copy']
+        else:
+            command += ['-c:a', 'aac', '-b:a', '256k']
+
+        return command + self.pipe_output_args(item)
@@ -0,0 +1,278 @@
+"""
+Rendition Cache for The Houston Collective Streaming Server
+Encode each library video once to the channel profile so publishers can stream it with -c copy
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+
+from .compat import FULL, encode_mode, ensure_columns
+from .db import get_database
+from .encoding import load_profile, profile_key, video_args, video_filter, audio_args
+
+CONFIG_FILE = '/opt/streamserver/config/rendition_cache.json'
+
+DEFAULT_CONFIG = {
+    'enabled': True,
+    'cache_dir': '/opt/streamserver/renditions',
+    'max_size_gb': 200,
+    'threads': 2,          # keep the live encoder's cores free
+    'encode_timeout': 4 * 3600,
+}
+
+# Per-video status values
+QUEUED = 'queued'      # evicted, then asked for again by a publisher
+ENCODING = 'encoding'
+READY = 'ready'
+FAILED = 'failed'
+EVICTED = 'evicted'
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS renditions (
+        video_id INTEGER PRIMARY KEY,
+        profile_key TEXT NOT NULL,
+        source_fingerprint TEXT NOT NULL,
+        rendition_path TEXT,
+        file_size INTEGER DEFAULT 0,
+        status TEXT NOT NULL,
+        error TEXT,
+        date_created DATETIME DEFAULT CURRENT_TIMESTAMP,
+        last_used DATETIME,
+        FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE
+    );
+    CREATE INDEX IF NOT EXISTS idx_renditions_lru ON renditions(status, last_used);
+"""
+
+
+def load_cache_config(path=CONFIG_FILE):
+    """Default cache settings updated with config/rendition_cache.json if present"""
+    config = dict(DEFAULT_CONFIG)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+
+def source_fingerprint(file_path):
+    """Cheap identity of a source file: size and modification time"""
+    stat = os.stat(file_path)
+    return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+
+class RenditionCache:
+    """Broadcast-ready renditions on disk, tracked per video in the renditions table"""
+
+    def __init__(self, db_path, config=None, profile=None, logger=None):
+        self.db_path = str(db_path)
+        self.config = config or load_cache_config()
+        self.profile = profile or load_profile()
+        self.key = profile_key(self.profile)
+        self.cache_dir = self.config['cache_dir']
+        self.max_bytes = int(float(self.config['max_size_gb']) * 1024 ** 3)
+        self.logger = logger or logging.getLogger(__name__)
+        self.db = get_database(db_path)
+        self._schema_ready = False
+
+    def get_db_connection(self):
+        """This thread's shared connection, with the renditions table created on first use"""
+        conn = self.db.connection()
+        if not self._schema_ready:
+            conn.executescript(SCHEMA)
+            ensure_columns(conn)
+            self._schema_ready = True
+        return conn
+
+    def rendition_path(self, video_id):
+        return os.path.join(self.cache_dir, f'{video_id}-{self.key}.ts')
+
+    # Publisher side
+
+    def lookup(self, video):
+        """Path of a valid rendition for a video (and mark it used), or None on a miss"""
+        try:
+            fingerprint = source_fingerprint(video['file_path'])
+            conn = self.get_db_connection()
+        except (OSError, sqlite3.Error):
+            return None
+
+        try:
+            row = conn.execute(
+                "SELECT * FROM renditions WHERE video_id = ?", (video['id'],)
+            ).fetchone()
+            if not row:
+                return None
+            if row['profile_key'] != self.key or row['source_fingerprint'] != fingerprint:
+                return None  # stale; the worker re-encodes it
+            if row['status'] == EVICTED:
+                # Back in rotation: ask the worker to encode it again
+                conn.execute("UPDATE renditions SET status = ?, last_used = CURRENT_TIMESTAMP WHERE video_id = ?",
+                             (QUEUED, video['id']))
+                conn.commit()
+                return None
+            if row['status'] != READY:
+                return None
+            if not row['rendition_path'] or not os.path.exists(row['rendition_path']):
+                conn.execute("UPDATE renditions SET status = ? WHERE video_id = ?", (EVICTED, video['id']))
+                conn.commit()
+                return None
+
+            conn.execute(
+                "UPDATE renditions SET last_used = CURRENT_TIMESTAMP WHERE video_id = ?", (video['id'],)
+            )
+            conn.commit()
+            return row['rendition_path']
+        except sqlite3.Error as e:
+            self.logger.warning(f"Rendition lookup failed for video {video['id']}: {e}")
+            return None
+
+    # Worker side
+
+    def pending_videos(self):
+        """Active videos that need transcoding and have no current rendition: re-requested first, then scheduled"""
+        rows = self.get_db_connection().execute("""
+            SELECT v.id, v.file_path, v.display_name, v.file_size, v.audio_codec,
+                   v.encode_mode, v.encode_profile,
+                   r.status, r.profile_key, r.source_fingerprint,
+                   EXISTS(SELECT 1 FROM video_playlists vp WHERE vp.video_id = v.id) as in_playlist
+            FROM videos v
+            LEFT JOIN renditions r ON r.video_id = v.id
+            WHERE v.is_active = 1
+            ORDER BY r.status = 'queued' DESC, in_playlist DESC, v.id
+        """).fetchall()
+
+        pending = []
+        for row in rows:
+            if encode_mode(dict(row), self.profile) != FULL:
+                continue  # publishers already stream-copy the video track
+            try:
+                fingerprint = source_fingerprint(row['file_path'])
+            except OSError:
+                continue
+            current = row['profile_key'] == self.key and row['source_fingerprint'] == fingerprint
+            # Failed sources aren't retried until they change; evicted ones wait until played again
+            if current and row['status'] in (READY, FAILED, EVICTED):
+                continue
+            pending.append(dict(row, fingerprint=fingerprint))
+        return pending
+
+    def encode_command(self, video, output_path):
+        """Offline encode to the channel profile; silent sources get a silent track so every rendition splices"""
+        command = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin', '-y',
+            '-i', video['file_path'],
+        ]
+        if 'audio_codec' not in video or video['audio_codec']:
+            command += ['-map', '0:v:0', '-map', '0:a:0']
+        else:
+            command += [
+                '-f', 'lavfi', '-i', f"anullsrc=r={self.profile['audio_rate']}:cl=stereo",
+                '-map', '0:v:0', '-map', '1:a:0', '-shortest'
+            ]
+        return command + [
+            '-vf', video_filter(self.profile),
+            *video_args(self.profile, preset=self.profile.get('rendition_preset'), tune=False),
+            '-threads', str(self.config['threads']),
+            *audio_args(self.profile),
+            '-f', 'mpegts', output_path
+        ]
+
+    def build(self, video):
+        """Encode one rendition; returns True when it is ready"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        output_path = self.rendition_path(video['id'])
+        tmp_path = f'{output_path}.part'
+        fingerprint = video.get('fingerprint') or source_fingerprint(video['file_path'])
+
+        self._set_status(video['id'], ENCODING, fingerprint)
+        self.logger.info(f"Encoding rendition for {video['display_name']}")
+
+        try:
+            result = subprocess.run(
+                self.encode_command(video, tmp_path),
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                timeout=self.config['encode_timeout']
+            )
+            error = None
+            if result.returncode != 0:
+                error = result.stderr.decode(errors='replace')[-500:] or f'exit code {result.returncode}'
+        except (subprocess.TimeoutExpired, OSError) as e:
+            error = str(e)
+
+        if error:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._set_status(video['id'], FAILED, fingerprint, error=error)
+            self.logger.error(f"Rendition failed for {video['display_name']}: {error}")
+            return False
+
+        os.replace(tmp_path, output_path)
+        self._set_status(video['id'], READY, fingerprint, output_path, os.path.getsize(output_path))
+        self.logger.info(f"Rendition ready for {video['display_name']}")
+        return True
+
+    def _set_status(self, video_id, status, fingerprint, path=None, size=0, error=None):
+        self.get_db_connection()  # creates the table on first use
+        self.db.execute("""
+            INSERT INTO renditions (video_id, profile_key, source_fingerprint, rendition_path,
+                                    file_size, status, error, date_created, last_used)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            ON CONFLICT(video_id) DO UPDATE SET
+                profile_key = excluded.profile_key,
+                source_fingerprint = excluded.source_fingerprint,
+                rendition_path = excluded.rendition_path,
+                file_size = excluded.file_size,
+                status = excluded.status,
+                error = excluded.error,
+                date_created = excluded.date_created
+        """, (video_id, self.key, fingerprint, path, size, status, error))
+
+    def evict(self, keep_bytes=0):
+        """Drop least recently used renditions until the cache fits under its cap"""
+        limit = max(self.max_bytes - keep_bytes, 0)
+        self.get_db_connection()  # creates the table on first use
+        with self.db.transaction() as conn:
+            rows = conn.execute("""
+                SELECT video_id, rendition_path, file_size FROM renditions
+                WHERE status = ? ORDER BY last_used ASC, date_created ASC
+            """, (READY,)).fetchall()
+            total = sum(row['file_size'] or 0 for row in rows)
+
+            evicted = 0
+            for row in rows:
+                if total <= limit:
+                    break
+                if row['rendition_path'] and os.path.exists(row['rendition_path']):
+                    os.remove(row['rendition_path'])
+                conn.execute("UPDATE renditions SET status = ?, file_size = 0 WHERE video_id = ?",
+                             (EVICTED, row['video_id']))
+                total -= row['file_size'] or 0
+                evicted += 1
+
+        if evicted:
+            self.logger.info(f"Evicted {evicted} renditions, cache now {total / 1024 ** 3:.1f} GB")
+        return evicted
+
+    def remove_orphans(self):
+        """Delete cached files (and interrupted encodes) not backing a ready rendition"""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        keep = {row['rendition_path'] for row in self.get_db_connection().execute(
+            "SELECT rendition_path FROM renditions WHERE status = ?", (READY,))}
+
+        removed = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.path not in keep:
+                os.remove(entry.path)
+                removed += 1
+        return removed
+
+    def status_summary(self):
+        """Rendition counts and bytes per status"""
+        rows = self.get_db_connection().execute("""
+            SELECT status, COUNT(*) as count, COALESCE(SUM(file_size), 0) as bytes
+            FROM renditions GROUP BY status
+        """).fetchall()
+        return {row['status']: {'count': row['count'], 'bytes': row['bytes']} for row in rows}
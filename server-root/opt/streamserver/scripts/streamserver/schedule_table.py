@@ -0,0 +1,187 @@
+"""
+Weekly Schedule Table for The Houston Collective Streaming Server
+Flattens active schedule rows into a minute-resolution week with the resolved winner per slot
+"""
+
+import bisect
+import json
+import os
+from array import array
+from datetime import datetime, timedelta
+
+DAY_MINUTES = 1440
+WEEK_MINUTES = 7 * DAY_MINUTES  # 10080 slots, slot 0 = Sunday 00:00
+
+# Named priorities used by older rows; the web UI stores 1 / 5 / 10
+PRIORITY_NAMES = {'high': 10, 'medium': 5, 'low': 1}
+
+# Row fields exported for the dashboard / now-next endpoint
+EXPORT_FIELDS = ('id', 'playlist_id', 'playlist_name', 'priority', 'day_of_week',
+                 'start_time', 'end_time', 'repeat_type')
+
+
+def priority_rank(priority):
+    """Numeric rank for a playlist priority (named or numeric)"""
+    if priority is None:
+        return 0
+    if isinstance(priority, str):
+        name = priority.strip().lower()
+        if name in PRIORITY_NAMES:
+            return PRIORITY_NAMES[name]
+        try:
+            return int(float(name))
+        except ValueError:
+            return 0
+    return int(priority)
+
+
+def schedule_day(dt):
+    """Day number in the schedule table format (0=Sunday ... 6=Saturday)"""
+    return (dt.weekday() + 1) % 7
+
+
+def parse_minutes(value):
+    """Minutes since midnight for an 'HH:MM' or 'HH:MM:SS' string"""
+    parts = str(value).split(':')
+    return int(parts[0]) * 60 + int(parts[1])
+
+
+def span_minutes(start_minute, end_minute):
+    """Length of a schedule window; end before start runs past midnight, equal means all day"""
+    length = (end_minute - start_minute) % DAY_MINUTES
+    return length or DAY_MINUTES
+
+
+def local_timezone():
+    """IANA name of the zone datetime.now() runs in (TZ, /etc/localtime, /etc/timezone), or None"""
+    name = os.environ.get('TZ', '').lstrip(':')
+    if name and '/' in name and not name.startswith('/'):
+        return name
+    try:
+        target = os.path.realpath('/etc/localtime')
+        if '/zoneinfo/' in target:
+            return target.split('/zoneinfo/', 1)[1]
+    except OSError:
+        pass
+    try:
+        with open('/etc/timezone', 'r') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def slot_of(dt):
+    """Week slot index for a datetime"""
+    return schedule_day(dt) * DAY_MINUTES + dt.hour * 60 + dt.minute
+
+
+class WeekTable:
+    """10080-slot lookup table of conflict-resolved schedule winners"""
+
+    def __init__(self, rows=()):
+        self.winners = [None]  # index 0 = no schedule (fallback)
+        self.slots = array('H', [0]) * WEEK_MINUTES
+        self.changes = []
+        if rows:
+            self.compile(rows)
+
+    @staticmethod
+    def windows(row):
+        """Yield (start_slot, length) for each weekly occurrence of a schedule row"""
+        try:
+            start_minute = parse_minutes(row['start_time'])
+            length = span_minutes(start_minute, parse_minutes(row['end_time']))
+        except (TypeError, ValueError, IndexError):
+            return
+
+        if row.get('repeat_type') == 'daily':
+            days = range(7)
+        else:
+            try:
+                days = [int(row['day_of_week']) % 7]
+            except (TypeError, ValueError):
+                return
+
+        for day in days:
+            yield day * DAY_MINUTES + start_minute, length
+
+    def compile(self, rows):
+        """Resolve every minute of the week: highest priority, then the most recently started"""
+        keys = [None] * WEEK_MINUTES
+        owners = [0] * WEEK_MINUTES
+        winners = [None]
+
+        for row in rows:
+            rank = priority_rank(row.get('priority'))
+            index = len(winners)
+            winners.append(row)
+
+            for start_slot, length in self.windows(row):
+                for elapsed in range(length):
+                    slot = (start_slot + elapsed) % WEEK_MINUTES
+                    key = (rank, -elapsed, -row['id'])
+                    if keys[slot] is None or key > keys[slot]:
+                        keys[slot] = key
+                        owners[slot] = index
+
+        self.winners = winners
+        self.slots = array('H', owners)
+        self.changes = [slot for slot in range(WEEK_MINUTES) if owners[slot] != owners[slot - 1]]
+        return self
+
+    def lookup(self, dt=None):
+        """Winning schedule row at dt, or None for fallback"""
+        return self.winners[self.slots[slot_of(dt or datetime.now())]]
+
+    def next_change(self, dt=None):
+        """(at, schedule_row_or_None) of the next slot whose winner differs, or None"""
+        if not self.changes:
+            return None
+
+        dt = dt or datetime.now()
+        current = slot_of(dt)
+        index = bisect.bisect_right(self.changes, current)
+        if index < len(self.changes):
+            change = self.changes[index]
+        else:
+            change = self.changes[0] + WEEK_MINUTES
+
+        at = dt.replace(second=0, microsecond=0) + timedelta(minutes=change - current)
+        return at, self.winners[self.slots[change % WEEK_MINUTES]]
+
+    def upcoming(self, dt=None, count=5):
+        """List of the next count (at, schedule_row_or_None) transitions"""
+        result = []
+        at = dt or datetime.now()
+        for _ in range(min(count, len(self.changes))):
+            change = self.next_change(at)
+            result.append(change)
+            at = change[0]
+        return result
+
+    def export(self):
+        """JSON-friendly form: winners list, the raw 10080-slot index array and the sorted transition slots
+
+        Slots are in the scheduler's local time; timezone (or, failing that,
+        the UTC offset at compile time) lets readers compute the same slot.
+        """
+        winners = [None]
+        for row in self.winners[1:]:
+            winners.append({field: row.get(field) for field in EXPORT_FIELDS})
+        now = datetime.now().astimezone()
+        return {
+            'compiled_at': now.replace(tzinfo=None).isoformat(),
+            'timezone': local_timezone(),
+            'utc_offset': int(now.utcoffset().total_seconds()),
+            'slot_minutes': 1,
+            'winners': winners,
+            'slots': self.slots.tolist(),
+            'changes': self.changes,
+        }
+
+    def save(self, path):
+        """Atomically write the exported table for the web dashboard"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.export(), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
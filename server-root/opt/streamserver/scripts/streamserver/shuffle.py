@@ -0,0 +1,298 @@
+"""
+Playlist Shuffle for The Houston Collective Streaming Server
+Seeded play orders computed one pick at a time, with per-playlist progress and a cross-playlist no-repeat window
+"""
+
+import logging
+import random
+import sys
+import time
+from array import array
+from bisect import bisect_left
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS playlist_order (
+        playlist_id INTEGER PRIMARY KEY,
+        seed INTEGER NOT NULL,
+        cursor INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        pass_number INTEGER DEFAULT 1,
+        pass_ids BLOB,
+        date_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (playlist_id) REFERENCES playlists(id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS video_airings (
+        video_id INTEGER PRIMARY KEY,
+        last_aired REAL NOT NULL,
+        FOREIGN KEY (video_id) REFERENCES videos(id) ON DELETE CASCADE
+    );
+"""
+
+ORDER_SAVE = """
+    INSERT OR REPLACE INTO playlist_order (playlist_id, seed, cursor, size, pass_number, pass_ids, date_updated)
+    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+"""
+
+# Within a pass only the cursor moves; the pass's ids are written once when it starts
+CURSOR_SAVE = "UPDATE playlist_order SET cursor = ?, date_updated = CURRENT_TIMESTAMP WHERE playlist_id = ?"
+
+AIRING_SAVE = "INSERT OR REPLACE INTO video_airings (video_id, last_aired) VALUES (?, ?)"
+
+ROUNDS = 4
+WINDOW_SHARE = 0.5  # the no-repeat window never exceeds this share of a playlist's running time
+
+
+def ensure_schema(conn):
+    conn.executescript(SCHEMA)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(playlist_order)")}
+    if 'pass_ids' not in existing:
+        conn.execute("ALTER TABLE playlist_order ADD COLUMN pass_ids BLOB")
+        conn.commit()
+
+
+def pack_ids(video_ids):
+    """Little-endian int64s, as stored in playlist_order.pass_ids"""
+    packed = array('q', video_ids)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_ids(blob):
+    video_ids = array('q')
+    video_ids.frombytes(blob or b'')
+    if sys.byteorder != 'little':
+        video_ids.byteswap()
+    return video_ids
+
+
+def new_seed():
+    return random.getrandbits(62)
+
+
+def _mix(value, key):
+    """32-bit integer hash of value under a round key"""
+    value = ((value ^ key) * 0x45D9F3B) & 0xFFFFFFFF
+    value ^= value >> 16
+    value = (value * 0x45D9F3B) & 0xFFFFFFFF
+    return value ^ (value >> 16)
+
+
+class Permutation:
+    """A seeded bijection on range(size), computed one position at a time
+
+    A balanced Feistel network shuffles the smallest even-width bit domain
+    covering size; positions it maps past the end are fed through again
+    (cycle walking) until they land inside. Only the round keys are kept,
+    so a 100,000-row order costs no more memory than a 10-row one.
+    """
+
+    def __init__(self, size, seed):
+        self.size = size
+        self.half_bits = max((max(size - 1, 1).bit_length() + 1) // 2, 1)
+        self.mask = (1 << self.half_bits) - 1
+        rng = random.Random(seed)
+        self.keys = [rng.getrandbits(32) for _ in range(ROUNDS)]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        value = index
+        while True:
+            left, right = value >> self.half_bits, value & self.mask
+            for key in self.keys:
+                left, right = right, left ^ (_mix(right, key) & self.mask)
+            value = (left << self.half_bits) | right
+            if value < self.size:
+                return value
+
+
+class PlayOrder:
+    """A playlist's video ids in sort order and how far the channel is through the current pass
+
+    Shuffled orders air row permutation[cursor] of the pass, sequential ones
+    row cursor. Each pass gets a fresh seed, so no row repeats within a pass
+    and consecutive passes differ. A pass covers the playlist as it was when
+    the pass began (pass_ids): if the playlist is edited part way through,
+    the pass is finished over the old rows, skipping videos that have left,
+    and videos added join the next pass. Id lists are compact array('q')s.
+    """
+
+    def __init__(self, playlist_id, video_ids, shuffle=True, runtime=0, seed=None, cursor=0, pass_number=1):
+        self.playlist_id = playlist_id
+        self.video_ids = video_ids
+        self.pass_ids = video_ids
+        self.shuffle = shuffle
+        self.runtime = runtime  # seconds, for capping the no-repeat window
+        self.seed = seed if seed is not None else new_seed()
+        self.cursor = cursor
+        self.pass_number = pass_number
+        self.pass_changed = True  # pass_ids not yet written to the database
+        self._permutation = None
+        self._current = None      # sorted current ids, while finishing a pass over an older list
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def exhausted(self):
+        return self.cursor >= len(self.pass_ids)
+
+    def new_pass(self):
+        self.pass_ids = self.video_ids
+        self.seed = new_seed()
+        self.cursor = 0
+        self.pass_number += 1
+        self.pass_changed = True
+        self._permutation = None
+        self._current = None
+
+    def in_playlist(self, video_id):
+        if self.pass_ids is self.video_ids:
+            return True
+        if self._current is None:
+            self._current = array('q', sorted(self.video_ids))
+        i = bisect_left(self._current, video_id)
+        return i < len(self._current) and self._current[i] == video_id
+
+    def take(self):
+        """The video id at the cursor, advancing it past videos that have left the playlist; None at the end of the pass"""
+        while not self.exhausted():
+            row = self.cursor
+            if self.shuffle:
+                if self._permutation is None:
+                    self._permutation = Permutation(len(self.pass_ids), self.seed)
+                row = self._permutation[row]
+            self.cursor += 1
+            video_id = self.pass_ids[row]
+            if self.in_playlist(video_id):
+                return video_id
+        return None
+
+    def state(self):
+        return {'playlist_id': self.playlist_id, 'seed': self.seed, 'cursor': self.cursor,
+                'size': len(self.pass_ids), 'pass_number': self.pass_number}
+
+    def restore(self, state):
+        """Go back to a saved state of this pass; False if it belongs to a pass of a different length"""
+        if state.get('playlist_id') != self.playlist_id or state.get('size') != len(self.pass_ids):
+            return False
+        if state['seed'] != self.seed:
+            self._permutation = None
+            self.pass_changed = True
+        self.seed = state['seed']
+        self.cursor = state['cursor']
+        self.pass_number = state.get('pass_number', 1)
+        return True
+
+
+class PlayOrderStore:
+    """playlist_order rows, so each playlist's pass survives restarts and schedule switches, and video airings
+
+    Airings older than the no-repeat window are forgotten, so the in-memory
+    view holds at most a window's worth of videos.
+    """
+
+    def __init__(self, db, no_repeat_hours=0, logger=None):
+        self.db = db
+        self.window = no_repeat_hours * 3600
+        self.logger = logger or logging.getLogger(__name__)
+        self.airings = {}  # video id -> epoch seconds it last went on air, within the window
+        self._schema_checked = False
+
+    def _conn(self):
+        conn = self.db.connection()
+        if not self._schema_checked:
+            ensure_schema(conn)
+            self._schema_checked = True
+        return conn
+
+    def load(self, playlist_id, video_ids, shuffle=True, runtime=0):
+        """PlayOrder for a playlist, continuing its saved pass even if the playlist was edited since"""
+        order = PlayOrder(playlist_id, video_ids, shuffle, runtime)
+        try:
+            row = self._conn().execute(
+                "SELECT seed, cursor, size, pass_number, pass_ids FROM playlist_order WHERE playlist_id = ?",
+                (playlist_id,)
+            ).fetchone()
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not read play order of playlist {playlist_id}: {e}")
+            return order
+        if row is None:
+            self.save(order)
+            return order
+
+        pass_ids = unpack_ids(row['pass_ids']) if row['pass_ids'] else None
+        if pass_ids is None and row['size'] == len(video_ids):
+            pass_ids = video_ids  # saved before pass_ids was recorded
+        if pass_ids is None or len(pass_ids) != row['size']:
+            order.pass_number = (row['pass_number'] or 0) + 1
+            self.logger.info(f"🎲 Playlist {playlist_id} changed and its pass was not recorded - starting a new pass")
+            self.save(order)
+            return order
+
+        if pass_ids == video_ids:
+            pass_ids = video_ids
+        elif row['cursor'] < len(pass_ids):
+            self.logger.info(f"🎲 Playlist {playlist_id} changed ({len(pass_ids)} -> {len(video_ids)} videos) - "
+                             f"finishing pass {row['pass_number']}, new videos join the next one")
+        order.pass_ids = pass_ids
+        order.seed, order.cursor, order.pass_number = row['seed'], row['cursor'], row['pass_number'] or 1
+        order.pass_changed = False
+        return order
+
+    def save(self, order):
+        """Persist an order's position; the pass's ids only when a new pass has started"""
+        try:
+            self._conn()
+            if order.pass_changed:
+                self.db.execute(ORDER_SAVE, (order.playlist_id, order.seed, order.cursor, len(order.pass_ids),
+                                             order.pass_number, pack_ids(order.pass_ids)))
+                order.pass_changed = False
+            else:
+                self.db.execute(CURSOR_SAVE, (order.cursor, order.playlist_id))
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not save play order of playlist {order.playlist_id}: {e}")
+
+    def load_airings(self):
+        """Airings inside the window, from the database (start-up)"""
+        if not self.window:
+            return
+        try:
+            rows = self._conn().execute(
+                "SELECT video_id, last_aired FROM video_airings WHERE last_aired > ?", (time.time() - self.window,)
+            ).fetchall()
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not read video airings: {e}")
+            return
+        self.airings = {row['video_id']: row['last_aired'] for row in rows}
+
+    def aired(self, video_id, now=None):
+        """Stamp a video going on air"""
+        now = now or time.time()
+        self.airings[video_id] = now
+        if len(self.airings) % 256 == 0:
+            self.airings = {v: t for v, t in self.airings.items() if now - t < self.window}
+        try:
+            self._conn()
+            self.db.execute(AIRING_SAVE, (video_id, now))
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not record airing of video {video_id}: {e}")
+
+    def window_for(self, order):
+        """No-repeat seconds for picks from an order: the configured window, capped by the playlist's length"""
+        if not order.shuffle or not self.window:
+            return 0
+        if order.runtime:
+            return min(self.window, order.runtime * WINDOW_SHARE)
+        return self.window
+
+    def last_aired(self, video_id):
+        return self.airings.get(video_id, 0.0)
+
+    def held_back(self, video_id, window, now=None):
+        """True if the video went on air less than window seconds ago"""
+        return bool(window) and (now or time.time()) - self.last_aired(video_id) < window
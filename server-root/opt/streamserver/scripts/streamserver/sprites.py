@@ -0,0 +1,122 @@
+"""
+Preview Sprites for The Houston Collective Streaming Server
+Hover-scrub sprite sheets and their WebVTT thumbnail maps, from one keyframe-only decode per video
+"""
+
+import math
+import os
+import re
+import subprocess
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow ships with the server image; without it sprites are skipped
+    Image = None
+
+DEFAULT_SPRITE = {
+    'frames': 60,      # tiles per sheet (fewer when keyframes are sparse)
+    'width': 160,      # tile size in pixels
+    'height': 90,
+    'columns': 10,
+    'quality': 70,     # JPEG quality of the sheet
+}
+
+COLUMNS = (('sprite_path', 'TEXT'),)
+
+PTS_TIME = re.compile(r'pts_time:\s*(-?[0-9.]+)')
+
+
+def available():
+    return Image is not None
+
+
+def ensure_columns(conn):
+    """Add sprite_path to videos on databases created before it existed"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(videos)")}
+    for name, kind in COLUMNS:
+        if existing and name not in existing:
+            conn.execute(f"ALTER TABLE videos ADD COLUMN {name} {kind}")
+    conn.commit()
+
+
+def extract_frames(video_path, duration, settings=DEFAULT_SPRITE, timeout=300):
+    """[(seconds, RGB bytes)] for up to settings['frames'] evenly spread keyframes, in one FFmpeg run
+
+    Only keyframes are decoded (-skip_frame nokey), so the cost is one
+    demux of the file rather than one seek and decode per tile.
+    """
+    width, height = settings['width'], settings['height']
+    step = max(duration / settings['frames'], 0.001)
+    video_filter = (
+        f"select='isnan(prev_selected_t)+gte(t-prev_selected_t\\,{step:.3f})',showinfo,"
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2"
+    )
+    cmd = [
+        'ffmpeg', '-v', 'info', '-nostats', '-skip_frame', 'nokey', '-i', str(video_path),
+        '-an', '-sn', '-vf', video_filter, '-vsync', 'vfr', '-frames:v', str(settings['frames']),
+        '-pix_fmt', 'rgb24', '-f', 'rawvideo', 'pipe:1'
+    ]
+    result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors='replace')[-500:])
+
+    frame_bytes = width * height * 3
+    frames = [result.stdout[i:i + frame_bytes] for i in range(0, len(result.stdout) - frame_bytes + 1, frame_bytes)]
+    times = [
+        float(match.group(1)) for line in result.stderr.decode(errors='replace').splitlines()
+        if 'showinfo' in line and (match := PTS_TIME.search(line))
+    ]
+    if len(times) != len(frames):
+        times = [i * step for i in range(len(frames))]
+    return list(zip(times, frames))
+
+
+def vtt_timestamp(seconds):
+    milliseconds = int(round(max(seconds, 0) * 1000))
+    hours, rest = divmod(milliseconds, 3600000)
+    minutes, rest = divmod(rest, 60000)
+    return f"{hours:02d}:{minutes:02d}:{rest // 1000:02d}.{rest % 1000:03d}"
+
+
+def sprite_vtt(times, duration, image_url, settings=DEFAULT_SPRITE):
+    """WebVTT thumbnail map: each tile covers from its frame until the next one"""
+    width, height, columns = settings['width'], settings['height'], settings['columns']
+    lines = ['WEBVTT', '']
+    for i, start in enumerate(times):
+        start = 0 if i == 0 else start
+        end = times[i + 1] if i + 1 < len(times) else max(duration, start + 0.001)
+        x, y = (i % columns) * width, (i // columns) * height
+        lines += [f"{vtt_timestamp(start)} --> {vtt_timestamp(end)}", f"{image_url}#xywh={x},{y},{width},{height}", '']
+    return '\n'.join(lines)
+
+
+def _replace(path, write):
+    """Write through a temporary file so the web server never serves half a sheet"""
+    temp_path = f"{path}.tmp"
+    write(temp_path)
+    os.replace(temp_path, path)
+
+
+def build_sprite(video_path, duration, image_path, vtt_path, image_url, settings=DEFAULT_SPRITE):
+    """Write the sprite sheet and its WebVTT map; returns the number of tiles (0 if no frames came out)"""
+    if Image is None:
+        raise RuntimeError("Pillow is not installed")
+    shots = extract_frames(video_path, duration, settings)
+    if not shots:
+        return 0
+
+    width, height, columns = settings['width'], settings['height'], settings['columns']
+    sheet = Image.new('RGB', (min(len(shots), columns) * width, math.ceil(len(shots) / columns) * height))
+    for i, (_, rgb) in enumerate(shots):
+        sheet.paste(Image.frombytes('RGB', (width, height), rgb), ((i % columns) * width, (i // columns) * height))
+
+    _replace(image_path, lambda path: sheet.save(path, 'JPEG', quality=settings['quality'], optimize=True))
+    vtt = sprite_vtt([time for time, _ in shots], duration, image_url, settings)
+
+    def write_vtt(path):
+        with open(path, 'w') as f:
+            f.write(vtt)
+
+    _replace(vtt_path, write_vtt)
+    return len(shots)
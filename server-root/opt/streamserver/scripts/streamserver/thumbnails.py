@@ -0,0 +1,243 @@
+"""
+Thumbnail Store for The Houston Collective Streaming Server
+Content-addressed thumbnails with resized WebP/JPEG variants rendered on demand and cached on disk
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow ships with the server image; without it only the originals are served
+    Image = ImageOps = None
+
+CONFIG_FILE = '/opt/streamserver/config/thumbnail_cache.json'
+
+DEFAULT_CONFIG = {
+    'store_dir': '/opt/streamserver/web/assets/thumbnails',
+    'url_prefix': '/assets/thumbnails',
+    'listen': '127.0.0.1',   # render server nginx falls back to for variants not on disk yet
+    'port': 8790,
+    'sizes': [[140, 100], [160, 120], [320, 240]],   # the only variants that will be rendered
+    'quality': {'webp': 75, 'jpg': 80},
+    'variant_max_mb': 256,   # oldest-rendered variants beyond this are deleted (nginx hits don't count as use)
+}
+
+FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpg': ('JPEG', 'image/jpeg')}
+
+DIGEST_NAME = re.compile(r'^[0-9a-f]{16}$')
+LEGACY_NAME = re.compile(r'^video_\d+\.jpg$')
+VARIANT_NAME = re.compile(r'^([0-9a-f]{16})-(\d+)x(\d+)\.(webp|jpg)$')
+
+ORPHAN_AGE = 3600  # a just-stored original may not be in videos yet
+
+
+def load_thumbnail_config(path=CONFIG_FILE):
+    """Default store settings updated with config/thumbnail_cache.json if present"""
+    config = dict(DEFAULT_CONFIG)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+
+def available():
+    return Image is not None
+
+
+def content_digest(path):
+    """16 hex digits of BLAKE2b over the file; the thumbnail's name and so its URL version"""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ThumbnailStore:
+    """Originals live at <prefix>/<ab>/<digest>.jpg and never change, so every URL can be cached for good"""
+
+    def __init__(self, config=None, logger=None):
+        self.config = config or load_thumbnail_config()
+        self.store_dir = self.config['store_dir']
+        self.url_prefix = self.config['url_prefix'].rstrip('/')
+        self.sizes = {tuple(size) for size in self.config['sizes']}
+        self.max_variant_bytes = int(float(self.config['variant_max_mb']) * 1024 ** 2)
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._variant_bytes = None
+
+    # Paths and URLs
+
+    def master_path(self, digest):
+        return os.path.join(self.store_dir, digest[:2], f'{digest}.jpg')
+
+    def variant_path(self, digest, width, height, fmt):
+        return os.path.join(self.store_dir, digest[:2], f'{digest}-{width}x{height}.{fmt}')
+
+    def incoming_path(self, name):
+        """Where FFmpeg should write a new thumbnail; same filesystem as the store, so put() is a rename"""
+        directory = os.path.join(self.store_dir, '.incoming')
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, name)
+
+    def url(self, path):
+        return f"{self.url_prefix}/{os.path.relpath(path, self.store_dir).replace(os.sep, '/')}"
+
+    def parse_variant_url(self, url):
+        """(digest, width, height, format) for a variant URL, or None"""
+        prefix = f'{self.url_prefix}/'
+        if not url.startswith(prefix):
+            return None
+        shard, _, name = url[len(prefix):].partition('/')
+        match = VARIANT_NAME.match(name)
+        if not match or shard != match.group(1)[:2]:
+            return None
+        return match.group(1), int(match.group(2)), int(match.group(3)), match.group(4)
+
+    # Originals
+
+    def put(self, image_path):
+        """Move a rendered JPEG into the store under its content hash; returns its URL"""
+        digest = content_digest(image_path)
+        target = self.master_path(digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            os.remove(image_path)  # same picture as before: same URL, caches stay valid
+        else:
+            os.chmod(image_path, 0o644)
+            os.replace(image_path, target)
+        return self.url(target)
+
+    # Variants
+
+    def allows(self, width, height, fmt):
+        """Only configured sizes are rendered, so URLs can't be used to fill the disk"""
+        return (width, height) in self.sizes and fmt in FORMATS
+
+    def variant(self, digest, width, height, fmt):
+        """Path of a resized variant, rendering it on first request; None if it can't be made"""
+        if not self.allows(width, height, fmt) or not DIGEST_NAME.match(digest):
+            return None
+        path = self.variant_path(digest, width, height, fmt)
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # handed out again: keep it off the front of the eviction order
+            except OSError:
+                pass
+            return path
+        master = self.master_path(digest)
+        if Image is None or not os.path.exists(master):
+            return None
+
+        with Image.open(master) as image:
+            # Crop to fill, like background-size: cover in the pages that use them
+            resized = ImageOps.fit(image.convert('RGB'), (width, height), Image.LANCZOS)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        resized.save(temp_path, FORMATS[fmt][0], quality=self.config['quality'][fmt])
+        os.replace(temp_path, path)
+
+        with self._lock:
+            if self._variant_bytes is not None:
+                self._variant_bytes += os.path.getsize(path)
+            over = self._variant_bytes is None or self._variant_bytes > self.max_variant_bytes
+        if over:
+            self.evict()
+        return path
+
+    def _variants(self):
+        for shard in os.scandir(self.store_dir):
+            if not shard.is_dir() or len(shard.name) != 2:
+                continue
+            for entry in os.scandir(shard.path):
+                if VARIANT_NAME.match(entry.name):
+                    yield entry
+
+    def evict(self):
+        """Delete the oldest variants by mtime until they fit in 90% of the cap; returns how many
+
+        mtime is when this server last rendered or handed out a variant. nginx
+        serves hits straight from disk without touching it, and atime can't
+        stand in (relatime/noatime), so in practice this is FIFO by render time.
+        """
+        if not os.path.isdir(self.store_dir):
+            return 0
+        with self._lock:
+            variants = []
+            for entry in self._variants():
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                variants.append((st.st_mtime, st.st_size, entry.path))
+            total = sum(size for _, size, _ in variants)
+
+            evicted = 0
+            if total > self.max_variant_bytes:
+                target = self.max_variant_bytes * 0.9
+                for _, size, path in sorted(variants):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    evicted += 1
+            self._variant_bytes = total
+
+        if evicted:
+            self.logger.info(f"Evicted {evicted} thumbnail variants, now {total / 1024 ** 2:.0f} MB")
+        return evicted
+
+    # Housekeeping
+
+    def remove_orphans(self, conn, min_age=ORPHAN_AGE):
+        """Delete originals (with their variants) and legacy files no video points at; returns how many"""
+        if not os.path.isdir(self.store_dir):
+            return 0
+        keep = {row[0] for row in conn.execute("SELECT thumbnail_path FROM videos WHERE thumbnail_path IS NOT NULL")}
+        cutoff = time.time() - min_age
+
+        removed = 0
+        for entry in os.scandir(self.store_dir):
+            if entry.is_dir() and len(entry.name) == 2:
+                candidates = [e for e in os.scandir(entry.path) if e.name.endswith('.jpg') and DIGEST_NAME.match(e.name[:-4])]
+            elif entry.is_dir() and entry.name == '.incoming':
+                candidates = [e for e in os.scandir(entry.path)]
+            elif entry.is_file() and LEGACY_NAME.match(entry.name):
+                candidates = [entry]
+            else:
+                continue
+            for candidate in candidates:
+                if self.url(candidate.path) in keep or candidate.stat().st_mtime > cutoff:
+                    continue
+                digest = candidate.name[:-4]
+                if DIGEST_NAME.match(digest):
+                    for fmt in FORMATS:
+                        for width, height in self.sizes:
+                            variant = self.variant_path(digest, width, height, fmt)
+                            if os.path.exists(variant):
+                                os.remove(variant)
+                os.remove(candidate.path)
+                removed += 1
+        return removed
+
+    def migrate_legacy(self, db):
+        """Move video_<id>.jpg thumbnails into the store and repoint their videos; returns how many"""
+        rows = db.connection().execute(
+            "SELECT id, thumbnail_path FROM videos WHERE thumbnail_path LIKE ?", (f'{self.url_prefix}/video_%',)
+        ).fetchall()
+        migrated = 0
+        for row in rows:
+            # One commit per file moved, so the row never points at a file that is gone
+            legacy = os.path.join(self.store_dir, row['thumbnail_path'][len(self.url_prefix) + 1:])
+            url = self.put(legacy) if os.path.exists(legacy) else None
+            db.execute("UPDATE videos SET thumbnail_path = ? WHERE id = ?", (url, row['id']))
+            migrated += url is not None
+        return migrated
@@ -0,0 +1,48 @@
+"""
+Schedule Timeline for The Houston Collective Streaming Server
+Keeps the compiled week table in sync with the schedule and playlists tables
+"""
+
+import hashlib
+from datetime import datetime
+
+from .schedule_table import WeekTable
+
+
+class ScheduleTimeline:
+    """Upcoming schedule transitions, rebuilt only when the schedule changes"""
+
+    QUERY = """
+        SELECT s.*, p.name as playlist_name, p.priority, p.playlist_type,
+               p.shuffle_enabled, p.loop_enabled
+        FROM schedule s
+        JOIN playlists p ON s.playlist_id = p.id
+        WHERE s.is_active = 1
+        ORDER BY s.id
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.signature = None
+        self.table = WeekTable()
+
+    def load(self, conn):
+        """Read active schedule rows and recompile; returns True when they changed"""
+        rows = [dict(row) for row in conn.execute(self.QUERY).fetchall()]
+        signature = hashlib.sha1(repr([sorted(row.items()) for row in rows]).encode()).hexdigest()
+
+        if signature == self.signature:
+            return False
+
+        self.rows = rows
+        self.signature = signature
+        self.table = WeekTable(rows)
+        return True
+
+    def current(self, now=None):
+        """Winning schedule row at now, or None for fallback"""
+        return self.table.lookup(now or datetime.now())
+
+    def next_transition(self, now=None):
+        """(at, schedule_row_or_None) of the next change after now, or None"""
+        return self.table.next_change(now or datetime.now())
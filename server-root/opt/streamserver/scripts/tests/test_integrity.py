@@ -0,0 +1,60 @@
+"""
+Media Integrity tests for The Houston Collective Streaming Server
+parse_decode_log and verdict against FFmpeg's -progress output as written by decode_command
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamserver.integrity import DAMAGED, OK, parse_decode_log, verdict
+
+
+def progress_block(seconds, state='continue'):
+    """One -progress block as FFmpeg writes it for a video and audio decode to -f null"""
+    us = int(seconds * 1e6)
+    return [
+        f'frame={int(seconds * 25)}',
+        'fps=200.00',
+        'stream_0_0_q=-0.0',
+        'bitrate=N/A',
+        'total_size=N/A',
+        f'out_time_us={us}',
+        f'out_time_ms={us}',
+        f'out_time=00:00:{seconds:09.6f}',
+        'dup_frames=0',
+        'drop_frames=0',
+        'speed=8.00x',
+        f'progress={state}',
+    ]
+
+
+class ParseDecodeLogTest(unittest.TestCase):
+
+    def test_clean_decode_has_no_errors(self):
+        lines = ['frame=0', 'out_time_us=N/A', 'progress=continue']
+        for second in range(1, 2001):
+            lines += progress_block(second, 'end' if second == 2000 else 'continue')
+
+        decoded, errors = parse_decode_log(lines)
+
+        self.assertEqual(decoded, 2000.0)
+        self.assertEqual(errors, [])
+        self.assertEqual(verdict(decoded, errors, 0, 2000.0), (OK, []))
+
+    def test_errors_are_stamped_with_the_last_progress_time(self):
+        lines = progress_block(10) + ['[h264 @ 0x55d0] error while decoding MB 12 34, bytestream -5']
+        lines += progress_block(600, 'end')
+
+        decoded, errors = parse_decode_log(lines)
+
+        self.assertEqual(errors, [(10.0, '[h264 @ 0x55d0] error while decoding MB 12 34, bytestream -5')])
+        status, regions = verdict(decoded, errors, 0, 600.0)
+        self.assertEqual(status, DAMAGED)
+        self.assertEqual(regions, [[5.0, 15.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Thumbnail Cache Server for The Houston Collective Streaming Server
+Renders resized thumbnail variants the first time nginx can't find them on disk; nginx serves them after that
+"""
+
+import os
+import sys
+import logging
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from streamserver.db import get_database
+from streamserver.thumbnails import FORMATS, ThumbnailStore, available, load_thumbnail_config
+
+DATABASE_PATH = "/opt/streamserver/database/streaming.db"
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('/opt/streamserver/logs/thumbnail_cache.log'),
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class VariantHandler(BaseHTTPRequestHandler):
+    """GET <prefix>/<ab>/<digest>-<w>x<h>.<webp|jpg>, proxied here by nginx on a miss"""
+
+    store = None
+
+    def do_GET(self):
+        url = urlsplit(self.path).path
+        variant = self.store.parse_variant_url(url)
+        if variant is None:
+            self.send_error(404)
+            return
+
+        digest, width, height, fmt = variant
+        try:
+            path = self.store.variant(digest, width, height, fmt)
+        except Exception as e:
+            logger.error(f"Rendering {url} failed: {e}")
+            path = None
+
+        if path is None:
+            if not self.store.allows(width, height, fmt) or not os.path.exists(self.store.master_path(digest)):
+                self.send_error(404)
+                return
+            # No Pillow, or a bad original: send the browser to the full-size original instead
+            self.send_response(302)
+            self.send_header('Location', self.store.url(self.store.master_path(digest)))
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return
+
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', FORMATS[fmt][1])
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', IMMUTABLE)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def serve(store, config):
+    VariantHandler.store = store
+    server = ThreadingHTTPServer((config['listen'], config['port']), VariantHandler)
+    server.daemon_threads = True
+    evicted = store.evict()  # also counts what is cached
+    logger.info(f"Rendering thumbnail variants on {config['listen']}:{config['port']}"
+                f"{'' if available() else ' (Pillow missing: redirecting to originals)'}; evicted {evicted}")
+    server.serve_forever()
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Thumbnail variant server for SRS Streaming Server')
+    parser.add_argument('--migrate', action='store_true',
+                        help='Move video_<id>.jpg thumbnails into the content-addressed store')
+    parser.add_argument('--evict', action='store_true',
+                        help='Enforce the variant size cap and remove thumbnails no video uses')
+
+    args = parser.parse_args()
+
+    config = load_thumbnail_config()
+    store = ThumbnailStore(config, logger=logger)
+    db = get_database(DATABASE_PATH)
+
+    try:
+        if args.migrate:
+            migrated = store.migrate_legacy(db)
+            logger.info(f"Migrated {migrated} thumbnails")
+        elif args.evict:
+            store.evict()
+            removed = store.remove_orphans(db.connection())
+            logger.info(f"Removed {removed} unused thumbnails")
+        else:
+            serve(store, config)
+    except KeyboardInterrupt:
+        logger.info("Thumbnail cache interrupted by user")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
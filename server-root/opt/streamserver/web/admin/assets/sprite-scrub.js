@@ -0,0 +1,94 @@
+// Hover-scrub previews for video thumbnails that carry data-sprite-vtt.
+// The WebVTT map is fetched once per video; every frame after that is a
+// background-position change on the one cached sprite sheet.
+(function () {
+    const maps = {};
+
+    function parseTime(text) {
+        const parts = text.trim().split(':').map(Number);
+        return parts.reduce((total, part) => total * 60 + part, 0);
+    }
+
+    function parseVtt(text) {
+        const cues = [];
+        const lines = text.split(/\r?\n/);
+        for (let i = 0; i < lines.length; i++) {
+            if (!lines[i].includes('-->')) continue;
+            const [start, end] = lines[i].split('-->');
+            const target = (lines[i + 1] || '').trim();
+            const hash = target.lastIndexOf('#xywh=');
+            if (hash < 0) continue;
+            const [x, y, w, h] = target.slice(hash + 6).split(',').map(Number);
+            cues.push({ start: parseTime(start), end: parseTime(end), url: target.slice(0, hash), x, y, w, h });
+        }
+        return cues;
+    }
+
+    function loadMap(url) {
+        if (!maps[url]) {
+            maps[url] = fetch(url)
+                .then(response => response.ok ? response.text() : '')
+                .then(text => {
+                    const cues = parseVtt(text);
+                    if (cues.length) new Image().src = cues[0].url;  // warm the sheet before the first frame
+                    return cues;
+                })
+                .catch(() => []);
+        }
+        return maps[url];
+    }
+
+    function sheetSize(cues) {
+        return {
+            width: Math.max(...cues.map(c => c.x + c.w)),
+            height: Math.max(...cues.map(c => c.y + c.h))
+        };
+    }
+
+    function show(thumb, cue) {
+        const scaleX = thumb.clientWidth / cue.w;
+        const scaleY = thumb.clientHeight / cue.h;
+        thumb.style.backgroundImage = `url('${cue.url}')`;
+        thumb.style.backgroundSize = `${thumb.spriteSheet.width * scaleX}px ${thumb.spriteSheet.height * scaleY}px`;
+        thumb.style.backgroundPosition = `${-cue.x * scaleX}px ${-cue.y * scaleY}px`;
+    }
+
+    function restore(thumb) {
+        if (!thumb.spriteSaved) return;
+        Object.assign(thumb.style, thumb.spriteSaved);
+        thumb.spriteSaved = null;
+        thumb.classList.remove('scrubbing');
+    }
+
+    document.addEventListener('mouseover', event => {
+        const thumb = event.target.closest && event.target.closest('.video-thumbnail[data-sprite-vtt]');
+        if (!thumb || thumb.spriteCues) return;
+        loadMap(thumb.dataset.spriteVtt).then(cues => {
+            thumb.spriteCues = cues;
+            if (cues.length) thumb.spriteSheet = sheetSize(cues);
+        });
+    });
+
+    document.addEventListener('mousemove', event => {
+        const thumb = event.target.closest && event.target.closest('.video-thumbnail[data-sprite-vtt]');
+        if (!thumb || !thumb.spriteCues || !thumb.spriteCues.length) return;
+
+        const cues = thumb.spriteCues;
+        const rect = thumb.getBoundingClientRect();
+        const fraction = Math.min(Math.max((event.clientX - rect.left) / rect.width, 0), 0.999);
+        const time = fraction * cues[cues.length - 1].end;
+        const cue = cues.find(c => time < c.end) || cues[cues.length - 1];
+
+        if (!thumb.spriteSaved) {
+            thumb.spriteSaved = {
+                backgroundImage: thumb.style.backgroundImage,
+                backgroundSize: thumb.style.backgroundSize,
+                backgroundPosition: thumb.style.backgroundPosition
+            };
+            thumb.classList.add('scrubbing');
+            thumb.addEventListener('mouseleave', () => restore(thumb), { once: true });
+        }
+        thumb.style.setProperty('--scrub', `${fraction * 100}%`);
+        show(thumb, cue);
+    });
+})();
@@ -16,67 +16,34 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST' && isset($_POST['action'])) {
     switch ($_POST['action']) {
         case 'start_content_scan':
             try {
-                // Start the content scanner as a background process
-                $command = "cd /opt/streamserver/scripts && python3 content_scanner.py --progress 2>&1";
-                $output = [];
-                $return_var = 0;
-                
-                // Execute and capture output
-                exec($command, $output, $return_var);
-                
-                // Parse the output for results
-                $results = [
-                    'new_videos' => 0,
-                    'updated_videos' => 0,
-                    'errors' => 0,
-                    'total_processed' => 0,
-                    'total_duration' => 0,
-                    'total_size' => 0,
-                    'details' => []
-                ];
-                
-                // Simple parsing of output (you can enhance this based on your scanner output)
-                foreach ($output as $line) {
-                    if (strpos($line, 'Found') !== false && strpos($line, 'videos') !== false) {
-                        preg_match('/Found (\d+)/', $line, $matches);
-                        if (isset($matches[1])) {
-                            $results['total_processed'] = intval($matches[1]);
-                        }
-                    }
-                    if (strpos($line, 'Added') !== false) {
-                        $results['new_videos']++;
-                    }
-                    if (strpos($line, 'Updated') !== false) {
-                        $results['updated_videos']++;
-                    }
-                    if (strpos($line, 'Error') !== false) {
-                        $results['errors']++;
-                    }
-                    
-                    // Store significant details
-                    if (strpos($line, 'Processing:') !== false || 
-                        strpos($line, 'Added:') !== false || 
-                        strpos($line, 'Updated:') !== false ||
-                        strpos($line, 'Error:') !== false) {
-                        $results['details'][] = $line;
-                    }
-                }
-                
-                echo json_encode(['success' => true, 'results' => $results]);
+                // Queue the scan for job_worker.py and return straight away; the page polls get_scan_progress
+                $db = new Database();
+                $job_id = $db->submitJob('scan', ['full' => !empty($_POST['full'])], 10);
+                echo json_encode(['success' => true, 'job_id' => $job_id]);
             } catch (Exception $e) {
                 echo json_encode(['success' => false, 'message' => $e->getMessage()]);
             }
             exit;
 
         case 'get_scan_progress':
-            // Simulate progress updates (you can enhance this with actual progress tracking)
-            $progress = [
-                'current_file' => 'video_' . rand(1, 100) . '.mp4',
-                'progress_percent' => min(100, rand(10, 95)),
-                'files_processed' => rand(1, 50),
-                'current_action' => 'Extracting metadata...'
-            ];
-            echo json_encode($progress);
+            try {
+                $db = new Database();
+                $job = $db->getJob(intval($_POST['job_id'] ?? 0));
+                if (!$job) {
+                    echo json_encode(['success' => false, 'message' => 'Scan job not found']);
+                    exit;
+                }
+                echo json_encode([
+                    'success' => true,
+                    'status' => $job['status'],
+                    'progress_percent' => round($job['progress'] * 100, 1),
+                    'current_file' => $job['message'] ?? '',
+                    'error' => $job['error'],
+                    'results' => $job['result']
+                ]);
+            } catch (Exception $e) {
+                echo json_encode(['success' => false, 'message' => $e->getMessage()]);
+            }
             exit;
     }
 }
@@ -1094,10 +1061,7 @@ $current_page = $_GET['page'] ?? 'dashboard';
             // Reset progress
             resetProgress();
             
-            // Start simulated progress updates
-            startProgressUpdates();
-            
-            // Start actual content scan
+            // Queue the scan; job_worker.py runs it and we poll its progress
             fetch('index.php', {
                 method: 'POST',
                 headers: {
@@ -1107,47 +1071,49 @@ $current_page = $_GET['page'] ?? 'dashboard';
             })
             .then(response => response.json())
             .then(data => {
-                // Stop progress simulation
-                clearInterval(progressInterval);
-                
                 if (data.success) {
-                    showCompletionSummary(data.results);
+                    addActivity(`Scan queued as job #${data.job_id}`);
+                    startProgressUpdates(data.job_id);
                 } else {
                     showError(data.message, {
                         type: 'General Error',
                         timestamp: new Date().toISOString(),
                         details: data.message,
                         suggestions: [
-                            'Check if the content directory exists and is readable',
-                            'Verify that Python and required modules are installed',
-                            'Check server logs for more details',
-                            'Ensure sufficient disk space is available'
+                            'Check that the database is writable by the web server',
+                            'Check server logs for more details'
                         ]
                     });
+                    finishScan();
                 }
-                
-                scanInProgress = false;
-                scanButton.textContent = 'Start Content Scan';
-                scanButton.disabled = false;
             })
             .catch(error => {
-                clearInterval(progressInterval);
                 console.error('Error:', error);
-                showError('Network or server error occurred.', {
-                    type: 'Network Error',
-                    timestamp: new Date().toISOString(),
-                    details: error.message || 'Unknown network error',
-                    stack: error.stack || 'No stack trace available',
-                    suggestions: [
-                        'Check your internet connection',
-                        'Verify the server is running',
-                        'Try refreshing the page and scanning again',
-                        'Contact system administrator if problem persists'
-                    ]
-                });
-                scanInProgress = false;
-                scanButton.textContent = 'Start Content Scan';
-                scanButton.disabled = false;
+                showNetworkError(error);
+                finishScan();
+            });
+        }
+
+        function finishScan() {
+            clearInterval(progressInterval);
+            scanInProgress = false;
+            const scanButton = document.getElementById('scanButton');
+            scanButton.textContent = 'Start Content Scan';
+            scanButton.disabled = false;
+        }
+
+        function showNetworkError(error) {
+            showError('Network or server error occurred.', {
+                type: 'Network Error',
+                timestamp: new Date().toISOString(),
+                details: error.message || 'Unknown network error',
+                stack: error.stack || 'No stack trace available',
+                suggestions: [
+                    'Check your internet connection',
+                    'Verify the server is running',
+                    'Try refreshing the page and scanning again',
+                    'Contact system administrator if problem persists'
+                ]
             });
         }
 
@@ -1159,91 +1125,73 @@ $current_page = $_GET['page'] ?? 'dashboard';
             document.getElementById('activityFeed').innerHTML = '<div class="activity-item">🔍 Starting content discovery...</div>';
         }
 
-        function startProgressUpdates() {
-            let progress = 0;
-            let filesProcessed = 0;
-            
-            const sampleFiles = [
-                'music_video_001.mp4', 'concert_footage.mkv', 'interview_segment.avi',
-                'live_performance.mp4', 'behind_scenes.mov', 'promotional_video.mp4',
-                'acoustic_session.mkv', 'music_documentary.mp4', 'studio_recording.avi'
-            ];
-            
-            const activities = [
-                'Scanning directory structure...',
-                'Discovering video files...',
-                'Extracting metadata...',
-                'Generating thumbnails...',
-                'Updating database...',
-                'Processing audio tracks...',
-                'Validating file integrity...'
-            ];
-            
-            const possibleErrors = [
-                {
-                    message: 'Failed to extract metadata from corrupted_video.mp4',
-                    details: {
-                        type: 'Metadata Error',
-                        file: 'corrupted_video.mp4',
-                        timestamp: new Date().toISOString(),
-                        details: 'FFprobe could not read video metadata. File may be corrupted or in an unsupported format.',
-                        stack: 'FFprobeError: Invalid data found when processing input\n    at extractMetadata()\n    at processVideo()',
-                        suggestions: [
-                            'Check if the video file is corrupted',
-                            'Try re-encoding the video with FFmpeg',
-                            'Verify the file format is supported',
-                            'Remove or replace the problematic file'
-                        ]
-                    }
-                },
-                {
-                    message: 'Permission denied: thumbnail_generation_failed.mkv',
-                    details: {
-                        type: 'Permission Error',
-                        file: 'thumbnail_generation_failed.mkv',
-                        timestamp: new Date().toISOString(),
-                        details: 'Unable to write thumbnail file. Check directory permissions.',
-                        stack: 'PermissionError: [Errno 13] Permission denied: \'/opt/streamserver/thumbnails/\'',
-                        suggestions: [
-                            'Check write permissions on thumbnail directory',
-                            'Verify streamserver user has proper access',
-                            'Run: sudo chown -R streamserver:streamserver /opt/streamserver/',
-                            'Check disk space availability'
-                        ]
-                    }
-                }
-            ];
+        function startProgressUpdates(jobId) {
+            let lastMessage = '';
+            let polling = false;
             
             progressInterval = setInterval(() => {
-                // Update progress
-                progress = Math.min(95, progress + Math.random() * 8);
-                filesProcessed += Math.floor(Math.random() * 3);
-                
-                // Update UI
-                document.getElementById('progressBar').style.width = progress + '%';
-                document.getElementById('progressPercent').textContent = Math.floor(progress) + '%';
-                document.getElementById('filesProcessed').textContent = filesProcessed;
+                if (polling) return;
+                polling = true;
                 
-                // Update current file
-                if (Math.random() > 0.7) {
-                    const randomFile = sampleFiles[Math.floor(Math.random() * sampleFiles.length)];
-                    document.getElementById('currentFileName').textContent = randomFile;
+                fetch('index.php', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/x-www-form-urlencoded',
+                    },
+                    body: 'action=get_scan_progress&job_id=' + encodeURIComponent(jobId)
+                })
+                .then(response => response.json())
+                .then(job => {
+                    polling = false;
+                    if (!job.success) {
+                        showError(job.message);
+                        finishScan();
+                        return;
+                    }
                     
-                    // Add activity (occasionally add an error for demonstration)
-                    if (Math.random() > 0.92 && possibleErrors.length > 0) {
-                        const randomError = possibleErrors[Math.floor(Math.random() * possibleErrors.length)];
-                        addActivity(randomError.message, 'error', randomError.details);
-                    } else {
-                        const randomActivity = activities[Math.floor(Math.random() * activities.length)];
-                        addActivity(randomActivity, Math.random() > 0.8 ? 'new' : '');
+                    if (job.status === 'queued') {
+                        document.getElementById('currentFileName').textContent = 'Waiting for the job worker...';
+                        return;
                     }
-                }
-                
-                // Stop at 95% and wait for real completion
-                if (progress >= 95) {
-                    clearInterval(progressInterval);
-                }
-            }, 800);
+                    
+                    // Update UI
+                    document.getElementById('progressBar').style.width = job.progress_percent + '%';
+                    document.getElementById('progressPercent').textContent = Math.floor(job.progress_percent) + '%';
+                    if (job.current_file && job.current_file !== lastMessage) {
+                        lastMessage = job.current_file;
+                        document.getElementById('currentFileName').textContent = job.current_file;
+                        addActivity(job.current_file);
+                    }
+                    
+                    if (job.status === 'done') {
+                        finishScan();
+                        const results = job.results || {};
+                        document.getElementById('filesProcessed').textContent = results.total_processed || 0;
+                        (results.details || []).slice(-5).forEach(line => {
+                            addActivity(line, line.startsWith('Error') ? 'error' : 'new');
+                        });
+                        showCompletionSummary(results);
+                    } else if (job.status === 'failed') {
+                        finishScan();
+                        showError(job.error || 'Content scan failed', {
+                            type: 'Scan Error',
+                            timestamp: new Date().toISOString(),
+                            details: job.error || 'The job worker reported a failure without details',
+                            suggestions: [
+                                'Check if the content directory exists and is readable',
+                                'Check /opt/streamserver/logs/content_scanner.log for details',
+                                'Ensure sufficient disk space is available'
+                            ]
+                        });
+                    }
+                })
+                .catch(error => {
+                    polling = false;
+                    console.error('Error:', error);
+                    finishScan();
+                    showNetworkError(error);
+                });
+            }, 1000);
         }
 
         function addActivity(text, className = '', errorDetail = null) {
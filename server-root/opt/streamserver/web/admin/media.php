@@ -740,6 +740,30 @@ try {
             filter: drop-shadow(0 2px 4px rgba(0, 0, 0, 0.3));
         }
 
+        .video-thumbnail.has-image {
+            background-size: cover;
+            background-position: center;
+        }
+
+        .video-thumbnail[data-sprite-vtt] {
+            position: relative;
+            cursor: ew-resize;
+        }
+
+        .video-thumbnail.scrubbing {
+            font-size: 0;
+        }
+
+        .video-thumbnail.scrubbing::after {
+            content: '';
+            position: absolute;
+            left: 0;
+            bottom: 0;
+            height: 3px;
+            width: var(--scrub, 0);
+            background: rgba(255, 229, 138, 0.9);
+        }
+
         .video-info {
             padding: 25px;
             position: relative;
@@ -1270,9 +1294,7 @@ try {
                 <!-- Show videos -->
                 <?php foreach ($items as $video): ?>
                     <div class="video-card" data-video-id="<?= $video['id'] ?>">
-                        <div class="video-thumbnail">
-                            🎬
-                        </div>
+                        <div class="video-thumbnail<?= !empty($video['thumbnail_path']) ? ' has-image' : '' ?>"<?php if (!empty($video['thumbnail_path'])): ?> style="background-image: url('<?= htmlspecialchars(Database::thumbnailVariant($video['thumbnail_path'], 320, 240)) ?>')"<?php endif; ?><?php if (!empty($video['sprite_path'])): ?> data-sprite-vtt="<?= htmlspecialchars($video['sprite_path']) ?>"<?php endif; ?>><?= empty($video['thumbnail_path']) ? '🎬' : '' ?></div>
 
                         <div class="video-info">
                             <div class="video-title"><?= htmlspecialchars($video['display_name']) ?></div>
@@ -1654,6 +1676,7 @@ try {
             }
         });
     </script>
+    <script src="assets/sprite-scrub.js"></script>
 </body>
 </html>
 
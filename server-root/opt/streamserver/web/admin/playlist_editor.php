@@ -66,6 +66,7 @@ $playlistVideoIds = array_column($playlistVideos, 'video_id');
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Edit Playlist: <?php echo htmlspecialchars($playlist['name']); ?> - The Houston Collective</title>
     <script src="https://cdnjs.cloudflare.com/ajax/libs/Sortable/1.15.0/Sortable.min.js"></script>
+    <script src="assets/sprite-scrub.js"></script>
     <style>
         * {
             margin: 0;
@@ -423,6 +424,30 @@ $playlistVideoIds = array_column($playlistVideos, 'video_id');
             z-index: 1;
         }
 
+        .video-thumbnail.has-image {
+            background-size: cover;
+            background-position: center;
+        }
+
+        .video-thumbnail[data-sprite-vtt] {
+            position: relative;
+            cursor: ew-resize;
+        }
+
+        .video-thumbnail.scrubbing {
+            font-size: 0;
+        }
+
+        .video-thumbnail.scrubbing::after {
+            content: '';
+            position: absolute;
+            left: 0;
+            bottom: 0;
+            height: 3px;
+            width: var(--scrub, 0);
+            background: rgba(255, 229, 138, 0.9);
+        }
+
         .video-info {
             flex: 1;
             min-width: 0;
@@ -716,7 +741,7 @@ $playlistVideoIds = array_column($playlistVideos, 'video_id');
                 <?php foreach ($allVideos as $video): ?>
                     <?php if (!in_array($video['id'], $playlistVideoIds)): ?>
                         <div class="video-item" data-video-id="<?php echo $video['id']; ?>">
-                            <div class="video-thumbnail">🎬</div>
+                            <div class="video-thumbnail<?= !empty($video['thumbnail_path']) ? ' has-image' : '' ?>"<?php if (!empty($video['thumbnail_path'])): ?> style="background-image: url('<?= htmlspecialchars(Database::thumbnailVariant($video['thumbnail_path'], 140, 100)) ?>')"<?php endif; ?><?php if (!empty($video['sprite_path'])): ?> data-sprite-vtt="<?= htmlspecialchars($video['sprite_path']) ?>"<?php endif; ?>><?= empty($video['thumbnail_path']) ? '🎬' : '' ?></div>
                             <div class="video-info">
                                 <div class="video-name"><?php echo htmlspecialchars($video['display_name']); ?></div>
                                 <div class="video-meta">
@@ -767,7 +792,7 @@ $playlistVideoIds = array_column($playlistVideos, 'video_id');
                 <?php foreach ($playlistVideos as $index => $video): ?>
                     <div class="video-item" data-video-id="<?php echo $video['video_id']; ?>">
                         <div class="drag-handle">⋮⋮</div>
-                        <div class="video-thumbnail">🎬</div>
+                        <div class="video-thumbnail<?= !empty($video['thumbnail_path']) ? ' has-image' : '' ?>"<?php if (!empty($video['thumbnail_path'])): ?> style="background-image: url('<?= htmlspecialchars(Database::thumbnailVariant($video['thumbnail_path'], 140, 100)) ?>')"<?php endif; ?><?php if (!empty($video['sprite_path'])): ?> data-sprite-vtt="<?= htmlspecialchars($video['sprite_path']) ?>"<?php endif; ?>><?= empty($video['thumbnail_path']) ? '🎬' : '' ?></div>
                         <div class="video-info">
                             <div class="video-name"><?php echo htmlspecialchars($video['display_name']); ?></div>
                             <div class="video-meta">
@@ -918,10 +943,11 @@ $playlistVideoIds = array_column($playlistVideos, 'video_id');
 
             const videoName = libraryItem.querySelector('.video-name').textContent;
             const videoMeta = libraryItem.querySelector('.video-meta').innerHTML;
+            const thumbnail = libraryItem.querySelector('.video-thumbnail').outerHTML;
 
             item.innerHTML = `
                 <div class="drag-handle">⋮⋮</div>
-                <div class="video-thumbnail">🎬</div>
+                ${thumbnail}
                 <div class="video-info">
                     <div class="video-name">${videoName}</div>
                     <div class="video-meta">${videoMeta}</div>
@@ -941,9 +967,10 @@ $playlistVideoIds = array_column($playlistVideos, 'video_id');
 
             const videoName = playlistItem.querySelector('.video-name').textContent;
             const videoMeta = playlistItem.querySelector('.video-meta').innerHTML;
+            const thumbnail = playlistItem.querySelector('.video-thumbnail').outerHTML;
 
             item.innerHTML = `
-                <div class="video-thumbnail">🎬</div>
+                ${thumbnail}
                 <div class="video-info">
                     <div class="video-name">${videoName}</div>
                     <div class="video-meta">${videoMeta}</div>
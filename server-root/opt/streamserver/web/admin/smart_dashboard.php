@@ -25,6 +25,19 @@ if (isset($_GET['action'])) {
         case 'emergency_override':
             echo json_encode(triggerEmergencyOverride());
             break;
+        case 'now_next':
+            echo json_encode(getNowNext());
+            break;
+        case 'encoder_status':
+            echo json_encode(getEncoderStatus());
+            break;
+        case 'quarantine':
+            echo json_encode($db->getQuarantinedVideos());
+            break;
+        case 'release':
+            $id = (int)($_POST['id'] ?? 0);
+            echo json_encode(['success' => $_SERVER['REQUEST_METHOD'] === 'POST' && $id > 0 && $db->releaseVideo($id)]);
+            break;
         default:
             echo json_encode(['error' => 'Unknown action']);
     }
@@ -123,6 +136,93 @@ function getLogType($message) {
     }
 }
 
+function getNowNext() {
+    // Week table compiled by the smart scheduler: one slot per minute, 0 = Sunday 00:00 in the scheduler's local time
+    $table_file = '/opt/streamserver/config/schedule_table.json';
+    $result = ['now' => null, 'next' => null, 'next_at' => null, 'compiled_at' => null];
+    
+    if (!file_exists($table_file)) {
+        return $result;
+    }
+    
+    $table = json_decode(file_get_contents($table_file), true);
+    if (!$table || empty($table['slots'])) {
+        return $result;
+    }
+    
+    // Same clock as the scheduler, whatever php.ini's date.timezone says
+    try {
+        if (!empty($table['timezone'])) {
+            $zone = new DateTimeZone($table['timezone']);
+        } else {
+            $offset = (int)($table['utc_offset'] ?? 0);
+            $zone = new DateTimeZone(sprintf('%s%02d:%02d', $offset < 0 ? '-' : '+', intdiv(abs($offset), 3600), intdiv(abs($offset) % 3600, 60)));
+        }
+    } catch (Exception $e) {
+        $zone = new DateTimeZone(date_default_timezone_get());
+    }
+    $now = new DateTime('now', $zone);
+    $now->setTime((int)$now->format('G'), (int)$now->format('i'));
+    
+    $slots = $table['slots'];
+    $week = count($slots);
+    $slot = (int)$now->format('w') * 1440 + (int)$now->format('G') * 60 + (int)$now->format('i');
+    $current = $slots[$slot];
+    
+    $result['now'] = $table['winners'][$current];
+    $result['compiled_at'] = $table['compiled_at'];
+    
+    // First transition after this slot (bisect), wrapping into next week
+    $changes = $table['changes'] ?? [];
+    if ($changes) {
+        $low = 0;
+        $high = count($changes);
+        while ($low < $high) {
+            $mid = intdiv($low + $high, 2);
+            if ($changes[$mid] <= $slot) {
+                $low = $mid + 1;
+            } else {
+                $high = $mid;
+            }
+        }
+        $change = $low < count($changes) ? $changes[$low] : $changes[0] + $week;
+        $result['next'] = $table['winners'][$slots[$change % $week]];
+        $result['next_at'] = $now->modify('+' . ($change - $slot) . ' minutes')->format('D H:i');
+    }
+    
+    return $result;
+}
+
+function getEncoderStatus() {
+    // Live FFmpeg metrics written about once a second by the scheduler's encoder watchdog
+    $status_file = '/opt/streamserver/config/encoder_status.json';
+    $result = ['available' => false, 'healthy' => false, 'sink' => null, 'feed' => null, 'age' => null];
+    
+    if (!file_exists($status_file)) {
+        return $result;
+    }
+    
+    $status = json_decode(file_get_contents($status_file), true);
+    if (!$status || !isset($status['encoders'])) {
+        return $result;
+    }
+    
+    $result['available'] = true;
+    $result['age'] = time() - filemtime($status_file);
+    $result['sink'] = $status['encoders']['sink'] ?? null;
+    $result['feed'] = $status['encoders']['feed'] ?? null;
+    $result['healthy'] = $result['sink'] && $result['sink']['running'] && !$result['sink']['stalled'] && $result['age'] < 5;
+    
+    return $result;
+}
+
+function formatEncoderMetric($encoder, $key, $format) {
+    if (!$encoder || !isset($encoder['metrics'][$key]) || $encoder['metrics'][$key] === null) {
+        return '—';
+    }
+    return sprintf($format, $encoder['metrics'][$key]);
+}
+
 function triggerEmergencyOverride() {
     $output = shell_exec('sudo systemctl kill --signal=SIGUSR1 stream-scheduler.service 2>&1');
     return [
@@ -136,6 +236,9 @@ function triggerEmergencyOverride() {
 $current_status = getSchedulerStatus();
 $current_analytics = getAnalytics();
 $recent_logs = getRecentLogs();
+$now_next = getNowNext();
+$encoder_status = getEncoderStatus();
+$quarantined = $db->getQuarantinedVideos();
 
 // Get current playlist info
 $current_playlist = null;
@@ -359,6 +462,28 @@ if (isset($current_analytics['current_playlist']) && $current_analytics['current
             grid-column: 1 / -1;
         }
 
+        .quarantine-item {
+            padding: 12px 0;
+            border-bottom: 1px solid rgba(255, 206, 97, 0.2);
+        }
+
+        .quarantine-item:last-child {
+            border-bottom: none;
+        }
+
+        .quarantine-error {
+            margin: 8px 0 0;
+            padding: 8px 12px;
+            background: rgba(0, 0, 0, 0.3);
+            border-left: 4px solid #ff4757;
+            border-radius: 8px;
+            font-family: 'Courier New', monospace;
+            font-size: 12px;
+            white-space: pre-wrap;
+            word-break: break-all;
+            color: rgba(255, 255, 255, 0.8);
+        }
+
         .auto-refresh {
             position: fixed;
             top: 20px;
@@ -443,6 +568,39 @@ if (isset($current_analytics['current_playlist']) && $current_analytics['current
                 <?php else: ?>
                     <p style="text-align: center; color: rgba(255, 255, 255, 0.7);">No active stream detected</p>
                 <?php endif; ?>
+                <div class="metric">
+                    <span>Scheduled Now</span>
+                    <span class="metric-value"><?= $now_next['now'] ? htmlspecialchars($now_next['now']['playlist_name']) : 'Fallback' ?></span>
+                </div>
+                <div class="metric">
+                    <span>Up Next</span>
+                    <span class="metric-value">
+                        <?php if ($now_next['next_at']): ?>
+                            <?= $now_next['next'] ? htmlspecialchars($now_next['next']['playlist_name']) : 'Fallback' ?> @ <?= $now_next['next_at'] ?>
+                        <?php else: ?>
+                            No changes scheduled
+                        <?php endif; ?>
+                    </span>
+                </div>
+                <div class="metric">
+                    <span>Encoder Health</span>
+                    <span class="metric-value" id="encoderHealth">
+                        <span class="status-indicator <?= $encoder_status['healthy'] ? 'status-online' : 'status-offline' ?>"></span>
+                        <?= $encoder_status['available'] ? ($encoder_status['healthy'] ? 'OK' : 'STALLED') : 'No data' ?>
+                    </span>
+                </div>
+                <div class="metric">
+                    <span>Speed / FPS</span>
+                    <span class="metric-value" id="encoderSpeed"><?= formatEncoderMetric($encoder_status['sink'], 'speed', '%.2fx') ?> / <?= formatEncoderMetric($encoder_status['sink'], 'fps', '%.1f') ?></span>
+                </div>
+                <div class="metric">
+                    <span>Output Bitrate</span>
+                    <span class="metric-value" id="encoderBitrate"><?= formatEncoderMetric($encoder_status['sink'], 'bitrate_kbps', '%.0f kbps') ?></span>
+                </div>
+                <div class="metric">
+                    <span>Dropped / Duplicated</span>
+                    <span class="metric-value" id="encoderFrames"><?= formatEncoderMetric($encoder_status['sink'], 'drop_frames', '%d') ?> / <?= formatEncoderMetric($encoder_status['sink'], 'dup_frames', '%d') ?></span>
+                </div>
                 <button class="btn" onclick="refreshDashboard()">🔄 Refresh Now</button>
             </div>
 
@@ -486,6 +644,31 @@ if (isset($current_analytics['current_playlist']) && $current_analytics['current
             </div>
         </div>
 
+        <!-- Quarantined Media Card (Full Width) -->
+        <div class="card wide-card">
+            <h3>☣️ Quarantined Media (<span id="quarantineCount"><?= count($quarantined) ?></span>)</h3>
+            <p style="margin-bottom: 10px; color: rgba(255, 255, 255, 0.8);">
+                Videos that made FFmpeg fail several times in a row are kept off air until released.
+            </p>
+            <div id="quarantineList">
+                <?php if (empty($quarantined)): ?>
+                    <p style="color: rgba(255, 255, 255, 0.6);">Nothing quarantined.</p>
+                <?php endif; ?>
+                <?php foreach ($quarantined as $video): ?>
+                    <div class="quarantine-item">
+                        <div class="metric">
+                            <span><?= htmlspecialchars($video['display_name']) ?></span>
+                            <span class="metric-value" style="font-size: 0.9rem;">
+                                <?= (int)$video['failure_count'] ?> failures, <?= htmlspecialchars($video['date_quarantined'] ?? '') ?>
+                                <button class="btn" onclick="releaseVideo(<?= (int)$video['id'] ?>)">Release</button>
+                            </span>
+                        </div>
+                        <pre class="quarantine-error"><?= htmlspecialchars($video['last_error'] ?? '') ?></pre>
+                    </div>
+                <?php endforeach; ?>
+            </div>
+        </div>
+
         <!-- Live Logs Card (Full Width) -->
         <div class="card wide-card">
             <h3>📋 Live Activity Feed</h3>
@@ -540,6 +723,23 @@ if (isset($current_analytics['current_playlist']) && $current_analytics['current
                 })
                 .catch(error => console.error('Error refreshing logs:', error));
 
+            // Refresh encoder metrics
+            fetch('?action=encoder_status')
+                .then(response => response.json())
+                .then(status => {
+                    const sink = status.sink && status.sink.metrics ? status.sink.metrics : {};
+                    const value = (v, digits, suffix = '') => v === null || v === undefined ? '—' : `${Number(v).toFixed(digits)}${suffix}`;
+                    const label = status.available ? (status.healthy ? 'OK' : 'STALLED') : 'No data';
+                    document.getElementById('encoderHealth').innerHTML =
+                        `<span class="status-indicator ${status.healthy ? 'status-online' : 'status-offline'}"></span> ${label}`;
+                    document.getElementById('encoderSpeed').textContent = `${value(sink.speed, 2, 'x')} / ${value(sink.fps, 1)}`;
+                    document.getElementById('encoderBitrate').textContent = value(sink.bitrate_kbps, 0, ' kbps');
+                    document.getElementById('encoderFrames').textContent = `${value(sink.drop_frames, 0)} / ${value(sink.dup_frames, 0)}`;
+                })
+                .catch(error => console.error('Error refreshing encoder status:', error));
+
+            refreshQuarantine();
+
             // Refresh analytics
             fetch('?action=analytics')
                 .then(response => response.json())
@@ -550,6 +750,52 @@ if (isset($current_analytics['current_playlist']) && $current_analytics['current
                 .catch(error => console.error('Error refreshing analytics:', error));
         }
 
+        function escapeHtml(text) {
+            const div = document.createElement('div');
+            div.textContent = text === null || text === undefined ? '' : String(text);
+            return div.innerHTML;
+        }
+
+        function refreshQuarantine() {
+            fetch('?action=quarantine')
+                .then(response => response.json())
+                .then(videos => {
+                    document.getElementById('quarantineCount').textContent = videos.length;
+                    document.getElementById('quarantineList').innerHTML = videos.length ? videos.map(video => `
+                        <div class="quarantine-item">
+                            <div class="metric">
+                                <span>${escapeHtml(video.display_name)}</span>
+                                <span class="metric-value" style="font-size: 0.9rem;">
+                                    ${Number(video.failure_count)} failures, ${escapeHtml(video.date_quarantined)}
+                                    <button class="btn" onclick="releaseVideo(${Number(video.id)})">Release</button>
+                                </span>
+                            </div>
+                            <pre class="quarantine-error">${escapeHtml(video.last_error)}</pre>
+                        </div>`).join('') : '<p style="color: rgba(255, 255, 255, 0.6);">Nothing quarantined.</p>';
+                })
+                .catch(error => console.error('Error refreshing quarantine list:', error));
+        }
+
+        function releaseVideo(videoId) {
+            if (confirm('Release this video back into rotation? It will be quarantined again if it keeps failing.')) {
+                fetch('?action=release', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/x-www-form-urlencoded',
+                    },
+                    body: `id=${videoId}`
+                })
+                    .then(response => response.json())
+                    .then(result => {
+                        if (!result.success) {
+                            alert('Could not release the video');
+                        }
+                        refreshQuarantine();
+                    })
+                    .catch(error => console.error('Error releasing video:', error));
+            }
+        }
+
         function triggerEmergencyOverride() {
             if (confirm('Are you sure you want to trigger an emergency override? This will be logged.')) {
                 fetch('?action=emergency_override')